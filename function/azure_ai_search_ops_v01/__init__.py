@@ -1,11 +1,43 @@
+import time
+_import_start = time.perf_counter()
+
+import json
 import os
+import urllib.parse
 import logging as log
 log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
 
 import azure.functions as func
 
 #import ai_search.ai_search_ops as ais_ops
-from azure_ai_search_ops_v01.ai_search import ai_search_ops 
+# ai_search package (requests etc.) is imported lazily on the first invocation, see _get_ai_search_ops
+
+
+# definition jsons
+INDEX_SCHEMA_PATH = './azure_ai_search_ops_v01/data/vector-index/ai_search_index_schema.json'
+INDEXER_DEF_PATH = './azure_ai_search_ops_v01/data/vector-index/ai_search_indexer_vector_def_v2.json'
+SKILLSET_DEF_PATH = './azure_ai_search_ops_v01/data/vector-index/ai_search_skillset_vector_def_v2.json'
+
+# seconds the caller should wait before polling operation status again
+STATUS_RETRY_AFTER_S = 10
+
+# provisioning is run by the queue triggered worker (azure_ai_search_ops_worker), operation status is written to
+# OPERATIONS_DIR - a folder shared by all instances (e.g. mounted Azure Files share), a status poll could reach
+# any instance and a thread outliving the HTTP response is not guaranteed to run
+OPERATIONS_DIR_ERROR = ("OPERATIONS_DIR is not set - operation status needs a folder shared by all instances "
+                        "(e.g. Azure Files share mounted to the function app).")
+
+# module level state - kept by the worker across warm invocations:
+# parsed config, ai_search module (its pooled HTTP client and compiled templates are cached there),
+# operation tracker (status is polled with ?operation_id=...)
+_state = {
+    "config": None,
+    "ai_search_ops": None,
+    "operations": None,
+    "invocations": 0,
+    "module_import_ms": (time.perf_counter() - _import_start) * 1000,
+    "lazy_import_ms": None
+}
 
 
 def load_config():
@@ -16,41 +48,120 @@ def load_config():
               "StorageAccFolder", "AOAIResource",
               "AOAIAPIKEY", "AOAIDeploymentID", "AOAIModelName"]:
         config[c] = os.environ[c]
+    # optional - incremental enrichment (indexer cache)
+    for c in ["EnrichmentCacheConnStr", "EnrichmentCacheReprocessing"]:
+        if c in os.environ:
+            config[c] = os.environ[c]
     return config
 
-def main(req: func.HttpRequest) -> func.HttpResponse:
+
+def _get_config():
+    """Config loaded once per instance"""
+    if _state["config"] is None:
+        _state["config"] = load_config()
+    return _state["config"]
+
+
+def _get_ai_search_ops():
+    """ai_search_ops module imported on first use"""
+    if _state["ai_search_ops"] is None:
+        start = time.perf_counter()
+        from azure_ai_search_ops_v01.ai_search import ai_search_ops
+        _state["ai_search_ops"] = ai_search_ops
+        _state["lazy_import_ms"] = (time.perf_counter() - start) * 1000
+    return _state["ai_search_ops"]
+
+
+def _get_operations():
+    """Operation tracker of this instance, records are read from and written to OPERATIONS_DIR (required)"""
+    if _state["operations"] is None:
+        operations_dir = os.environ.get("OPERATIONS_DIR")
+        if not operations_dir:
+            raise RuntimeError(OPERATIONS_DIR_ERROR)
+        from azure_ai_search_ops_v01.ai_search import ai_search_operations
+        _state["operations"] = ai_search_operations.OperationTracker(store_dir=operations_dir)
+    return _state["operations"]
+
+
+def new_ai_search_ops(release_name, base_index_name='vect-index'):
+    """AISearchOps of the release (vector index definitions of the function)"""
+    ai_search_ops = _get_ai_search_ops()
+    return ai_search_ops.AISearchOps(config=_get_config(),
+                                     base_index_name=base_index_name,
+                                     release_name=release_name,
+                                     index_schema_path=INDEX_SCHEMA_PATH,
+                                     indexer_def_path=INDEXER_DEF_PATH,
+                                     vectorize_flag=True,
+                                     skillset_def_path=SKILLSET_DEF_PATH)
+
+
+def _status_url(req, operation_id):
+    """Url of the request with operation_id query parameter, other parameters (function key) are kept"""
+    parts = urllib.parse.urlsplit(req.url)
+    query = dict(urllib.parse.parse_qsl(parts.query))
+    query["operation_id"] = operation_id
+    return urllib.parse.urlunsplit(parts._replace(query=urllib.parse.urlencode(query)))
+
+
+def _json_response(body, status_code, headers=None):
+    return func.HttpResponse(json.dumps(body, default=str), status_code=status_code,
+                             headers=headers, mimetype='application/json')
+
+
+def operation_status(req, operation_id):
+    """Status of the operation: 202 while accepted / running, 200 once finished, 404 if not known"""
+    record = _get_operations().get(operation_id)
+    if record is None:
+        return _json_response({"operation_id": operation_id, "error": "operation not found"}, 404)
+    if record["status"] in ("succeeded", "failed"):
+        return _json_response(record, 200)
+    return _json_response(record, 202, headers={"Location": _status_url(req, operation_id),
+                                                "Retry-After": str(STATUS_RETRY_AFTER_S)})
+
+
+def startup_metrics():
+    """Cold start measurements of this instance"""
+    return {"module_import_ms": _state["module_import_ms"],
+            "lazy_import_ms": _state["lazy_import_ms"],
+            "invocations": _state["invocations"]}
+
+
+def main(req: func.HttpRequest, msg: func.Out[str]) -> func.HttpResponse:
     log.info('Python HTTP trigger function processed a request.')
+    _state["invocations"] += 1
+    cold_start = _state["invocations"] == 1
+
+    if not os.environ.get("OPERATIONS_DIR"):
+        log.error(OPERATIONS_DIR_ERROR)
+        return func.HttpResponse(OPERATIONS_DIR_ERROR, status_code=500)
 
     try:
+        # status of a running operation
+        operation_id = req.params.get('operation_id')
+        if operation_id:
+            return operation_status(req, operation_id)
 
         #load env vars into config
-        config = load_config()
+        _get_config()
+        _get_ai_search_ops()
+
+        if cold_start:
+            log.info(f'Cold start: {startup_metrics()}')
 
         base_index_name = 'vect-index'
         #release_name = 'release-11'
         release_name = os.environ["RELEASE_NAME"]
         #folder = os.getcwd()
-    
-        # definition jsons
-        index_schema_path = './azure_ai_search_ops_v01/data/vector-index/ai_search_index_schema.json'
-        indexer_def_path = './azure_ai_search_ops_v01/data/vector-index/ai_search_indexer_vector_def_v2.json'
-        skillset_def_path = './azure_ai_search_ops_v01/data/vector-index/ai_search_skillset_vector_def_v2.json'
-        vectorize_flag = True
-        
-        aisearchops = ai_search_ops.AISearchOps(config=config, 
-                                    base_index_name=base_index_name, 
-                                    release_name=release_name,
-                                    index_schema_path=index_schema_path,
-                                    indexer_def_path=indexer_def_path,
-                                    vectorize_flag=vectorize_flag,
-                                    skillset_def_path=skillset_def_path)
-        success = aisearchops.create_search()
-        
-        if success:
-            return func.HttpResponse('Azure AI Search configuration created OK.', status_code=200)
-        else:
-            return func.HttpResponse('Azure AI Search configuration contains ERRORS.', status_code=400)
-        
+
+        # creation is run by the queue triggered worker, the caller polls the status url (asynchronous request-reply)
+        operation_id = _get_operations().accept('create_search', release_name=release_name,
+                                                base_index_name=base_index_name)
+        msg.set(json.dumps({"operation_id": operation_id, "release_name": release_name,
+                            "base_index_name": base_index_name}))
+        status_url = _status_url(req, operation_id)
+        return _json_response({"operation_id": operation_id, "status": "accepted", "status_url": status_url},
+                              202, headers={"Location": status_url, "Retry-After": str(STATUS_RETRY_AFTER_S)})
+
 
     except Exception as e:
         error_msg = "Exception while configuring Azure AI Search."
@@ -58,4 +169,4 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         return func.HttpResponse(
              error_msg,
              status_code=400
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,243 @@
+"""
+Bulk provisioning of many release stacks (index, data source, skillset, indexer) at once.
+Every manifest entry is one AISearchOps.create_search call, stacks are provisioned concurrently
+with a configurable cap. A stack stops on its first failed component, other stacks are not affected.
+Stack mode is 'create' (default, AISearchOps.create_search) or 'reconcile' (AISearchOps.reconcile_search),
+"force": true updates every existing component of a reconciled stack (e.g. rotated secrets without release state).
+With a release state file, all stacks record their components in it (see ai_search_state).
+
+Manifest (json):
+{
+    "stacks": [
+        {"base_index_name": "vect-index", "release_name": "tenant01-r1", "definition_set": "vector-index"},
+        {"base_index_name": "simple-index", "release_name": "tenant02-r1", "definition_set": "simple-index"},
+        {"base_index_name": "custom", "release_name": "r1", "index_schema_path": "...", "indexer_def_path": "...",
+         "skillset_def_path": "...", "vectorize_flag": true, "mode": "reconcile", "vector_profile": "scalar",
+         "hnsw": {"m": 8, "efSearch": 300}}
+    ]
+}
+
+Usage:
+python ai_search_batch.py --manifest manifest.json --config ../config.json --max-concurrency 8 --report report.json
+python ai_search_batch.py --manifest manifest.json --config ../config.json --state ./release_state.sqlite
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import time
+
+from azure_ai_search_ops_v01.ai_search import ai_search_ops as ais_ops
+from azure_ai_search_ops_v01.ai_search import ai_search_client as ais_client
+from azure_ai_search_ops_v01.ai_search import ai_search_retention as ais_retention
+from azure_ai_search_ops_v01.ai_search import ai_search_state as ais_state
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+# definition sets available in the data folder
+DEFINITION_SETS = {
+    'vector-index': {
+        'index_schema_path': 'vector-index/ai_search_index_schema.json',
+        'indexer_def_path': 'vector-index/ai_search_indexer_vector_def_v2.json',
+        'skillset_def_path': 'vector-index/ai_search_skillset_vector_def_v2.json',
+        'vectorize_flag': True
+    },
+    'simple-index': {
+        'index_schema_path': 'simple-index/ai_search_index_schema_v1.json',
+        'indexer_def_path': 'simple-index/ai_search_indexer_def_v1.json',
+        'skillset_def_path': '',
+        'vectorize_flag': False
+    }
+}
+
+
+def load_manifest(manifest_path):
+    """ Load manifest with stacks to provision.
+    Attributes:
+        manifest_path (str): path to manifest json file
+    Returns:
+        stacks (list): manifest entries
+    """
+    with open(manifest_path, 'r') as f:
+        data = json.loads(f.read())
+
+    # plain list of entries is accepted as well
+    if isinstance(data, list):
+        return data
+    return data["stacks"]
+
+
+def _stack_definition(entry, data_dir):
+    """ Definition paths and vectorize flag of the manifest entry.
+    Explicit paths in the entry have priority over the definition set.
+    """
+    definition = {}
+    if entry.get("definition_set"):
+        for k, v in DEFINITION_SETS[entry["definition_set"]].items():
+            definition[k] = os.path.join(data_dir, v) if k.endswith('_path') and v else v
+
+    for k in ['index_schema_path', 'indexer_def_path', 'skillset_def_path', 'vectorize_flag']:
+        if k in entry:
+            definition[k] = entry[k]
+
+    definition.setdefault('skillset_def_path', '')
+    definition.setdefault('vectorize_flag', False)
+    return definition
+
+
+def stack_names(entry):
+    """ Component names of the manifest entry before time suffix and shards (see ai_search_retention.NAMING_SCHEME). """
+    return {collection: name_format.format(base=entry.get("base_index_name"), release=entry.get("release_name"))
+            for collection, name_format in ais_retention.NAMING_SCHEME.items()}
+
+
+def name_collisions(stacks):
+    """ Manifest entries resolving to the same component names, e.g. the same release name under different bases
+    (data source, skillset and indexer names depend on the release name only).
+    Attributes:
+        stacks (list): manifest entries
+    Returns:
+        collisions (dict): entry position -> error message, for every entry sharing a name with another one
+    """
+    owners = {}
+    for i, entry in enumerate(stacks):
+        for collection, name in stack_names(entry).items():
+            owners.setdefault((collection, name), []).append(i)
+
+    collisions = {}
+    for (collection, name), positions in owners.items():
+        if len(positions) < 2:
+            continue
+        for i in positions:
+            others = [p for p in positions if p != i]
+            collisions.setdefault(i, []).append(f"{collection} '{name}' (entries {others})")
+    return {i: f"Component names collide with other manifest entries: {', '.join(shared)}."
+            for i, shared in collisions.items()}
+
+
+def _new_report(entry):
+    return {"base_index_name": entry.get("base_index_name"),
+            "release_name": entry.get("release_name"),
+            "success": False,
+            "components": {},
+            "duration_s": 0.0,
+            "error": None}
+
+
+def provision_stack(config, entry, data_dir='./data', client=None, state=None):
+    """ Provision one release stack.
+    Attributes:
+        config (dict): AI Search, data source and AOAI config
+        entry (dict): manifest entry
+        data_dir (str): folder with definition sets
+        client (AISearchClient): pooled REST client
+        state: release state store shared by all stacks, nothing is recorded if None
+    Returns:
+        report (dict): stack name, success flag, components created, duration and error
+    """
+    report = _new_report(entry)
+    start = time.perf_counter()
+
+    try:
+        definition = _stack_definition(entry, data_dir)
+        aisearchops = ais_ops.AISearchOps(config=config,
+                                          base_index_name=entry["base_index_name"],
+                                          release_name=entry["release_name"],
+                                          index_schema_path=definition["index_schema_path"],
+                                          indexer_def_path=definition["indexer_def_path"],
+                                          vectorize_flag=definition["vectorize_flag"],
+                                          skillset_def_path=definition["skillset_def_path"],
+                                          vector_profile=entry.get("vector_profile"),
+                                          hnsw=entry.get("hnsw"),
+                                          capacity=entry.get("capacity"),
+                                          client=client,
+                                          state=state)
+        if entry.get("mode", "create") == "reconcile":
+            report["success"] = aisearchops.reconcile_search(force=entry.get("force", False))
+        else:
+            report["success"] = aisearchops.create_search()
+        report["components"] = aisearchops.components
+
+    except Exception as e:
+        log.error(f"Stack '{entry.get('base_index_name')}' / '{entry.get('release_name')}' failed.")
+        log.error(e)
+        report["error"] = str(e)
+
+    report["duration_s"] = time.perf_counter() - start
+    return report
+
+
+def provision_batch(config, stacks, max_concurrency=4, data_dir='./data', client=None, state=None):
+    """ Provision all stacks concurrently, at most max_concurrency stacks at the same time.
+    Entries resolving to the same component names (see name_collisions) are rejected, nothing is provisioned for them.
+    Attributes:
+        config (dict): AI Search, data source and AOAI config
+        stacks (list): manifest entries
+        max_concurrency (int): max number of stacks provisioned at the same time
+        data_dir (str): folder with definition sets
+        client (AISearchClient): pooled REST client shared by all stacks
+        state: release state store shared by all stacks
+    Returns:
+        summary (dict): totals and per stack reports in manifest order
+    """
+    log.info(f'>>> BATCH - provisioning of {len(stacks)} stacks started (max concurrency {max_concurrency}).')
+    start = time.perf_counter()
+
+    if client is None:
+        client = ais_client.get_client(config["AISearchEndpoint"], config["AISearchAPIKey"],
+                                       ais_ops.SEARCH_API_VERSION)
+
+    reports = [None] * len(stacks)
+    collisions = name_collisions(stacks)
+    for i, error in collisions.items():
+        log.error(f">>> BATCH - stack '{stacks[i].get('base_index_name')}' / '{stacks[i].get('release_name')}' "
+                  f"is rejected. {error}")
+        reports[i] = dict(_new_report(stacks[i]), error=error)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = {executor.submit(provision_stack, config, entry, data_dir, client, state): i
+                   for i, entry in enumerate(stacks) if i not in collisions}
+        for future in concurrent.futures.as_completed(futures):
+            reports[futures[future]] = future.result()
+
+    succeeded = sum(1 for r in reports if r["success"])
+    summary = {"total": len(reports),
+               "succeeded": succeeded,
+               "failed": len(reports) - succeeded,
+               "duration_s": time.perf_counter() - start,
+               "client": client.stats() if hasattr(client, 'stats') else {},
+               "stacks": reports}
+
+    log.info(f">>> BATCH - provisioning completed: {succeeded}/{len(reports)} stacks OK "
+             f"in {summary['duration_s']:.1f} s.")
+    for r in reports:
+        if not r["success"]:
+            log.error(f">>> BATCH - stack '{r['base_index_name']}' / '{r['release_name']}' FAILED. "
+                      f"Components created: {r['components']}")
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Provision many AI Search release stacks.')
+    parser.add_argument('--manifest', required=True, help='manifest json file')
+    parser.add_argument('--config', default='../config.json', help='config json file')
+    parser.add_argument('--max-concurrency', type=int, default=4, help='max stacks provisioned at the same time')
+    parser.add_argument('--data-dir', default='./data', help='folder with definition sets')
+    parser.add_argument('--report', default='', help='save summary report to this json file')
+    parser.add_argument('--state', default='', help='release state file (.json, or .sqlite / .db)')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.loads(f.read())
+
+    summary = provision_batch(config, load_manifest(args.manifest),
+                              max_concurrency=args.max_concurrency, data_dir=args.data_dir,
+                              state=ais_state.open_state_store(args.state) if args.state else None)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(json.dumps(summary, indent=4))
+
+    exit(0 if summary["failed"] == 0 else 1)
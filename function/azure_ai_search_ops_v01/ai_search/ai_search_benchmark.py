@@ -0,0 +1,128 @@
+"""
+End-to-end provisioning benchmark against the local AI Search stand-in (ai_search_standin.py).
+For every concurrency level the same number of stacks is provisioned (ai_search_batch.py) and measured:
+stack latency (p50 / p95 / max), requests per stack, retries, time throttled and throughput (stacks/s).
+
+Usage:
+python ai_search_benchmark.py --stacks 20 --concurrency 1,4,8 --latency-ms 30 --throttle-rate 0.05 --report bench.json
+Exit code is 1 if any stack failed, so the benchmark could be used as a CI step.
+"""
+import argparse
+import json
+import time
+
+from azure_ai_search_ops_v01.ai_search import ai_search_batch as ais_batch
+from azure_ai_search_ops_v01.ai_search import ai_search_client as ais_client
+from azure_ai_search_ops_v01.ai_search import ai_search_ops as ais_ops
+from azure_ai_search_ops_v01.ai_search import ai_search_standin as ais_standin
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+def _percentile(values, p):
+    """ Nearest-rank percentile, 0.0 for empty list. """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    rank = max(0, min(len(values) - 1, int(round(p / 100 * len(values) + 0.5)) - 1))
+    return values[rank]
+
+
+def _config(endpoint):
+    """ Config pointing to the stand-in, other resources are dummies. """
+    return {"AISearchEndpoint": endpoint, "AISearchAPIKey": "standin-key",
+            "StorageAcc": "standin", "StorageAccConnStr": "DefaultEndpointsProtocol=https;AccountName=standin",
+            "StorageAccContainer": "data", "StorageAccFolder": "docs",
+            "AOAIResource": "https://standin.openai.azure.com", "AOAIAPIKEY": "standin",
+            "AOAIDeploymentID": "text-embedding-ada-002", "AOAIModelName": "text-embedding-ada-002"}
+
+
+def run_provisioning_benchmark(stacks=20, concurrency_levels=(1, 4, 8), definition_set='vector-index',
+                               data_dir='./data', mode='create', **standin_kwargs):
+    """ Provision stacks on a fresh stand-in for every concurrency level.
+    Attributes:
+        stacks (int): number of stacks provisioned per concurrency level
+        concurrency_levels (list): max concurrency values to measure
+        definition_set (str): definition set of ai_search_batch.DEFINITION_SETS
+        data_dir (str): folder with definition sets
+        mode (str): create or reconcile
+        standin_kwargs: latency / throttling / error settings of AISearchStandIn
+    Returns:
+        results (list): one result dict per concurrency level
+    """
+    results = []
+    for concurrency in concurrency_levels:
+        with ais_standin.AISearchStandIn(**standin_kwargs) as standin:
+            config = _config(standin.endpoint)
+            client = ais_client.AISearchClient(standin.endpoint, config["AISearchAPIKey"],
+                                               ais_ops.SEARCH_API_VERSION, pool_maxsize=max(16, concurrency * 4))
+            manifest = [{"base_index_name": "bench-index", "release_name": f"r{i:04d}",
+                         "definition_set": definition_set, "mode": mode} for i in range(stacks)]
+
+            summary = ais_batch.provision_batch(config, manifest, max_concurrency=concurrency,
+                                                data_dir=data_dir, client=client)
+            latencies = [r["duration_s"] for r in summary["stacks"]]
+            stats = client.stats()
+
+            result = {"concurrency": concurrency,
+                      "stacks": stacks,
+                      "succeeded": summary["succeeded"],
+                      "failed": summary["failed"],
+                      "wall_s": summary["duration_s"],
+                      "stacks_per_s": stacks / summary["duration_s"] if summary["duration_s"] else 0.0,
+                      "stack_p50_s": _percentile(latencies, 50),
+                      "stack_p95_s": _percentile(latencies, 95),
+                      "stack_max_s": max(latencies) if latencies else 0.0,
+                      "requests_per_stack": standin.state.total_requests() / stacks if stacks else 0.0,
+                      "request_avg_ms": stats["avg_s"] * 1000,
+                      "retries": stats["retries"],
+                      "throttled_s": stats["throttled_s"]}
+            client.close()
+        results.append(result)
+    return results
+
+
+def format_table(results):
+    """ Benchmark results as a text table. """
+    columns = ['concurrency', 'succeeded', 'failed', 'wall_s', 'stacks_per_s', 'stack_p50_s', 'stack_p95_s',
+               'requests_per_stack', 'request_avg_ms', 'retries', 'throttled_s']
+    lines = [' '.join(f'{c:>18}' for c in columns)]
+    for r in results:
+        lines.append(' '.join(f'{r[c]:>18.3f}' if isinstance(r[c], float) else f'{r[c]:>18}' for c in columns))
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Offline provisioning benchmark against the AI Search stand-in.')
+    parser.add_argument('--stacks', type=int, default=20, help='stacks provisioned per concurrency level')
+    parser.add_argument('--concurrency', default='1,4,8', help='comma separated concurrency levels')
+    parser.add_argument('--definition-set', default='vector-index', choices=list(ais_batch.DEFINITION_SETS))
+    parser.add_argument('--mode', default='create', choices=['create', 'reconcile'])
+    parser.add_argument('--data-dir', default='./data')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='stand-in latency per request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='stand-in random latency on top')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--retry-after', type=float, default=0.1, help='Retry-After of throttled responses')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--report', default='', help='save results to this json file')
+    args = parser.parse_args()
+
+    log.getLogger().setLevel(log.WARNING)
+    start = time.perf_counter()
+    results = run_provisioning_benchmark(stacks=args.stacks,
+                                         concurrency_levels=[int(c) for c in args.concurrency.split(',')],
+                                         definition_set=args.definition_set, data_dir=args.data_dir,
+                                         mode=args.mode,
+                                         latency_s=args.latency_ms / 1000, latency_jitter_s=args.jitter_ms / 1000,
+                                         throttle_rate=args.throttle_rate, error_rate=args.error_rate,
+                                         retry_after_s=args.retry_after, seed=args.seed)
+    print(format_table(results))
+    print(f'Benchmark completed in {time.perf_counter() - start:.1f} s.')
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(json.dumps(results, indent=4))
+
+    exit(0 if all(r["failed"] == 0 for r in results) else 1)
@@ -0,0 +1,204 @@
+"""
+Capacity and partition planner of a release index.
+Rendered index schema (vector dimensions, compression, field attributes) and corpus profile (documents, document
+size, chunking of the skillset SplitSkill) give estimated vector index size and total storage, partitions needed
+for them and replicas needed for the target QPS. The plan is checked against service tier limits.
+https://learn.microsoft.com/en-us/azure/search/search-limits-quotas-capacity
+
+Usage:
+python ai_search_capacity.py --documents 2000000 --avg-document-chars 12000 --tier standard --target-qps 50
+"""
+import argparse
+import json
+import math
+
+from azure_ai_search_ops_v01.ai_search import ai_search_template as ais_template
+from azure_ai_search_ops_v01.ai_search import ai_search_vector_profiles as ais_vector_profiles
+from azure_ai_search_ops_v01.ai_search import ai_search_vectorize as ais_vectorize
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+GB = 1024 ** 3
+
+# limits per partition (services created after April 2024), max partitions / replicas / search units / indexes
+# qps_per_replica is a planning assumption (simple queries), measure with the query load test for the real workload
+SERVICE_TIERS = {
+    'basic': {"storage_gb": 15, "vector_gb": 5, "max_partitions": 3, "max_replicas": 3, "max_units": 9,
+              "max_indexes": 15, "qps_per_replica": 15},
+    'standard': {"storage_gb": 160, "vector_gb": 35, "max_partitions": 12, "max_replicas": 12, "max_units": 36,
+                 "max_indexes": 50, "qps_per_replica": 50},
+    'standard2': {"storage_gb": 512, "vector_gb": 150, "max_partitions": 12, "max_replicas": 12, "max_units": 36,
+                  "max_indexes": 200, "qps_per_replica": 100},
+    'standard3': {"storage_gb": 1024, "vector_gb": 300, "max_partitions": 12, "max_replicas": 12, "max_units": 36,
+                  "max_indexes": 200, "qps_per_replica": 150},
+    'storage_optimized_l1': {"storage_gb": 2048, "vector_gb": 150, "max_partitions": 12, "max_replicas": 12,
+                             "max_units": 36, "max_indexes": 10, "qps_per_replica": 20},
+    'storage_optimized_l2': {"storage_gb": 4096, "vector_gb": 300, "max_partitions": 12, "max_replicas": 12,
+                             "max_units": 36, "max_indexes": 10, "qps_per_replica": 20},
+}
+
+# partition counts the service allows (divisors of 12)
+PARTITION_COUNTS = [1, 2, 3, 4, 6, 12]
+
+# inverted index / doc values overhead of string fields as share of the raw text
+_SEARCHABLE_OVERHEAD = 0.5
+_ATTRIBUTE_OVERHEAD = 0.25
+
+_DEFAULT_STRING_CHARS = 64
+_NUMBER_BYTES = 8
+
+
+def chunks_per_document(avg_document_chars, max_page_length, page_overlap_length):
+    """ Average number of SplitSkill pages of a document. """
+    if avg_document_chars <= max_page_length:
+        return 1
+    return math.ceil((avg_document_chars - page_overlap_length) / (max_page_length - page_overlap_length))
+
+
+def corpus_profile(documents, avg_document_chars, skillset_def_path='', text_field=None, field_chars=None):
+    """ Corpus profile of the release.
+    Attributes:
+        documents (int): number of source documents
+        avg_document_chars (int): average extracted text length of a document
+        skillset_def_path (str): skillset definition, chunking of its SplitSkill is used (one chunk per document if empty)
+        text_field (str): index field holding the document / chunk text, 'chunk' with skillset else 'content'
+        field_chars (dict): average length of other string fields, 64 if not set
+    Returns:
+        profile (dict): documents, chunks_per_document, index_documents, text_field, avg_text_chars, field_chars
+    """
+    if skillset_def_path:
+        split = ais_vectorize.split_settings(skillset_def_path)
+        chunks = chunks_per_document(avg_document_chars, split["max_page_length"], split["page_overlap_length"])
+        if split["max_pages"]:
+            chunks = min(chunks, split["max_pages"])
+        avg_text_chars = min(avg_document_chars, split["max_page_length"])
+        text_field = text_field or 'chunk'
+    else:
+        chunks = 1
+        avg_text_chars = avg_document_chars
+        text_field = text_field or 'content'
+
+    return {"documents": documents,
+            "chunks_per_document": chunks,
+            "index_documents": documents * chunks,
+            "text_field": text_field,
+            "avg_text_chars": avg_text_chars,
+            "field_chars": dict(field_chars or {})}
+
+
+def estimate_storage(index_data, profile):
+    """ Estimated index size.
+    Attributes:
+        index_data (dict): rendered index definition
+        profile (dict): corpus profile
+    Returns:
+        estimate (dict): index documents, vector index bytes, text / vector disk bytes and total storage bytes
+    """
+    count = profile["index_documents"]
+
+    per_document = 0.0
+    for field in index_data.get("fields", []):
+        if field.get("dimensions"):
+            continue
+        if field.get("type") == 'Edm.String':
+            chars = profile["avg_text_chars"] if field["name"] == profile["text_field"] \
+                else profile["field_chars"].get(field["name"], _DEFAULT_STRING_CHARS)
+            overhead = 1.0 if field.get("stored", True) else 0.0
+            if field.get("searchable"):
+                overhead += _SEARCHABLE_OVERHEAD
+            overhead += _ATTRIBUTE_OVERHEAD * sum(1 for a in ('filterable', 'sortable', 'facetable') if field.get(a))
+            per_document += chars * overhead
+        else:
+            per_document += _NUMBER_BYTES
+
+    vectors = ais_vector_profiles.estimate_vector_storage(index_data, count)
+    text_bytes = int(per_document * count)
+    return {"index_documents": count,
+            "vector_index_bytes": vectors["vector_index_bytes"],
+            "text_bytes": text_bytes,
+            "vector_disk_bytes": vectors["disk_bytes"],
+            "storage_bytes": text_bytes + vectors["disk_bytes"]}
+
+
+def plan_capacity(index_data, profile, tier='standard', target_qps=0, min_replicas=1, headroom=0.8,
+                  provisioned=None):
+    """ Partitions and replicas needed for the index and check against the service tier.
+    Attributes:
+        index_data (dict): rendered index definition
+        profile (dict): corpus profile (see corpus_profile)
+        tier (str): SERVICE_TIERS key
+        target_qps (float): target queries per second
+        min_replicas (int): min replicas (2 for read SLA, 3 for read-write SLA)
+        headroom (float): share of partition storage / vector quota planned to be used
+        provisioned (dict): partitions / replicas of the existing service, checked if provided
+    Returns:
+        report (dict): estimate, partitions, replicas, search units, fits flag and reasons
+    """
+    if tier not in SERVICE_TIERS:
+        raise ValueError(f"Unknown service tier '{tier}', available: {list(SERVICE_TIERS)}.")
+    limits = SERVICE_TIERS[tier]
+    estimate = estimate_storage(index_data, profile)
+
+    storage_partitions = math.ceil(estimate["storage_bytes"] / (limits["storage_gb"] * GB * headroom))
+    vector_partitions = math.ceil(estimate["vector_index_bytes"] / (limits["vector_gb"] * GB * headroom))
+    needed = max(1, storage_partitions, vector_partitions)
+    partitions = next((p for p in PARTITION_COUNTS if p >= needed), needed)
+    replicas = max(min_replicas, math.ceil(target_qps / limits["qps_per_replica"]) if target_qps else 1)
+
+    reasons = []
+    if partitions > limits["max_partitions"]:
+        reasons.append(f'{partitions} partitions needed, {tier} allows {limits["max_partitions"]}')
+    if replicas > limits["max_replicas"]:
+        reasons.append(f'{replicas} replicas needed, {tier} allows {limits["max_replicas"]}')
+    if partitions * replicas > limits["max_units"]:
+        reasons.append(f'{partitions * replicas} search units needed, {tier} allows {limits["max_units"]}')
+    if provisioned:
+        if provisioned.get("partitions") is not None and provisioned["partitions"] < partitions:
+            reasons.append(f'{partitions} partitions needed, {provisioned["partitions"]} provisioned')
+        if provisioned.get("replicas") is not None and provisioned["replicas"] < replicas:
+            reasons.append(f'{replicas} replicas needed, {provisioned["replicas"]} provisioned')
+
+    return {"tier": tier,
+            "target_qps": target_qps,
+            "profile": profile,
+            "estimate": estimate,
+            "storage_gb": estimate["storage_bytes"] / GB,
+            "vector_index_gb": estimate["vector_index_bytes"] / GB,
+            "partitions": partitions,
+            "replicas": replicas,
+            "search_units": partitions * replicas,
+            "fits": not reasons,
+            "reasons": reasons}
+
+
+def format_plan(report):
+    """ One line summary of the capacity plan. """
+    status = 'fits' if report["fits"] else f'does NOT fit ({"; ".join(report["reasons"])})'
+    return (f'{report["estimate"]["index_documents"]} index documents, storage {report["storage_gb"]:.2f} GB, '
+            f'vector index {report["vector_index_gb"]:.2f} GB -> {report["partitions"]} partitions x '
+            f'{report["replicas"]} replicas ({report["search_units"]} SU) on {report["tier"]}: {status}.')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Plan partitions and replicas of the release index.')
+    parser.add_argument('--index-schema', default='./data/vector-index/ai_search_index_schema.json')
+    parser.add_argument('--skillset-def', default='./data/vector-index/ai_search_skillset_vector_def_v2.json',
+                        help='skillset with SplitSkill, empty - one index document per source document')
+    parser.add_argument('--documents', type=int, required=True, help='number of source documents')
+    parser.add_argument('--avg-document-chars', type=int, required=True, help='average document text length')
+    parser.add_argument('--tier', default='standard', choices=list(SERVICE_TIERS))
+    parser.add_argument('--target-qps', type=float, default=0)
+    parser.add_argument('--min-replicas', type=int, default=1)
+    parser.add_argument('--vector-profile', default=None, choices=list(ais_vector_profiles.VECTOR_PROFILES))
+    args = parser.parse_args()
+
+    index_data = json.loads(json.dumps(ais_template.load_template(args.index_schema)))
+    if args.vector_profile:
+        ais_vector_profiles.apply_vector_profile(index_data, args.vector_profile)
+
+    report = plan_capacity(index_data, corpus_profile(args.documents, args.avg_document_chars, args.skillset_def),
+                           tier=args.tier, target_qps=args.target_qps, min_replicas=args.min_replicas)
+    log.info(f'CAPACITY: {format_plan(report)}')
+    print(json.dumps(report, indent=4))
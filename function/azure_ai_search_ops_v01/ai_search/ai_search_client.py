@@ -0,0 +1,331 @@
+import collections
+import email.utils
+import random
+import re
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from azure_ai_search_ops_v01.ai_search import ai_search_telemetry as ais_telemetry
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=5, backoff_base=0.5, backoff_max=30.0,
+                 retry_statuses=(429, 502, 503, 504), throttle_statuses=(429, 503),
+                 idempotent_methods=('GET', 'PUT', 'DELETE', 'HEAD')):
+        """
+        Retry policy shared by all REST calls: exponential backoff with full jitter, Retry-After is respected.
+        Idempotent methods (GET, PUT, DELETE) are retried on retry statuses and connection errors / timeouts.
+        POST is retried only on throttling (429, 503) - request was rejected by the service, not processed.
+
+        Args:
+            max_retries (int): max number of retries of one call
+            backoff_base (float): first backoff in seconds, doubled on every retry
+            backoff_max (float): longest backoff (and Retry-After) in seconds
+            retry_statuses (tuple): status codes retried for idempotent methods
+            throttle_statuses (tuple): status codes meaning the service is throttling
+            idempotent_methods (tuple): methods safe to retry
+        """
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_statuses = retry_statuses
+        self.throttle_statuses = throttle_statuses
+        self.idempotent_methods = idempotent_methods
+
+    def should_retry(self, method, status_code=None, error=None):
+        """ Retry decision for the attempt result (status code or connection error). """
+        if error is not None:
+            return method in self.idempotent_methods
+        if status_code in self.throttle_statuses:
+            return True
+        return status_code in self.retry_statuses and method in self.idempotent_methods
+
+    def delay(self, attempt, rr=None):
+        """ Seconds to wait before the retry: Retry-After of the response or exponential backoff with jitter. """
+        retry_after = _retry_after(rr) if rr is not None else None
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+
+def _retry_after(rr):
+    """ Retry-After (or retry-after-ms) of the response in seconds, None if not set. """
+    value = rr.headers.get('retry-after-ms')
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = rr.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    # HTTP date, malformed value (e.g. 'soon') - backoff of the retry policy is used
+    try:
+        date = email.utils.parsedate_to_datetime(value)
+    except (ValueError, TypeError):
+        return None
+    return max(0.0, date.timestamp() - time.time()) if date else None
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        """
+        Per endpoint circuit breaker: after failure_threshold consecutive failed attempts the endpoint
+        is not called for reset_timeout seconds, then one trial call is let through (half open) - concurrent
+        callers are rejected until its result is recorded (or it is not recorded within reset_timeout).
+
+        Args:
+            failure_threshold (int): consecutive failures which open the circuit
+            reset_timeout (float): seconds the circuit stays open
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = {}
+        self._opened_at = {}
+        # half open endpoints - start of the trial call
+        self._half_open = {}
+        self._lock = threading.Lock()
+
+    def allow(self, endpoint):
+        with self._lock:
+            now = time.monotonic()
+            trial_at = self._half_open.get(endpoint)
+            if trial_at is not None:
+                # trial call in flight, another one only if its result was never recorded
+                if now - trial_at < self.reset_timeout:
+                    return False
+                self._half_open[endpoint] = now
+                return True
+            opened_at = self._opened_at.get(endpoint)
+            if opened_at is None:
+                return True
+            if now - opened_at >= self.reset_timeout:
+                # half open - one trial call, circuit is open again if it fails
+                self._opened_at.pop(endpoint)
+                self._half_open[endpoint] = now
+                self._failures[endpoint] = self.failure_threshold - 1
+                return True
+            return False
+
+    def record(self, endpoint, success):
+        with self._lock:
+            self._half_open.pop(endpoint, None)
+            if success:
+                self._failures[endpoint] = 0
+                return
+            self._failures[endpoint] = self._failures.get(endpoint, 0) + 1
+            if self._failures[endpoint] >= self.failure_threshold and endpoint not in self._opened_at:
+                self._opened_at[endpoint] = time.monotonic()
+                log.warning(f"CIRCUIT OPEN: '{endpoint}' after {self._failures[endpoint]} failures.")
+
+
+class AISearchClient:
+    def __init__(self, ai_search_resource, ai_search_apikey, search_api_version,
+                 connect_timeout=5, read_timeout=60, pool_maxsize=16, max_call_records=1000,
+                 retry_policy=None, circuit_breaker=None):
+        """
+        Pooled REST client for one Azure AI Search service.
+        One requests.Session is kept per client, so keep-alive connections (TCP + TLS)
+        and the api-key headers are reused by all calls.
+
+        Args:
+            ai_search_resource (str): Azure AI Search resource (endpoint url)
+            ai_search_apikey (str): Azure AI Search API key
+            search_api_version (str): Azure AI Search API version
+            connect_timeout (float): connect timeout in seconds
+            read_timeout (float): read timeout in seconds
+            pool_maxsize (int): max number of kept-alive connections to the service
+            max_call_records (int): number of last calls kept with their latency
+            retry_policy (RetryPolicy): retry policy, default policy if not provided
+            circuit_breaker (CircuitBreaker): per endpoint circuit breaker, default breaker if not provided
+        """
+        self.ai_search_resource = ai_search_resource.rstrip('/')
+        self.search_api_version = search_api_version
+        self.timeout = (connect_timeout, read_timeout)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({
+            "Content-Type": "application/json",
+            "api-key": ai_search_apikey
+        })
+
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+
+        # (method, path, status code, latency in seconds) of the last calls (every attempt)
+        self.calls = collections.deque(maxlen=max_call_records)
+        # retries made, throttled responses and seconds waited because of throttling
+        self.retry_stats = {"retries": 0, "throttled": 0, "throttled_s": 0.0, "circuit_open": 0}
+        self._lock = threading.Lock()
+
+    def url(self, path):
+        """ Full service url for the path, e.g. 'indexes' or "indexes('name')". """
+        return f"{self.ai_search_resource}/{path.lstrip('/')}"
+
+    def _send(self, method, path, data, query, attempt=0):
+        """ One attempt, latency is recorded, span with status code and bytes (see ai_search_telemetry). """
+        endpoint = _endpoint(path)
+        with ais_telemetry.span(f'{method} {endpoint}', ais_telemetry.REST, method=method, path=path,
+                                endpoint=endpoint, attempt=attempt,
+                                request_bytes=len(data) if data else 0) as span:
+            start = time.perf_counter()
+            status_code = None
+            try:
+                rr = self.session.request(method, self.url(path), params=query, data=data,
+                                          timeout=self.timeout)
+                status_code = rr.status_code
+            finally:
+                latency = time.perf_counter() - start
+                with self._lock:
+                    self.calls.append((method, path, status_code, latency))
+                log.debug(f"{method} {path} [{status_code}] {latency * 1000:.1f} ms")
+
+            span["attributes"].update(status_code=status_code, response_bytes=len(rr.content))
+            if status_code >= 400:
+                span["status"] = ais_telemetry.ERROR
+        return rr
+
+    def request(self, method, path, data=None, params=None):
+        """ Send REST request to the service, transient failures are retried (see RetryPolicy).
+        Attributes:
+            method (str): HTTP method
+            path (str): path relative to the service endpoint
+            data (str): request body
+            params (dict): extra query parameters, api-version is always added
+        Returns:
+            rr (requests.Response): service response (last attempt)
+        """
+        query = {"api-version": self.search_api_version}
+        if params:
+            query.update(params)
+
+        endpoint = _endpoint(path)
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow(endpoint):
+                with self._lock:
+                    self.retry_stats["circuit_open"] += 1
+                raise CircuitOpenError(f"Circuit for '{endpoint}' is open, {method} {path} is not sent.")
+
+            rr, error = None, None
+            try:
+                rr = self._send(method, path, data, query, attempt)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            except Exception:
+                # not retried, still a failed attempt of the endpoint (it could be the half open trial call)
+                self.circuit_breaker.record(endpoint, False)
+                raise
+
+            status_code = rr.status_code if rr is not None else None
+            failed = error is not None or status_code in self.retry_policy.retry_statuses
+            # throttling (429, 503) is handled by Retry-After, only errors of the endpoint open the circuit
+            self.circuit_breaker.record(endpoint, error is None and (
+                status_code < 500 or status_code in self.retry_policy.throttle_statuses))
+
+            if not failed or attempt >= self.retry_policy.max_retries \
+                    or not self.retry_policy.should_retry(method, status_code, error):
+                if error is not None:
+                    raise error
+                return rr
+
+            delay = self.retry_policy.delay(attempt, rr)
+            throttled = status_code in self.retry_policy.throttle_statuses
+            with self._lock:
+                self.retry_stats["retries"] += 1
+                if throttled:
+                    self.retry_stats["throttled"] += 1
+                    self.retry_stats["throttled_s"] += delay
+
+            log.warning(f"{method} {path} [{status_code or error}] - retry {attempt + 1} in {delay:.2f} s.")
+            time.sleep(delay)
+            attempt += 1
+
+    def get(self, path, params=None):
+        return self.request('GET', path, params=params)
+
+    def post(self, path, data=None, params=None):
+        return self.request('POST', path, data=data, params=params)
+
+    def put(self, path, data=None, params=None):
+        return self.request('PUT', path, data=data, params=params)
+
+    def delete(self, path, params=None):
+        return self.request('DELETE', path, params=params)
+
+    @property
+    def last_latency(self):
+        """ Latency in seconds of the last call, None if nothing was called yet. """
+        with self._lock:
+            return self.calls[-1][3] if self.calls else None
+
+    def latency_summary(self):
+        """ Summary of the recorded calls.
+        Returns:
+            summary (dict): calls count, total/avg/max latency in seconds
+        """
+        with self._lock:
+            latencies = [c[3] for c in self.calls]
+
+        if not latencies:
+            return {"calls": 0, "total_s": 0.0, "avg_s": 0.0, "max_s": 0.0}
+
+        return {"calls": len(latencies),
+                "total_s": sum(latencies),
+                "avg_s": sum(latencies) / len(latencies),
+                "max_s": max(latencies)}
+
+    def stats(self):
+        """ Latency summary and retry stats of the client. """
+        summary = self.latency_summary()
+        with self._lock:
+            summary.update(self.retry_stats)
+        return summary
+
+    def close(self):
+        self.session.close()
+
+
+def _endpoint(path):
+    """ Endpoint (collection) of the path, e.g. indexes for "indexes('name')/docs/index". """
+    return re.split(r"[/(?]", path.lstrip('/'), maxsplit=1)[0]
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(ai_search_resource, ai_search_apikey, search_api_version):
+    """ Shared client for the service, created on first use and reused afterwards.
+    Attributes:
+        ai_search_resource (str): Azure AI Search resource
+        ai_search_apikey (str): Azure AI Search API key
+        search_api_version (str): Azure AI Search API version
+    Returns:
+        client (AISearchClient): pooled client
+    """
+    key = (ai_search_resource, ai_search_apikey, search_api_version)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = AISearchClient(ai_search_resource, ai_search_apikey, search_api_version)
+            _clients[key] = client
+    return client
@@ -0,0 +1,200 @@
+"""
+Persistent embedding cache shared by releases.
+Embeddings are stored in a local SQLite file keyed by (model name, dimensions, chunk text hash), so a new release
+only pays Azure OpenAI latency and quota for chunks which are new. Least recently used embeddings are evicted
+when the cache grows over its size limit. Vectors are stored as float32 (the precision of Edm.Single fields).
+
+Usage:
+python ai_search_embedding_cache.py --cache ./embeddings.sqlite --stats
+python ai_search_embedding_cache.py --cache ./embeddings.sqlite --clear
+"""
+import argparse
+import array
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+
+# evicted down to this share of max_bytes, so eviction does not run on every insert
+_EVICT_TO = 0.9
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    text_hash TEXT NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, dimensions, text_hash)
+);
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def text_hash(text):
+    """ Content hash of the chunk text. """
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _pack(vector):
+    return array.array('f', vector).tobytes()
+
+
+def _unpack(blob):
+    vector = array.array('f')
+    vector.frombytes(blob)
+    return vector.tolist()
+
+
+class EmbeddingCache:
+    def __init__(self, path, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        SQLite embedding store, safe to share by threads of one process.
+
+        Args:
+            path (str): SQLite file path (':memory:' for a throwaway cache)
+            max_bytes (int): max size of stored vectors, least recently used are evicted above it
+        """
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._size = self._conn.execute('SELECT COALESCE(SUM(LENGTH(vector)), 0) FROM embeddings').fetchone()[0]
+
+    def get_many(self, model, dimensions, hashes):
+        """ Cached embeddings of the text hashes.
+        Returns:
+            vectors (dict): text hash -> vector, only for hashes found
+        """
+        hashes = list(set(hashes))
+        found = {}
+        now = time.time()
+        with self._lock:
+            # stay below sqlite max number of query variables
+            for i in range(0, len(hashes), 500):
+                part = hashes[i:i + 500]
+                rows = self._conn.execute(
+                    f'SELECT text_hash, vector FROM embeddings WHERE model = ? AND dimensions = ? '
+                    f'AND text_hash IN ({",".join("?" * len(part))})', [model, dimensions] + part).fetchall()
+                found.update((h, _unpack(blob)) for h, blob in rows)
+            if found:
+                self._conn.executemany('UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? '
+                                       'AND text_hash = ?', [(now, model, dimensions, h) for h in found])
+                self._conn.commit()
+        return found
+
+    def put_many(self, model, dimensions, vectors):
+        """ Store embeddings.
+        Attributes:
+            model (str): embedding model name
+            dimensions (int): vector dimensions
+            vectors (dict): text hash -> vector
+        """
+        now = time.time()
+        rows = [(model, dimensions, h, _pack(v), now) for h, v in vectors.items()]
+        with self._lock:
+            for row in rows:
+                # already stored by another thread / run - nothing inserted
+                cursor = self._conn.execute('INSERT OR IGNORE INTO embeddings '
+                                            '(model, dimensions, text_hash, vector, last_used) VALUES (?, ?, ?, ?, ?)', row)
+                if cursor.rowcount:
+                    self._size += len(row[3])
+            if self._size > self.max_bytes:
+                self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """ Delete least recently used embeddings until the cache is below its size limit (lock is held). """
+        target = self.max_bytes * _EVICT_TO
+        evicted = 0
+        rows = self._conn.execute('SELECT rowid, LENGTH(vector) FROM embeddings ORDER BY last_used')
+        to_delete = []
+        for rowid, size in rows:
+            if self._size <= target:
+                break
+            to_delete.append((rowid,))
+            self._size -= size
+            evicted += 1
+        self._conn.executemany('DELETE FROM embeddings WHERE rowid = ?', to_delete)
+        log.info(f'EMBEDDING CACHE: {evicted} embeddings evicted, {self._size / 1024 ** 2:.1f} MB kept.')
+
+    def stats(self):
+        """ Number of embeddings and stored size. """
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        return {"embeddings": count, "bytes": self._size, "max_bytes": self.max_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute('DELETE FROM embeddings')
+            self._conn.commit()
+            self._size = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddingBackend:
+    def __init__(self, backend, cache):
+        """
+        Embedding backend wrapper: only texts missing in the cache are sent to the backend.
+
+        Args:
+            backend: embedding backend with model_name, dimensions and embed(texts)
+            cache (EmbeddingCache): embedding store
+        """
+        self.backend = backend
+        self.cache = cache
+        self.model_name = backend.model_name
+        self.dimensions = backend.dimensions
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def embed(self, texts):
+        """ Embeddings of the texts, in the same order. """
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_name, self.dimensions, hashes)
+
+        # same text repeated in the batch is embedded once
+        missing = {h: text for h, text in zip(hashes, texts) if h not in vectors}
+        if missing:
+            embedded = dict(zip(missing, self.backend.embed(list(missing.values()))))
+            self.cache.put_many(self.model_name, self.dimensions, embedded)
+            vectors.update(embedded)
+
+        with self._lock:
+            self.misses += len(missing)
+            self.hits += len(texts) - len(missing)
+        return [vectors[h] for h in hashes]
+
+    def cache_stats(self):
+        """ Hits, misses and hit rate of this run. """
+        with self._lock:
+            total = self.hits + self.misses
+            return {"cache_hits": self.hits, "cache_misses": self.misses,
+                    "cache_hit_rate": self.hits / total if total else 0.0}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or clear the local embedding cache.')
+    parser.add_argument('--cache', required=True, help='SQLite cache file')
+    parser.add_argument('--stats', action='store_true', help='print number of embeddings and size')
+    parser.add_argument('--clear', action='store_true', help='delete all embeddings')
+    args = parser.parse_args()
+
+    cache = EmbeddingCache(args.cache)
+    if args.clear:
+        cache.clear()
+    print(json.dumps(cache.stats(), indent=4))
+    cache.close()
@@ -0,0 +1,285 @@
+"""
+HNSW parameter sweep of the vector index: index variants over m, efConstruction, efSearch and metric are created
+side by side ({base}-hnsw-m4-efc400-efs500-cosine), loaded with the same chunk set and queried with the same query vectors.
+Recall@k against known neighbours, query latency and estimated vector index memory are reported per variant,
+the chosen parameters could be set by AISearchOps(..., hnsw={...}) or "hnsw" of a batch manifest entry.
+Queries are sent to all variants query by query, so load drift of the service affects all variants alike.
+Known neighbours are taken from the query file ("neighbors": chunk keys) or computed exactly from the chunk vectors.
+https://learn.microsoft.com/en-us/azure/search/vector-search-ranking#creating-the-hnsw-graph
+
+Chunk file: json lines with key and vector field, pushed as is to every variant.
+Query file: json lines {"vector": [...], "neighbors": ["chunk key", ...]}, neighbors are optional.
+
+Usage:
+python ai_search_hnsw_sweep.py --base-index-name sweep --chunks ./chunks.jsonl --queries ./queries.jsonl --m 4,8 --ef-construction 200,400 --ef-search 100,500 --config ../config.json
+python ai_search_hnsw_sweep.py --standin --synthetic 500 --m 4,10 --ef-search 100,500
+"""
+import argparse
+import concurrent.futures
+import itertools
+import json
+import math
+import random
+import time
+
+from azure_ai_search_ops_v01.ai_search import ai_search_benchmark as ais_benchmark
+from azure_ai_search_ops_v01.ai_search import ai_search_client as ais_client
+from azure_ai_search_ops_v01.ai_search import ai_search_index as ais_index
+from azure_ai_search_ops_v01.ai_search import ai_search_push as ais_push
+from azure_ai_search_ops_v01.ai_search import ai_search_query as ais_query
+from azure_ai_search_ops_v01.ai_search import ai_search_retention as ais_retention
+from azure_ai_search_ops_v01.ai_search import ai_search_standin as ais_standin
+from azure_ai_search_ops_v01.ai_search import ai_search_template as ais_template
+from azure_ai_search_ops_v01.ai_search import ai_search_vector_profiles as ais_vector_profiles
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+# seconds to wait until pushed chunks are searchable in every variant
+SEARCHABLE_TIMEOUT_S = 120
+
+
+def sweep_variants(m=(4,), ef_construction=(400,), ef_search=(500,), metrics=('cosine',)):
+    """ HNSW parameters of every combination of the values. """
+    return [{"m": a, "efConstruction": b, "efSearch": c, "metric": d}
+            for a, b, c, d in itertools.product(m, ef_construction, ef_search, metrics)]
+
+
+def variant_index_name(base_index_name, hnsw):
+    """ Index name of the variant, e.g. sweep-hnsw-m4-efc400-efs500-cosine. """
+    return f'{base_index_name}-hnsw-m{hnsw["m"]}-efc{hnsw["efConstruction"]}-efs{hnsw["efSearch"]}-' \
+           f'{hnsw["metric"].lower()}'
+
+
+def render_variants(base_index_name, index_schema_path, variants, openai_resource, openai_apikey,
+                    openai_deploymentid, openai_modelname):
+    """ Index definitions of the variants.
+    Returns:
+        definitions (list): (index name, hnsw parameters, index definition) per variant
+    """
+    definitions = []
+    for hnsw in variants:
+        name = variant_index_name(base_index_name, hnsw)
+        # out of range parameters fail here, before anything is created
+        ais_vector_profiles.apply_hnsw_parameters({}, hnsw)
+        success, data = ais_index._prep_update_definition_json(name, index_schema_path, True, openai_resource,
+                                                               openai_apikey, openai_deploymentid, openai_modelname,
+                                                               hnsw=hnsw)
+        if not success:
+            raise RuntimeError(f"'{name}' index definition is NOT rendered.")
+        definitions.append((name, hnsw, data))
+    return definitions
+
+
+def _similarity(metric, a, b):
+    """ Similarity of the vectors, higher is closer. """
+    dot = sum(x * y for x, y in zip(a, b))
+    if metric == 'dotProduct':
+        return dot
+    if metric == 'euclidean':
+        return -math.sqrt(sum((x - y) ** 2 for x, y in zip(a, b)))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def exact_neighbors(chunks, key_field, vector_field, vector, metric, k):
+    """ Keys of the k nearest chunks of the vector (exhaustive search). """
+    scored = sorted(chunks, key=lambda c: _similarity(metric, vector, c[vector_field]), reverse=True)
+    return [c[key_field] for c in scored[:k]]
+
+
+def _create_and_load(client, name, data, chunks, key_field, max_in_flight):
+    rr = client.put(f"indexes('{name}')", data=json.dumps(data))
+    if rr.status_code not in [200, 201, 204]:
+        log.error(f"[{rr.status_code}]: '{name}' index is NOT created. {rr.text}")
+        return False
+    summary = ais_push.push_documents(client, name, key_field, chunks, max_in_flight=max_in_flight)
+    return summary["failed"] == 0
+
+
+def _wait_searchable(client, names, count, timeout_s=SEARCHABLE_TIMEOUT_S):
+    """ Wait until every index reports count documents. """
+    deadline = time.monotonic() + timeout_s
+    pending = set(names)
+    while pending and time.monotonic() < deadline:
+        for name in list(pending):
+            rr = client.get(f"indexes('{name}')/docs/$count")
+            if rr.status_code == 200 and int(rr.text.strip().lstrip('\ufeff')) >= count:
+                pending.discard(name)
+        if pending:
+            time.sleep(1)
+    if pending:
+        raise RuntimeError(f'Chunks are not searchable in {sorted(pending)} after {timeout_s} s.')
+
+
+def provision_variants(client, definitions, chunks, key_field, max_workers=4, max_in_flight=4):
+    """ Create the variant indexes and load the same chunks into every one, concurrently. """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {name: executor.submit(_create_and_load, client, name, data, chunks, key_field, max_in_flight)
+                   for name, _, data in definitions}
+        failed = [name for name, f in futures.items() if not f.result()]
+    if failed:
+        raise RuntimeError(f'Variants {failed} are not created or loaded.')
+    _wait_searchable(client, [name for name, _, _ in definitions], len(chunks))
+
+
+def run_sweep_queries(client, definitions, queries, key_field, vector_field, k=10, warmup=3):
+    """ Send every query to every variant, recall@k and latency per variant.
+    Attributes:
+        queries (list): query vectors with known neighbours per metric ({"vector": ..., "neighbors": {metric: keys}})
+        warmup (int): queries sent to every variant first, not measured
+    Returns:
+        measurements (dict): index name -> recalls, latencies (ms) and errors
+    """
+    measurements = {name: {"recalls": [], "latencies": [], "errors": 0} for name, _, _ in definitions}
+    for i, query in enumerate(queries[:warmup] + queries):
+        body = json.dumps(ais_query.build_query({"kind": 'vector', "vector": query["vector"], "k": k, "top": k,
+                                                 "select": key_field}, vector_field))
+        for name, hnsw, _ in definitions:
+            start = time.perf_counter()
+            rr = client.post(f"indexes('{name}')/docs/search.post.search", data=body)
+            latency = (time.perf_counter() - start) * 1000
+            if i < warmup:
+                continue
+            if rr.status_code != 200:
+                measurements[name]["errors"] += 1
+                continue
+            returned = {d[key_field] for d in rr.json().get("value", [])}
+            expected = query["neighbors"][hnsw["metric"]][:k]
+            measurements[name]["recalls"].append(len(returned & set(expected)) / len(expected) if expected else 1.0)
+            measurements[name]["latencies"].append(latency)
+    return measurements
+
+
+def hnsw_sweep(client, base_index_name, index_schema_path, variants, chunks, queries, aoai, k=10, warmup=3,
+               max_workers=4, keep=False):
+    """ Recall versus latency of the HNSW variants.
+    Attributes:
+        client (AISearchClient): pooled REST client
+        base_index_name (str): base name of the variant indexes
+        index_schema_path (str): index template
+        variants (list): HNSW parameters per variant (see sweep_variants)
+        chunks (list): chunks with key and vector field, loaded into every variant
+        queries (list): {"vector": [...], "neighbors": [keys]}, neighbours computed from the chunks if missing
+        aoai (tuple): Azure OpenAI resource, key, deployment id, model name of the index vectorizer
+        k (int): neighbours per query
+        keep (bool): keep the variant indexes, deleted after the sweep otherwise
+    Returns:
+        rows (list): one row per variant
+    """
+    definitions = render_variants(base_index_name, index_schema_path, variants, *aoai)
+    data = definitions[0][2]
+    key_field = next(f["name"] for f in data["fields"] if f.get("key"))
+    vector_field = next(f["name"] for f in data["fields"] if f.get("dimensions"))
+
+    # known neighbours per metric of the sweep
+    metrics = sorted({hnsw["metric"] for hnsw in variants})
+    queries = [dict(q, neighbors={m: q["neighbors"] if q.get("neighbors") else
+                                  exact_neighbors(chunks, key_field, vector_field, q["vector"], m, k) for m in metrics})
+               for q in queries]
+
+    log.info(f"HNSW SWEEP '{base_index_name}': {len(definitions)} variants, {len(chunks)} chunks, {len(queries)} queries.")
+    try:
+        provision_variants(client, definitions, chunks, key_field, max_workers=max_workers)
+        measurements = run_sweep_queries(client, definitions, queries, key_field, vector_field, k, warmup)
+    finally:
+        if not keep:
+            ais_retention.delete_components(client, {"indexes": [name for name, _, _ in definitions]})
+
+    rows = []
+    for name, hnsw, data in definitions:
+        m = measurements[name]
+        storage = ais_vector_profiles.estimate_vector_storage(data, len(chunks))
+        rows.append(dict(hnsw, index_name=name,
+                         recall=sum(m["recalls"]) / len(m["recalls"]) if m["recalls"] else 0.0,
+                         p50_ms=ais_benchmark._percentile(m["latencies"], 50),
+                         p95_ms=ais_benchmark._percentile(m["latencies"], 95),
+                         errors=m["errors"],
+                         vector_index_bytes=storage["vector_index_bytes"]))
+    return rows
+
+
+def format_table(rows, k=10):
+    """ Sweep result as a text table (vector index memory in MB). """
+    lines = [f'{"m":>3} {"efConstruction":>15} {"efSearch":>9} {"metric":>11} {f"recall@{k}":>10} '
+             f'{"p50 ms":>8} {"p95 ms":>8} {"errors":>7} {"vector index MB":>16}']
+    for r in rows:
+        lines.append(f'{r["m"]:>3} {r["efConstruction"]:>15} {r["efSearch"]:>9} {r["metric"]:>11} {r["recall"]:>10.3f} '
+                     f'{r["p50_ms"]:>8.1f} {r["p95_ms"]:>8.1f} {r["errors"]:>7} '
+                     f'{r["vector_index_bytes"] / 1024 ** 2:>16.1f}')
+    return '\n'.join(lines)
+
+
+def synthetic_set(dimensions, chunks=500, queries=20, seed=0):
+    """ Random unit vectors as chunks and queries (for the stand-in and quick runs). """
+    rng = random.Random(seed)
+
+    def _unit():
+        vector = [rng.gauss(0.0, 1.0) for _ in range(dimensions)]
+        norm = math.sqrt(sum(v * v for v in vector))
+        return [v / norm for v in vector]
+
+    return ([{"chunk_id": f'chunk-{i:05d}', "vector": _unit()} for i in range(chunks)],
+            [{"vector": _unit()} for _ in range(queries)])
+
+
+def _int_list(text):
+    return [int(v) for v in text.split(',') if v]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='HNSW parameter sweep: recall versus latency of index variants.')
+    parser.add_argument('--base-index-name', default='sweep', help='base name of the variant indexes')
+    parser.add_argument('--index-schema', default='./data/vector-index/ai_search_index_schema.json')
+    parser.add_argument('--chunks', default='', help='chunk file (json lines with key and vector field)')
+    parser.add_argument('--queries', default='', help='query file (json lines with vector, optional neighbors)')
+    parser.add_argument('--m', default='4', help='comma separated m values')
+    parser.add_argument('--ef-construction', default='400', help='comma separated efConstruction values')
+    parser.add_argument('--ef-search', default='500', help='comma separated efSearch values')
+    parser.add_argument('--metrics', default='cosine', help='comma separated metrics')
+    parser.add_argument('--k', type=int, default=10, help='neighbours per query (recall@k)')
+    parser.add_argument('--warmup', type=int, default=3, help='not measured queries per variant')
+    parser.add_argument('--max-workers', type=int, default=4, help='variants created and loaded at the same time')
+    parser.add_argument('--keep', action='store_true', help='keep the variant indexes')
+    parser.add_argument('--config', default='../config.json', help='config json file')
+    parser.add_argument('--standin', action='store_true', help='run against the local stand-in (exact search, recall 1.0)')
+    parser.add_argument('--synthetic', type=int, default=0, help='random chunks instead of the chunk / query files')
+    parser.add_argument('--report', default='', help='save rows to this json file')
+    args = parser.parse_args()
+
+    variants = sweep_variants(_int_list(args.m), _int_list(args.ef_construction), _int_list(args.ef_search),
+                              [m for m in args.metrics.split(',') if m])
+
+    standin = None
+    if args.standin:
+        standin = ais_standin.AISearchStandIn().start()
+        config = ais_benchmark._config(standin.endpoint)
+    else:
+        with open(args.config, 'r') as f:
+            config = json.loads(f.read())
+    client = ais_client.AISearchClient(config["AISearchEndpoint"], config["AISearchAPIKey"], '2024-07-01',
+                                       pool_maxsize=max(16, args.max_workers * 4))
+    aoai = (config["AOAIResource"], config["AOAIAPIKEY"], config["AOAIDeploymentID"], config["AOAIModelName"])
+
+    if args.synthetic:
+        template = ais_template.load_template(args.index_schema)
+        vector_field = next(f for f in template["fields"] if f.get("dimensions"))
+        key_field = next(f["name"] for f in template["fields"] if f.get("key"))
+        chunks, queries = synthetic_set(vector_field["dimensions"], args.synthetic)
+        chunks = [{key_field: c["chunk_id"], vector_field["name"]: c["vector"]} for c in chunks]
+    else:
+        chunks = list(ais_push.iter_documents(args.chunks))
+        with open(args.queries, 'r') as f:
+            queries = [json.loads(line) for line in f if line.strip()]
+
+    log.getLogger().setLevel(log.WARNING)
+    rows = hnsw_sweep(client, args.base_index_name, args.index_schema, variants, chunks, queries, aoai, k=args.k,
+                      warmup=args.warmup, max_workers=args.max_workers, keep=args.keep)
+    if standin is not None:
+        standin.stop()
+
+    print(format_table(rows, args.k))
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(json.dumps(rows, indent=4))
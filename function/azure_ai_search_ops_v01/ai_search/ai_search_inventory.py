@@ -0,0 +1,91 @@
+"""
+Inventory of the AI Search components: names of all indexes, indexers, skillsets and data sources
+are listed at the same time ($select=name), so existence of all components of a release is
+checked from one snapshot instead of a GET per component.
+"""
+import concurrent.futures
+import datetime
+
+from azure_ai_search_ops_v01.ai_search import ai_search_telemetry as ais_telemetry
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+COLLECTIONS = ['indexes', 'indexers', 'skillsets', 'datasources']
+
+
+def _list_names(client, collection):
+    """ Names of all components in the collection.
+    GET https://[service name].search.windows.net/indexes?api-version=[api-version]&$select=name
+    """
+    rr = client.get(collection, params={"$select": "name"})
+    if rr.status_code != 200:
+        raise RuntimeError(f"[{rr.status_code}]: {collection} are NOT listed. {rr.text}")
+    return {item["name"] for item in rr.json().get("value", [])}
+
+
+def list_component_names(client, collections=COLLECTIONS):
+    """ Names of all components of the service, collections are listed in parallel.
+    Attributes:
+        client (AISearchClient): pooled REST client
+        collections (list): collections to list
+    Returns:
+        inventory (dict): collection -> set of names
+    """
+    with concurrent.futures.ThreadPoolExecutor(max_workers=len(collections)) as executor:
+        futures = {c: executor.submit(ais_telemetry.propagate(_list_names), client, c) for c in collections}
+        inventory = {c: f.result() for c, f in futures.items()}
+
+    log.info('INVENTORY: ' + ', '.join(f'{len(v)} {c}' for c, v in inventory.items()))
+    return inventory
+
+
+def shard_names(name, shards):
+    """ Names of the sharded component, e.g. data-source-release01-00, data-source-release01-01. """
+    return [f'{name}-{i:02d}' for i in range(shards)]
+
+
+def find_collisions(names, inventory, shards=None):
+    """ Components of the release which already exist.
+    Attributes:
+        names (dict): collection -> component name of the release
+        inventory (dict): collection -> set of existing names
+        shards (dict): collection -> number of shards, shard names are checked as well
+    Returns:
+        collisions (dict): collection -> name for existing components
+    """
+    shards = shards or {}
+    collisions = {}
+    for c, n in names.items():
+        existing = inventory.get(c, set())
+        if n in existing or any(s in existing for s in shard_names(n, shards.get(c, 0))):
+            collisions[c] = n
+    return collisions
+
+
+def resolve_collisions(names, inventory, shards=None):
+    """ Resolve names of all release components from one inventory snapshot.
+    If any component exists, time is added to the names of all components (they stay consistent),
+    a counter is added as well if names with the time exist too.
+    Attributes:
+        names (dict): collection -> component name of the release
+        inventory (dict): collection -> set of existing names
+        shards (dict): collection -> number of shards, shard names are checked as well
+    Returns:
+        names (dict): collection -> final component name
+    """
+    collisions = find_collisions(names, inventory, shards)
+    if not collisions:
+        return dict(names)
+
+    log.info(f'INVENTORY: components exist {collisions}, time is added to names.')
+    suffix = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+    resolved = {c: f'{n}-{suffix}' for c, n in names.items()}
+
+    counter = 1
+    while find_collisions(resolved, inventory, shards):
+        resolved = {c: f'{n}-{suffix}-{counter}' for c, n in names.items()}
+        counter += 1
+
+    return resolved
@@ -0,0 +1,313 @@
+"""
+Query load test of a deployed index, used as release gate (latency SLO before traffic is switched) and for capacity tests.
+Queries of a query file are replayed against the index at a constant rate (open loop, --rps) or by a fixed number
+of concurrent clients (closed loop, --concurrency) for the test duration. Latency p50 / p95 / p99, throttling rate,
+errors and result counts are reported per query kind (keyword, vector, hybrid, semantic) and checked against SLO.
+Open loop latency is measured from the scheduled send time, waiting for a free sender is counted (no coordinated omission).
+Throttled queries are not retried by default, they are counted.
+https://learn.microsoft.com/en-us/azure/search/search-performance-analysis
+
+Query file (json lines), optional keys: filter, select, top, k:
+{"kind": "keyword", "search": "retention policy"}
+{"kind": "vector", "text": "how long are backups kept"}          - vectorized by the index vectorizer
+{"kind": "vector", "vector": [0.01, ...]}
+{"kind": "hybrid", "search": "backup", "text": "how long are backups kept"}
+{"kind": "semantic", "search": "how long are backups kept"}       - semantic configuration of the index
+
+Usage:
+python ai_search_loadtest.py --index vect-index-release-3oct --queries ./data/vector-index/sample_queries.jsonl --rps 20 --duration 60 --config ../config.json --p95-ms 500
+python ai_search_loadtest.py --standin --queries ./data/vector-index/sample_queries.jsonl --concurrency 8 --duration 10
+Exit code is 1 if an SLO threshold is not met.
+"""
+import argparse
+import concurrent.futures
+import itertools
+import json
+import threading
+import time
+
+from azure_ai_search_ops_v01.ai_search import ai_search_benchmark as ais_benchmark
+from azure_ai_search_ops_v01.ai_search import ai_search_client as ais_client
+from azure_ai_search_ops_v01.ai_search import ai_search_index as ais_index
+from azure_ai_search_ops_v01.ai_search import ai_search_push as ais_push
+from azure_ai_search_ops_v01.ai_search import ai_search_query as ais_query
+from azure_ai_search_ops_v01.ai_search import ai_search_standin as ais_standin
+from azure_ai_search_ops_v01.ai_search import ai_search_vectorize as ais_vectorize
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+THROTTLE_STATUSES = (429, 503)
+
+
+def load_queries(path):
+    """ Queries of the json lines file. """
+    with open(path, 'r') as f:
+        queries = [json.loads(line) for line in f if line.strip()]
+    for q in queries:
+        if q.get("kind") not in ais_query.KINDS:
+            raise ValueError(f"Unknown query kind '{q.get('kind')}', available: {ais_query.KINDS}.")
+    return queries
+
+
+class QueryLoadTest:
+    def __init__(self, client, index_name, queries, vector_field=None, semantic_configuration=None, top=10):
+        """
+        Load generator of one index, queries are sent in round robin order.
+
+        Args:
+            client (AISearchClient): client of the service (retries / pool size as needed for the test)
+            index_name (str): index name
+            queries (list): query file entries
+            vector_field (str): vector field of vector / hybrid queries
+            semantic_configuration (str): semantic configuration of semantic queries
+            top (int): results per query, if not set by the query
+        """
+        self.client = client
+        self.index_name = index_name
+        self.requests = [(q["kind"], json.dumps(ais_query.build_query(q, vector_field, semantic_configuration, top)))
+                         for q in queries]
+        self._next = itertools.cycle(range(len(self.requests)))
+        self._lock = threading.Lock()
+        # (kind, status code or None, latency in seconds, number of results)
+        self.samples = []
+
+    def _request(self):
+        with self._lock:
+            return self.requests[next(self._next)]
+
+    def _send(self, kind, body, scheduled=None):
+        """ One query, latency from the scheduled time if provided (open loop). """
+        start = time.perf_counter() if scheduled is None else scheduled
+        status_code, results = None, 0
+        try:
+            rr = self.client.post(f"indexes('{self.index_name}')/docs/search.post.search", data=body)
+            status_code = rr.status_code
+            if status_code == 200:
+                results = len(rr.json().get("value", []))
+        except Exception as e:
+            log.debug(f'LOAD TEST: query failed. {e}')
+        sample = (kind, status_code, time.perf_counter() - start, results)
+        with self._lock:
+            self.samples.append(sample)
+
+    def run_rate(self, rps, duration_s, max_workers=64):
+        """ Open loop: queries are scheduled at a constant rate, regardless of response times.
+        Returns:
+            wall_s (float): test duration
+        """
+        interval = 1.0 / rps
+        total = max(1, int(rps * duration_s))
+        start = time.perf_counter()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for i in range(total):
+                scheduled = start + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                kind, body = self._request()
+                executor.submit(self._send, kind, body, scheduled)
+        return time.perf_counter() - start
+
+    def run_concurrency(self, concurrency, duration_s):
+        """ Closed loop: every client sends the next query once the previous one is answered.
+        Returns:
+            wall_s (float): test duration
+        """
+        start = time.perf_counter()
+        deadline = start + duration_s
+
+        def _client():
+            while time.perf_counter() < deadline:
+                self._send(*self._request())
+
+        threads = [threading.Thread(target=_client, daemon=True) for _ in range(concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - start
+
+
+def _stats(samples, wall_s):
+    ok = [s for s in samples if s[1] == 200]
+    latencies = [s[2] * 1000 for s in ok]
+    throttled = sum(1 for s in samples if s[1] in THROTTLE_STATUSES)
+    count = len(samples)
+    return {"queries": count,
+            "ok": len(ok),
+            "throttled": throttled,
+            "errors": count - len(ok) - throttled,
+            "throttle_rate": throttled / count if count else 0.0,
+            "error_rate": (count - len(ok) - throttled) / count if count else 0.0,
+            "qps": len(ok) / wall_s if wall_s else 0.0,
+            "p50_ms": ais_benchmark._percentile(latencies, 50),
+            "p95_ms": ais_benchmark._percentile(latencies, 95),
+            "p99_ms": ais_benchmark._percentile(latencies, 99),
+            "max_ms": max(latencies) if latencies else 0.0,
+            "avg_results": sum(s[3] for s in ok) / len(ok) if ok else 0.0,
+            "zero_results_rate": sum(1 for s in ok if not s[3]) / len(ok) if ok else 0.0}
+
+
+def summarize(samples, wall_s):
+    """ Load test summary, overall and per query kind. """
+    summary = {"wall_s": wall_s, "all": _stats(samples, wall_s), "kinds": {}}
+    for kind in ais_query.KINDS:
+        kind_samples = [s for s in samples if s[0] == kind]
+        if kind_samples:
+            summary["kinds"][kind] = _stats(kind_samples, wall_s)
+    return summary
+
+
+def check_slo(summary, p95_ms=None, p99_ms=None, max_throttle_rate=None, max_error_rate=None):
+    """ SLO violations of the summary (overall and every query kind), empty if all thresholds are met. """
+    violations = []
+    for name, stats in [('all', summary["all"])] + list(summary["kinds"].items()):
+        for key, limit in [('p95_ms', p95_ms), ('p99_ms', p99_ms),
+                           ('throttle_rate', max_throttle_rate), ('error_rate', max_error_rate)]:
+            if limit is not None and stats[key] > limit:
+                violations.append(f'{name} {key} {stats[key]:.3f} > {limit}')
+    if not summary["all"]["ok"]:
+        violations.append('no query succeeded')
+    return violations
+
+
+def format_table(summary):
+    """ Load test summary as a text table. """
+    columns = ['queries', 'qps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'throttle_rate', 'error_rate',
+               'avg_results', 'zero_results_rate']
+    lines = [f'{"kind":>10} ' + ' '.join(f'{c:>17}' for c in columns)]
+    for name, stats in [('all', summary["all"])] + list(summary["kinds"].items()):
+        lines.append(f'{name:>10} ' + ' '.join(f'{stats[c]:>17.3f}' if isinstance(stats[c], float)
+                                               else f'{stats[c]:>17}' for c in columns))
+    return '\n'.join(lines)
+
+
+def run_load_test(client, index_name, queries, index_data=None, rps=None, concurrency=4, duration_s=30.0,
+                  top=10, max_workers=64):
+    """ Load test of the index.
+    Attributes:
+        client (AISearchClient): client of the service
+        index_name (str): index name
+        queries (list): query file entries
+        index_data (dict): index definition (vector field, semantic configuration), read from the service if None
+        rps (float): open loop rate, closed loop with concurrency clients if None
+        concurrency (int): closed loop clients
+        duration_s (float): test duration
+    Returns:
+        summary (dict): overall and per kind stats
+    """
+    if index_data is None:
+        rr = client.get(f"indexes('{index_name}')")
+        if rr.status_code != 200:
+            raise RuntimeError(f"[{rr.status_code}]: '{index_name}' index definition is NOT retrieved. {rr.text}")
+        index_data = rr.json()
+
+    test = QueryLoadTest(client, index_name, queries, top=top, **ais_query.query_settings(index_data))
+    mode = f'{rps} rps' if rps else f'{concurrency} clients'
+    log.info(f"LOAD TEST '{index_name}': {len(queries)} queries, {mode}, {duration_s} s.")
+    if rps:
+        wall_s = test.run_rate(rps, duration_s, max_workers=max_workers)
+    else:
+        wall_s = test.run_concurrency(concurrency, duration_s)
+
+    summary = summarize(test.samples, wall_s)
+    summary.update(index_name=index_name, mode=mode)
+    log.info(f"LOAD TEST '{index_name}': {summary['all']['queries']} queries, p95 {summary['all']['p95_ms']:.1f} ms, "
+             f"throttled {summary['all']['throttle_rate']:.1%}.")
+    return summary
+
+
+def load_test_client(endpoint, apikey, api_version='2024-07-01', pool_maxsize=64, retries=0):
+    """ Client for load tests: throttled queries are not retried (counted), circuit breaker does not stop the test. """
+    return ais_client.AISearchClient(endpoint, apikey, api_version, pool_maxsize=pool_maxsize,
+                                     retry_policy=ais_client.RetryPolicy(max_retries=retries),
+                                     circuit_breaker=ais_client.CircuitBreaker(failure_threshold=float('inf')))
+
+
+def standin_index(client, index_schema_path, index_name='loadtest-index', documents=200):
+    """ Create the index on the stand-in and load synthetic documents (stub vectors, same as stand-in text queries).
+    Returns:
+        index_data (dict): created index definition
+    """
+    success, data = ais_index._prep_update_definition_json(index_name, index_schema_path, True,
+                                                           'https://standin.openai.azure.com', 'standin',
+                                                           'text-embedding-ada-002', 'text-embedding-ada-002')
+    if not success or client.put(f"indexes('{index_name}')", data=json.dumps(data)).status_code not in [200, 201]:
+        raise RuntimeError(f"'{index_name}' index is NOT created on the stand-in.")
+
+    settings = ais_query.query_settings(data)
+    key_field = next(f["name"] for f in data["fields"] if f.get("key"))
+    vector_field = next((f for f in data["fields"] if f.get("dimensions")), None)
+    backend = ais_vectorize.StubEmbeddingBackend(vector_field["dimensions"]) if vector_field else None
+    words = ['backup', 'retention', 'policy', 'index', 'replica', 'partition', 'storage', 'latency', 'query',
+             'vector', 'semantic', 'release', 'throttling', 'capacity', 'schema', 'indexer']
+
+    docs = []
+    for i in range(documents):
+        text = ' '.join(words[(i * 7 + j * 3) % len(words)] for j in range(40))
+        doc = {key_field: f'doc-{i:05d}', "chunk": text, "title": f'document {i}', "parent_id": f'parent-{i // 4}'}
+        if backend is not None:
+            doc[settings["vector_field"]] = backend.embed([text])[0]
+        docs.append({k: v for k, v in doc.items() if any(f["name"] == k for f in data["fields"])})
+    ais_push.push_documents(client, index_name, key_field, docs)
+    return data
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query load test of an AI Search index.')
+    parser.add_argument('--queries', required=True, help='query file (json lines)')
+    parser.add_argument('--index', default='', help='index name (live service)')
+    parser.add_argument('--config', default='../config.json', help='config json file')
+    parser.add_argument('--standin', action='store_true', help='run against the local stand-in with synthetic documents')
+    parser.add_argument('--index-schema', default='./data/vector-index/ai_search_index_schema.json',
+                        help='index definition of the stand-in index')
+    parser.add_argument('--documents', type=int, default=200, help='synthetic documents of the stand-in index')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='stand-in latency per request')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='stand-in share of 429 responses')
+    parser.add_argument('--rps', type=float, default=None, help='open loop rate (queries per second)')
+    parser.add_argument('--concurrency', type=int, default=4, help='closed loop clients (if --rps is not set)')
+    parser.add_argument('--duration', type=float, default=30.0, help='test duration in seconds')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--retries', type=int, default=0, help='retries of throttled queries')
+    parser.add_argument('--p95-ms', type=float, default=None)
+    parser.add_argument('--p99-ms', type=float, default=None)
+    parser.add_argument('--max-throttle-rate', type=float, default=None)
+    parser.add_argument('--max-error-rate', type=float, default=None)
+    parser.add_argument('--report', default='', help='save summary to this json file')
+    args = parser.parse_args()
+
+    queries = load_queries(args.queries)
+    pool_maxsize = max(16, args.concurrency, int(args.rps or 0))
+    standin = None
+    if args.standin:
+        standin = ais_standin.AISearchStandIn(latency_s=args.latency_ms / 1000, throttle_rate=args.throttle_rate,
+                                              retry_after_s=0.1).start()
+        client = load_test_client(standin.endpoint, 'standin-key', pool_maxsize=pool_maxsize, retries=args.retries)
+        index_name = args.index or 'loadtest-index'
+        index_data = standin_index(client, args.index_schema, index_name, args.documents)
+    else:
+        with open(args.config, 'r') as f:
+            config = json.loads(f.read())
+        client = load_test_client(config["AISearchEndpoint"], config["AISearchAPIKey"], pool_maxsize=pool_maxsize,
+                                  retries=args.retries)
+        index_name, index_data = args.index, None
+
+    log.getLogger().setLevel(log.WARNING)
+    summary = run_load_test(client, index_name, queries, index_data, rps=args.rps, concurrency=args.concurrency,
+                            duration_s=args.duration, top=args.top, max_workers=pool_maxsize)
+    if standin is not None:
+        standin.stop()
+
+    print(format_table(summary))
+    violations = check_slo(summary, args.p95_ms, args.p99_ms, args.max_throttle_rate, args.max_error_rate)
+    summary["slo_violations"] = violations
+    for v in violations:
+        print(f'SLO violated: {v}')
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(json.dumps(summary, indent=4))
+
+    exit(1 if violations else 0)
@@ -0,0 +1,272 @@
+"""
+Push mode ingestion into an index (alternative to data source + indexer).
+Documents are read lazily from JSONL / JSON files, packed into /docs/index batches bounded by
+document count and payload size, several batches are sent at the same time and only keys failed
+with retriable status in 207 responses are re-sent. Whole corpus is never held in memory.
+https://learn.microsoft.com/en-us/rest/api/searchservice/documents/
+
+Usage:
+python ai_search_push.py --index vect-index-release01 --file ./docs.jsonl --key-field chunk_id --config ../config.json
+"""
+import argparse
+import concurrent.futures
+import json
+import threading
+import time
+
+from azure_ai_search_ops_v01.ai_search import ai_search_client as ais_client
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+# service limits of one /docs/index request
+MAX_BATCH_DOCS = 1000
+MAX_BATCH_BYTES = 16 * 1024 * 1024
+
+# per document status codes of 207 response which could be retried
+RETRIABLE_STATUS_CODES = [409, 422, 503]
+
+_READ_CHUNK = 64 * 1024
+
+
+def _iter_json_values(f):
+    """ Values of a json file: elements of a top level array (read incrementally) or the single value. """
+    decoder = json.JSONDecoder()
+    buffer = f.read(_READ_CHUNK).lstrip()
+    if not buffer.startswith('['):
+        # single json document
+        rest = f.read()
+        yield json.loads(buffer + rest)
+        return
+
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                raise
+            chunk = f.read(_READ_CHUNK)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield value
+        buffer = buffer[end:]
+
+
+def iter_documents(path):
+    """ Documents of the file, read lazily.
+    .jsonl - one json document per line, .json (or other) - json array of documents or one document.
+    Attributes:
+        path (str): path to the file
+    Yields:
+        doc (dict): document
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.endswith('.jsonl'):
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+        else:
+            yield from _iter_json_values(f)
+
+
+def iter_batches(docs, max_docs=MAX_BATCH_DOCS, max_bytes=MAX_BATCH_BYTES, action='mergeOrUpload',
+                 on_oversize=None):
+    """ Pack documents into batches bounded by document count and payload size.
+    Attributes:
+        docs (iterable): documents
+        max_docs (int): max documents per batch
+        max_bytes (int): max serialized payload size per batch
+        action (str): @search.action set on documents without one
+        on_oversize (function): called with every document larger than max_bytes (not sent), e.g. to count it failed
+    Yields:
+        batch (list): (document json text, document) pairs
+    """
+    # {"value":[...]} envelope and separators
+    overhead = 12
+    batch, size = [], overhead
+    for doc in docs:
+        if "@search.action" not in doc:
+            doc = dict(doc, **{"@search.action": action})
+        text = json.dumps(doc)
+        doc_size = len(text.encode('utf-8')) + 1
+
+        if doc_size + overhead > max_bytes:
+            log.error(f'PUSH: document is larger than {max_bytes} bytes and is skipped.')
+            if on_oversize is not None:
+                on_oversize(doc)
+            continue
+        if batch and (len(batch) >= max_docs or size + doc_size > max_bytes):
+            yield batch
+            batch, size = [], overhead
+        batch.append((text, doc))
+        size += doc_size
+
+    if batch:
+        yield batch
+
+
+class DocumentPusher:
+    def __init__(self, client, index_name, key_field, max_in_flight=4,
+                 max_docs=MAX_BATCH_DOCS, max_bytes=MAX_BATCH_BYTES, max_key_retries=3, retry_backoff=1.0):
+        """
+        Parallel uploader of document batches into one index.
+
+        Args:
+            client (AISearchClient): pooled REST client
+            index_name (str): target index name
+            key_field (str): key field of the index
+            max_in_flight (int): max batches sent at the same time
+            max_docs (int): max documents per batch
+            max_bytes (int): max payload size per batch
+            max_key_retries (int): max re-sends of failed keys of one batch
+            retry_backoff (float): first backoff in seconds before re-sending failed keys
+        """
+        self.client = client
+        self.index_name = index_name
+        self.key_field = key_field
+        self.max_in_flight = max_in_flight
+        self.max_docs = max_docs
+        self.max_bytes = max_bytes
+        self.max_key_retries = max_key_retries
+        self.retry_backoff = retry_backoff
+
+        self.stats = {"docs": 0, "succeeded": 0, "failed": 0, "batches": 0, "key_retries": 0, "bytes": 0}
+        self.failed_keys = []
+        self._lock = threading.Lock()
+
+    def _post(self, texts):
+        payload = ('{"value":[' + ','.join(texts) + ']}').encode('utf-8')
+        rr = self.client.post(f'indexes/{self.index_name}/docs/index', data=payload)
+        return rr, len(payload)
+
+    def _send_batch(self, batch):
+        """ Send one batch, keys failed with retriable status are re-sent.
+        Returns:
+            succeeded (int), failed keys (list)
+        """
+        pending = batch
+        succeeded = 0
+        attempt = 0
+        while True:
+            rr, size = self._post([text for text, _ in pending])
+            with self._lock:
+                self.stats["bytes"] += size
+
+            if rr.status_code not in [200, 207]:
+                log.error(f"[{rr.status_code}]: batch of {len(pending)} documents is NOT indexed.")
+                log.error(rr.text)
+                return succeeded, [doc.get(self.key_field) for _, doc in pending]
+
+            results = {r["key"]: r for r in rr.json().get("value", [])}
+            retry, failed = [], []
+            for text, doc in pending:
+                result = results.get(doc.get(self.key_field))
+                if result is not None and result.get("status"):
+                    succeeded += 1
+                elif result is not None and result.get("statusCode") in RETRIABLE_STATUS_CODES:
+                    retry.append((text, doc))
+                else:
+                    failed.append(doc.get(self.key_field))
+                    if result is not None:
+                        log.error(f"PUSH: '{result['key']}' [{result.get('statusCode')}] {result.get('errorMessage')}")
+
+            if not retry:
+                return succeeded, failed
+            if attempt >= self.max_key_retries:
+                return succeeded, failed + [doc.get(self.key_field) for _, doc in retry]
+
+            with self._lock:
+                self.stats["key_retries"] += len(retry)
+            time.sleep(self.retry_backoff * (2 ** attempt))
+            pending = retry
+            attempt += 1
+
+    def _done(self, future, keys):
+        """ Count the finished batch, keys of a batch failed with an exception (e.g. CircuitOpenError,
+        connection error after retries) are counted as failed and the push goes on. """
+        try:
+            succeeded, failed = future.result()
+        except Exception as e:
+            log.error(f"PUSH: batch of {len(keys)} documents is NOT indexed. {e}")
+            succeeded, failed = 0, keys
+        with self._lock:
+            self.stats["batches"] += 1
+            self.stats["docs"] += len(keys)
+            self.stats["succeeded"] += succeeded
+            self.stats["failed"] += len(failed)
+            self.failed_keys.extend(failed)
+
+    def _oversize(self, doc):
+        """ Document larger than max_bytes is never sent, it is counted as failed. """
+        with self._lock:
+            self.stats["docs"] += 1
+            self.stats["failed"] += 1
+            self.failed_keys.append(doc.get(self.key_field))
+
+    def push(self, docs):
+        """ Push all documents, at most max_in_flight batches are sent (and held in memory) at the same time.
+        Attributes:
+            docs (iterable): documents, e.g. iter_documents(path)
+        Returns:
+            summary (dict): documents succeeded / failed, batches, key retries, bytes, duration and docs/s
+        """
+        log.info(f"PUSH '{self.index_name}' - start.")
+        start = time.perf_counter()
+
+        in_flight = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_in_flight) as executor:
+            for batch in iter_batches(docs, self.max_docs, self.max_bytes, on_oversize=self._oversize):
+                if len(in_flight) >= self.max_in_flight:
+                    done, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        self._done(future, in_flight.pop(future))
+                in_flight[executor.submit(self._send_batch, batch)] = [doc.get(self.key_field) for _, doc in batch]
+
+            for future in concurrent.futures.as_completed(list(in_flight)):
+                self._done(future, in_flight.pop(future))
+
+        duration = time.perf_counter() - start
+        summary = dict(self.stats)
+        summary["duration_s"] = duration
+        summary["docs_per_s"] = summary["succeeded"] / duration if duration > 0 else 0.0
+
+        log.info(f"PUSH '{self.index_name}' - end. {summary['succeeded']} documents indexed, "
+                 f"{summary['failed']} failed, {summary['docs_per_s']:.1f} docs/s.")
+        return summary
+
+
+def push_documents(client, index_name, key_field, docs, max_in_flight=4, **kwargs):
+    """ Push documents into the index (see DocumentPusher).
+    Returns:
+        summary (dict): push summary
+    """
+    return DocumentPusher(client, index_name, key_field, max_in_flight=max_in_flight, **kwargs).push(docs)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Push documents from JSONL / JSON files into AI Search index.')
+    parser.add_argument('--index', required=True, help='target index name')
+    parser.add_argument('--file', required=True, action='append', help='JSONL / JSON file, could be repeated')
+    parser.add_argument('--key-field', required=True, help='key field of the index')
+    parser.add_argument('--config', default='../config.json', help='config json file')
+    parser.add_argument('--max-in-flight', type=int, default=4, help='batches sent at the same time')
+    parser.add_argument('--batch-docs', type=int, default=MAX_BATCH_DOCS, help='max documents per batch')
+    parser.add_argument('--batch-mb', type=float, default=16, help='max payload size per batch in MB')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.loads(f.read())
+
+    client = ais_client.get_client(config["AISearchEndpoint"], config["AISearchAPIKey"], '2024-07-01')
+    docs = (doc for path in args.file for doc in iter_documents(path))
+    summary = push_documents(client, args.index, args.key_field, docs, max_in_flight=args.max_in_flight,
+                             max_docs=args.batch_docs, max_bytes=int(args.batch_mb * 1024 * 1024))
+    print(json.dumps(summary, indent=4))
@@ -0,0 +1,233 @@
+"""
+Diff-based, idempotent deploy of AI Search components.
+Live definition is compared with the rendered template and create-or-update (PUT) is sent
+only when the component is missing or differs, unchanged components are skipped (no write call).
+https://learn.microsoft.com/en-us/rest/api/searchservice/indexes/create-or-update
+"""
+import json
+
+from azure_ai_search_ops_v01.ai_search import ai_search_indexer as ais_indexer
+from azure_ai_search_ops_v01.ai_search import ai_search_telemetry as ais_telemetry
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+# reconcile outcome of a component
+UNCHANGED = 'unchanged'
+CREATED = 'created'
+UPDATED = 'updated'
+FAILED = 'failed'
+# component name is taken by another stack (e.g. same release name of another base), it is not updated
+CONFLICT = 'conflict'
+
+# service metadata, not part of the definition
+METADATA_KEYS = {'@odata.context', '@odata.etag'}
+
+# secrets are never returned by the service (null or redacted), they are not compared -
+# a salted digest of them is kept in the release state instead (see ai_search_state.secret_digest)
+SECRET_KEYS = {'apiKey', 'connectionString', 'storageConnectionString'}
+
+
+def normalize_definition(data):
+    """ Normalize definition for comparison: metadata, secrets, nulls and empty values are removed.
+    Attributes:
+        data: definition json (dict, list or value)
+    Returns:
+        normalized definition
+    """
+    if isinstance(data, dict):
+        out = {}
+        for k, v in data.items():
+            if k in METADATA_KEYS or k in SECRET_KEYS:
+                continue
+            v = normalize_definition(v)
+            if v is None or v == {} or v == []:
+                continue
+            out[k] = v
+        return out
+
+    if isinstance(data, list):
+        return [normalize_definition(v) for v in data]
+
+    return data
+
+
+def secret_values(data, path=''):
+    """ Secret values set in the definition.
+    Attributes:
+        data: definition json (dict, list or value)
+        path (str): path of the element
+    Returns:
+        secrets (list): (path, value) of the secrets, in definition order
+    """
+    if isinstance(data, dict):
+        secrets = []
+        for k, v in data.items():
+            if k in SECRET_KEYS:
+                if v is not None:
+                    secrets.append((f'{path}/{k}', v))
+            else:
+                secrets.extend(secret_values(v, f'{path}/{k}'))
+        return secrets
+
+    if isinstance(data, list):
+        return [s for i, v in enumerate(data) for s in secret_values(v, f'{path}/{i}')]
+
+    return []
+
+
+def definition_diff(rendered, live, path=''):
+    """ Differences between rendered and live definitions (both normalized).
+    Everything set in the rendered definition must be in the live one, defaults added
+    by the service to the live definition are ignored.
+    Attributes:
+        rendered: rendered definition
+        live: live definition
+        path (str): path of the compared element
+    Returns:
+        diff (list): paths of the differences
+    """
+    if isinstance(rendered, dict):
+        if not isinstance(live, dict):
+            return [path or '/']
+        diff = []
+        for k, v in rendered.items():
+            if k not in live:
+                diff.append(f'{path}/{k}')
+            else:
+                diff.extend(definition_diff(v, live[k], f'{path}/{k}'))
+        return diff
+
+    if isinstance(rendered, list):
+        if not isinstance(live, list) or len(rendered) != len(live):
+            return [path or '/']
+        diff = []
+        for i, (r, l) in enumerate(zip(rendered, live)):
+            diff.extend(definition_diff(r, l, f'{path}/{i}'))
+        return diff
+
+    return [] if rendered == live else [path or '/']
+
+
+def get_definition(client, collection, name, params=None):
+    """ Live definition of the component.
+    Attributes:
+        client (AISearchClient): pooled REST client
+        collection (str): indexes, datasources, skillsets or indexers
+        name (str): component name
+        params (dict): extra query parameters, e.g. preview api-version (see ai_search_indexer.api_params)
+    Returns:
+        data (dict): live definition, None if component does not exist
+    """
+    rr = client.get(f"{collection}('{name}')", params=params)
+    if rr.status_code == 404:
+        return None
+    if rr.status_code != 200:
+        raise RuntimeError(f"[{rr.status_code}]: '{name}' {collection} definition is NOT retrieved. {rr.text}")
+    return rr.json()
+
+
+def put_definition(client, collection, name, data, params=None):
+    """ Create or update the component.
+    Returns:
+        success (bool): True if component is created or updated
+    """
+    rr = client.put(f"{collection}('{name}')", data=json.dumps(data), params=params)
+    if rr.status_code in [200, 201, 204]:
+        return True
+
+    log.error(f"[{rr.status_code}]: '{name}' {collection} is NOT created or updated.")
+    log.error(rr.text)
+    return False
+
+
+def target_indexes(collection, data):
+    """ Indexes the component writes to: target index of an indexer, index projection targets of a skillset.
+    Attributes:
+        collection (str): indexes, datasources, skillsets or indexers
+        data (dict): component definition
+    Returns:
+        index_names (set): target index names, empty if the component does not write to an index
+    """
+    if collection == 'indexers':
+        return {data["targetIndexName"]} if data.get("targetIndexName") else set()
+    if collection == 'skillsets':
+        selectors = (data.get("indexProjections") or {}).get("selectors") or []
+        return {s["targetIndexName"] for s in selectors if s.get("targetIndexName")}
+    return set()
+
+
+def ownership_conflicts(client, definitions, index_name):
+    """ Live components with the names of the stack which belong to another stack: indexer or skillset writing
+    to another index, data source used by such indexer. Names of data source, skillset and indexer depend on
+    the release name only, the same release of another base would take them over if they were updated.
+    Attributes:
+        client (AISearchClient): pooled REST client
+        definitions (dict): component -> (collection, name, rendered definition) to be reconciled
+        index_name (str): index of the stack
+    Returns:
+        conflicts (dict): component -> index names the live component writes to
+    """
+    conflicts = {}
+    for component, (collection, name, data) in definitions.items():
+        if collection not in ['indexers', 'skillsets']:
+            continue
+        params = ais_indexer.api_params(data) if collection == 'indexers' else None
+        live = get_definition(client, collection, name, params)
+        foreign = target_indexes(collection, live or {}) - {index_name}
+        if not foreign:
+            continue
+        conflicts[component] = sorted(foreign)
+        if collection == 'indexers':
+            for other, (other_collection, other_name, _) in definitions.items():
+                if other_collection == 'datasources' and other_name == live.get("dataSourceName"):
+                    conflicts[other] = sorted(foreign)
+    return conflicts
+
+
+def reconcile_component(client, collection, name, rendered, force=False):
+    """ Compare live definition with the rendered one and create or update the component if needed.
+    Attributes:
+        client (AISearchClient): pooled REST client
+        collection (str): indexes, datasources, skillsets or indexers
+        name (str): component name
+        rendered (dict): rendered definition
+        force (bool): update even if there is no difference, e.g. rotated secrets (not part of the comparison)
+    Returns:
+        status (str): unchanged, created, updated or failed
+    """
+    with ais_telemetry.span('reconcile_component', collection=collection, component=name) as span:
+        status = _reconcile_component(client, collection, name, rendered, force)
+        span["attributes"]["outcome"] = status
+        if status == FAILED:
+            span["status"] = ais_telemetry.ERROR
+    return status
+
+
+def _reconcile_component(client, collection, name, rendered, force=False):
+    elem = collection.upper()
+    # indexer with enrichment cache is read and written with the preview api-version
+    params = ais_indexer.api_params(rendered) if collection == 'indexers' else None
+    try:
+        live = get_definition(client, collection, name, params)
+
+        if live is None:
+            log.info(f"RECONCILE {elem}: '{name}' does not exist, creating.")
+            return CREATED if put_definition(client, collection, name, rendered, params) else FAILED
+
+        diff = definition_diff(normalize_definition(rendered), normalize_definition(live))
+        if not diff and force:
+            log.info(f"RECONCILE {elem}: '{name}' is up to date, update is forced (secrets).")
+            return UPDATED if put_definition(client, collection, name, rendered, params) else FAILED
+        if not diff:
+            log.info(f"RECONCILE {elem}: '{name}' is up to date, skipped.")
+            return UNCHANGED
+
+        log.info(f"RECONCILE {elem}: '{name}' differs at {diff}, updating.")
+        return UPDATED if put_definition(client, collection, name, rendered, params) else FAILED
+
+    except Exception as e:
+        log.error(f"RECONCILE {elem}: '{name}' failed.")
+        log.error(e)
+        return FAILED
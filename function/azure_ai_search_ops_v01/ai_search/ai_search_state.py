@@ -0,0 +1,273 @@
+"""
+Local release state: final component names (with time suffix and shards), definition hashes, timestamps and
+outcomes of every release instance created or reconciled by AISearchOps. Reconcile, retention and monitoring
+read names, hashes and creation times from the state instead of listing the service again.
+State is kept in a JSON file or a SQLite file (same interface, chosen by the file extension).
+
+Usage:
+python ai_search_state.py --state ./release_state.json --base-index-name vect-index
+python ai_search_state.py --state ./release_state.sqlite --base-index-name vect-index --release-name release-3oct
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+
+from azure_ai_search_ops_v01.ai_search import ai_search_reconcile as ais_reconcile
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+# outcomes of a component after which the live definition equals the recorded hash
+SETTLED_OUTCOMES = {ais_reconcile.CREATED, ais_reconcile.UPDATED, ais_reconcile.UNCHANGED}
+
+_SQLITE_EXTENSIONS = ('.sqlite', '.sqlite3', '.db')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS releases (
+    index_name TEXT PRIMARY KEY,
+    base_index_name TEXT NOT NULL,
+    release_name TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    record TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS releases_base ON releases (base_index_name, release_name);
+"""
+
+
+def secret_digest(data, salt):
+    """ Salted digest of the secret values of the definition, None if it has no secrets.
+    Secrets are not compared with the live definition, a rotated secret is found by its recorded digest.
+    """
+    values = ais_reconcile.secret_values(data)
+    if not values:
+        return None
+    text = json.dumps(values, separators=(',', ':'))
+    return hashlib.sha256(f'{salt}:{text}'.encode('utf-8')).hexdigest()
+
+
+def definition_hash(data, salt=None):
+    """ Hash of the normalized definition (metadata and secrets are not part of it, see normalize_definition),
+    with the salted digest of the secrets if salt is given (see secret_digest).
+    """
+    normalized = json.dumps(ais_reconcile.normalize_definition(data), sort_keys=True, separators=(',', ':'))
+    digest = secret_digest(data, salt) if salt is not None else None
+    if digest:
+        normalized = f'{normalized}:{digest}'
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+def now_iso():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat()
+
+
+def new_record(base_index_name, release_name, names, shards=None):
+    """ Release record.
+    Attributes:
+        base_index_name (str): base index name
+        release_name (str): release name as requested
+        names (dict): collection -> final (resolved) name
+        shards (list): (folder, data source, indexer) of the shards
+    Returns:
+        record (dict): record without components and outcome
+    """
+    return {"base_index_name": base_index_name,
+            "release_name": release_name,
+            "instance": names['indexes'][len(base_index_name) + 1:],
+            "index_name": names['indexes'],
+            "names": dict(names),
+            "shards": [list(s) for s in shards or []],
+            "secret_salt": secrets.token_hex(16),
+            "components": {},
+            "operation": None,
+            "success": None,
+            "ingestion": None,
+            "created_at": None,
+            "updated_at": None}
+
+
+class JsonStateStore:
+    def __init__(self, path):
+        """
+        Release state in a JSON file (index name -> record), the file is re-written on every change.
+
+        Args:
+            path (str): JSON file path, created on first write
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._records = {}
+        if os.path.exists(path):
+            with open(path, 'r') as f:
+                self._records = json.loads(f.read() or '{}')
+
+    def _flush(self):
+        tmp = f'{self.path}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(json.dumps(self._records, indent=4))
+        os.replace(tmp, self.path)
+
+    def put(self, record):
+        """ Save the release record, created_at is kept from the first save of the release instance. """
+        with self._lock:
+            previous = self._records.get(record["index_name"])
+            record = dict(record, updated_at=now_iso())
+            record["created_at"] = (previous or {}).get("created_at") or record.get("created_at") or record["updated_at"]
+            self._records[record["index_name"]] = record
+            self._flush()
+        return record
+
+    def get(self, index_name):
+        """ Record of the release instance, None if not recorded. """
+        with self._lock:
+            record = self._records.get(index_name)
+        return json.loads(json.dumps(record)) if record is not None else None
+
+    def releases(self, base_index_name, release_name=None):
+        """ Records of the base index (of one release if provided), oldest first. """
+        with self._lock:
+            records = [r for r in self._records.values() if r["base_index_name"] == base_index_name and
+                       (release_name is None or r["release_name"] == release_name)]
+        return json.loads(json.dumps(sorted(records, key=lambda r: (r["created_at"], r["index_name"]))))
+
+    def delete(self, index_name):
+        """ Remove the record of the release instance (e.g. after its components are deleted). """
+        with self._lock:
+            if self._records.pop(index_name, None) is not None:
+                self._flush()
+
+    def base_index_names(self):
+        """ Recorded base index names. """
+        with self._lock:
+            return sorted({r["base_index_name"] for r in self._records.values()})
+
+
+class SqliteStateStore:
+    def __init__(self, path):
+        """
+        Release state in a SQLite file, safe to share by threads of one process.
+
+        Args:
+            path (str): SQLite file path (':memory:' for a throwaway state)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+
+    def put(self, record):
+        """ Save the release record, created_at is kept from the first save of the release instance. """
+        with self._lock:
+            row = self._conn.execute('SELECT created_at FROM releases WHERE index_name = ?',
+                                     (record["index_name"],)).fetchone()
+            record = dict(record, updated_at=now_iso())
+            record["created_at"] = (row[0] if row else None) or record.get("created_at") or record["updated_at"]
+            with self._conn:
+                self._conn.execute('INSERT OR REPLACE INTO releases VALUES (?, ?, ?, ?, ?, ?)',
+                                   (record["index_name"], record["base_index_name"], record["release_name"],
+                                    record["created_at"], record["updated_at"], json.dumps(record)))
+        return record
+
+    def get(self, index_name):
+        """ Record of the release instance, None if not recorded. """
+        with self._lock:
+            row = self._conn.execute('SELECT record FROM releases WHERE index_name = ?', (index_name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def releases(self, base_index_name, release_name=None):
+        """ Records of the base index (of one release if provided), oldest first. """
+        query = 'SELECT record FROM releases WHERE base_index_name = ?'
+        params = [base_index_name]
+        if release_name is not None:
+            query += ' AND release_name = ?'
+            params.append(release_name)
+        with self._lock:
+            rows = self._conn.execute(query + ' ORDER BY created_at, index_name', params).fetchall()
+        return [json.loads(r[0]) for r in rows]
+
+    def delete(self, index_name):
+        """ Remove the record of the release instance (e.g. after its components are deleted). """
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM releases WHERE index_name = ?', (index_name,))
+
+    def base_index_names(self):
+        """ Recorded base index names. """
+        with self._lock:
+            rows = self._conn.execute('SELECT DISTINCT base_index_name FROM releases ORDER BY 1').fetchall()
+        return [r[0] for r in rows]
+
+
+def open_state_store(path):
+    """ State store of the file: SQLite for .sqlite / .sqlite3 / .db (and ':memory:'), JSON otherwise. """
+    if path == ':memory:' or path.lower().endswith(_SQLITE_EXTENSIONS):
+        return SqliteStateStore(path)
+    return JsonStateStore(path)
+
+
+def latest_release(store, base_index_name, release_name):
+    """ Newest recorded instance of the release (names with time suffix if there was a collision), None if not recorded. """
+    records = store.releases(base_index_name, release_name)
+    return records[-1] if records else None
+
+
+def known_times(store, base_index_name):
+    """ Creation times of recorded release instances (see ai_search_retention.release_times).
+    Returns:
+        times (dict): release instance -> aware datetime
+    """
+    return {r["instance"]: datetime.datetime.fromisoformat(r["created_at"])
+            for r in store.releases(base_index_name) if r.get("created_at")}
+
+
+def rotated_secrets(record, digests):
+    """ Recorded components whose secrets digest differs from the rendered one (rotated secrets).
+    Attributes:
+        record (dict): release record, None if not recorded
+        digests (dict): component -> (name, rendered secrets digest)
+    Returns:
+        components (set): components which have to be updated even if the live definition does not differ
+    """
+    if not record:
+        return set()
+    rotated = set()
+    for component, (name, digest) in digests.items():
+        recorded = record["components"].get(component)
+        if recorded and recorded.get("name") == name and recorded.get("secrets") != digest:
+            rotated.add(component)
+    return rotated
+
+
+def unchanged_components(record, hashes):
+    """ Components whose rendered definition hash equals the recorded one and the last outcome was successful.
+    Attributes:
+        record (dict): release record, None if not recorded
+        hashes (dict): component -> (name, rendered definition hash)
+    Returns:
+        components (set): components which need no live comparison
+    """
+    if not record:
+        return set()
+    unchanged = set()
+    for component, (name, digest) in hashes.items():
+        recorded = record["components"].get(component) or {}
+        if recorded.get("name") == name and recorded.get("hash") == digest and \
+                recorded.get("outcome") in SETTLED_OUTCOMES:
+            unchanged.add(component)
+    return unchanged
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Show recorded release state.')
+    parser.add_argument('--state', required=True, help='state file (.json, or .sqlite / .db)')
+    parser.add_argument('--base-index-name', required=True)
+    parser.add_argument('--release-name', default=None)
+    args = parser.parse_args()
+
+    store = open_state_store(args.state)
+    print(json.dumps(store.releases(args.base_index_name, args.release_name), indent=4))
@@ -0,0 +1,384 @@
+"""
+Instrumentation of provisioning: a span is recorded for every REST call (method, endpoint, status code,
+request / response bytes, attempt) and every pipeline stage (template load and render, validation, create_*,
+create_search ...), with duration and status. Spans of one create_search share a trace id and are linked to
+their parent stage, also across the threads of parallel steps.
+Finished spans are kept in a bounded buffer and aggregated into metrics, they could be exported as
+structured JSON log lines, OpenTelemetry (OTLP/JSON, sent to an OTLP/HTTP collector) and a Prometheus text snapshot.
+https://opentelemetry.io/docs/specs/otlp/
+https://prometheus.io/docs/instrumenting/exposition_formats/
+
+Usage:
+python ai_search_telemetry.py --spans ./spans.jsonl --format prometheus
+python ai_search_telemetry.py --spans ./spans.jsonl --format otlp --otlp-endpoint http://localhost:4318/v1/traces
+"""
+import argparse
+import collections
+import contextlib
+import contextvars
+import functools
+import json
+import random
+import sys
+import threading
+import time
+
+import requests
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+REST = 'rest'
+STAGE = 'stage'
+
+OK = 'ok'
+ERROR = 'error'
+
+# upper bounds (seconds) of the duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+SERVICE_NAME = 'azure-ai-search-ops'
+
+_current = contextvars.ContextVar('ai_search_span', default=None)
+
+
+def _new_id(bits):
+    return f'{random.getrandbits(bits):0{bits // 4}x}'
+
+
+class Tracer:
+    def __init__(self, max_spans=10000, enabled=True):
+        """
+        Span recorder: finished spans (bounded buffer), metrics aggregated from all spans and span exporters.
+
+        Args:
+            max_spans (int): number of last finished spans kept
+            enabled (bool): spans are not recorded if False
+        """
+        self.enabled = enabled
+        self.spans = collections.deque(maxlen=max_spans)
+        # (kind, name, status, label items) -> [count, duration sum, bytes in, bytes out, bucket counts]
+        self._metrics = {}
+        self._exporters = []
+        self._lock = threading.Lock()
+
+    def add_exporter(self, exporter):
+        """ Exporter is called with every finished span (dict), e.g. JsonLogExporter.
+        Its on_start method (if any) is called with every started span.
+        """
+        self._exporters.append(exporter)
+
+    def remove_exporter(self, exporter):
+        if exporter in self._exporters:
+            self._exporters.remove(exporter)
+
+    @contextlib.contextmanager
+    def span(self, name, kind=STAGE, **attributes):
+        """ Record a span of the block, status is error if the block raises or sets span["status"] = ERROR.
+        Attributes:
+            name (str): span name, e.g. create_index or GET indexes
+            kind (str): REST or STAGE
+            attributes: span attributes, more could be set in span["attributes"] inside the block
+        Yields:
+            span (dict): span being recorded
+        """
+        if not self.enabled:
+            yield {"attributes": {}, "status": OK}
+            return
+
+        parent = _current.get()
+        span = {"name": name,
+                "kind": kind,
+                "trace_id": parent["trace_id"] if parent else _new_id(128),
+                "span_id": _new_id(64),
+                "parent_id": parent["span_id"] if parent else None,
+                "start_unix_ns": time.time_ns(),
+                "duration_s": 0.0,
+                "status": OK,
+                "error": None,
+                "attributes": dict(attributes)}
+        token = _current.set(span)
+        for exporter in self._exporters:
+            if hasattr(exporter, 'on_start'):
+                try:
+                    exporter.on_start(span)
+                except Exception as e:
+                    log.debug(f'TELEMETRY: exporter failed. {e}')
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["status"] = ERROR
+            span["error"] = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            span["duration_s"] = time.perf_counter() - start
+            _current.reset(token)
+            self._finish(span)
+
+    def _finish(self, span):
+        attrs = span["attributes"]
+        if span["kind"] == REST:
+            labels = (('method', attrs.get('method')), ('endpoint', attrs.get('endpoint')),
+                      ('status_code', str(attrs.get('status_code'))))
+        else:
+            labels = ()
+        key = (span["kind"], span["name"], span["status"], labels)
+
+        with self._lock:
+            self.spans.append(span)
+            metric = self._metrics.get(key)
+            if metric is None:
+                metric = self._metrics[key] = [0, 0.0, 0, 0, [0] * len(DURATION_BUCKETS)]
+            metric[0] += 1
+            metric[1] += span["duration_s"]
+            metric[2] += attrs.get('request_bytes') or 0
+            metric[3] += attrs.get('response_bytes') or 0
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if span["duration_s"] <= bound:
+                    metric[4][i] += 1
+
+        for exporter in self._exporters:
+            try:
+                exporter(span)
+            except Exception as e:
+                log.debug(f'TELEMETRY: exporter failed. {e}')
+
+    def finished_spans(self, trace_id=None):
+        """ Finished spans (of one trace if provided), oldest first. """
+        with self._lock:
+            spans = list(self.spans)
+        return [s for s in spans if trace_id is None or s["trace_id"] == trace_id]
+
+    def metrics(self):
+        """ Aggregated metrics: (kind, name, status, labels) -> count, duration sum, bytes, bucket counts. """
+        with self._lock:
+            return {k: [v[0], v[1], v[2], v[3], list(v[4])] for k, v in self._metrics.items()}
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self._metrics.clear()
+
+
+# tracer used by all modules
+tracer = Tracer()
+
+
+def span(name, kind=STAGE, **attributes):
+    """ Span of the block recorded by the shared tracer (see Tracer.span). """
+    return tracer.span(name, kind, **attributes)
+
+
+def traced(name, **attribute_args):
+    """ Decorator - span of the function call, status is error if it returns False or raises.
+    Attributes:
+        name (str): span name
+        attribute_args: span attribute -> keyword argument of the call, e.g. component='search_index_name'
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            attributes = {a: kwargs.get(k) for a, k in attribute_args.items()}
+            with tracer.span(name, **attributes) as s:
+                result = func(*args, **kwargs)
+                if result is False:
+                    s["status"] = ERROR
+                return result
+        return wrapper
+    return decorator
+
+
+def annotate(**attributes):
+    """ Set attributes of the current span (nothing if there is none). """
+    current = _current.get()
+    if current is not None:
+        current["attributes"].update(attributes)
+
+
+def propagate(func):
+    """ Function running in a copy of the current context, spans of executor threads keep their parent span. """
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.copy().run(func, *args, **kwargs)
+
+
+class JsonLogExporter:
+    def __init__(self, stream=None, kinds=(REST, STAGE)):
+        """
+        Structured log: one JSON line per finished span.
+
+        Args:
+            stream: text stream (e.g. open file), the log is used if not provided
+            kinds (tuple): span kinds written
+        """
+        self.stream = stream
+        self.kinds = kinds
+        self._lock = threading.Lock()
+
+    def __call__(self, span):
+        if span["kind"] not in self.kinds:
+            return
+        line = json.dumps(span, separators=(',', ':'), default=str)
+        if self.stream is None:
+            log.info(f'SPAN {line}')
+            return
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+
+def _otlp_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def otlp_traces(spans, service_name=SERVICE_NAME):
+    """ Spans as OTLP/JSON ExportTraceServiceRequest.
+    Attributes:
+        spans (list): finished spans
+        service_name (str): service.name resource attribute
+    Returns:
+        request (dict): OTLP/JSON traces request
+    """
+    otlp_spans = []
+    for s in spans:
+        attributes = dict(s["attributes"], **{"ai_search.kind": s["kind"]})
+        if s["error"]:
+            attributes["exception.message"] = s["error"]
+        otlp_spans.append({
+            "traceId": s["trace_id"],
+            "spanId": s["span_id"],
+            "parentSpanId": s["parent_id"] or '',
+            "name": s["name"],
+            # SPAN_KIND_CLIENT for REST calls, SPAN_KIND_INTERNAL for stages
+            "kind": 3 if s["kind"] == REST else 1,
+            "startTimeUnixNano": str(s["start_unix_ns"]),
+            "endTimeUnixNano": str(s["start_unix_ns"] + int(s["duration_s"] * 1e9)),
+            "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items() if v is not None],
+            # STATUS_CODE_OK / STATUS_CODE_ERROR
+            "status": {"code": 2, "message": s["error"] or ''} if s["status"] == ERROR else {"code": 1}})
+
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+        "scopeSpans": [{"scope": {"name": 'ai_search_telemetry'}, "spans": otlp_spans}]}]}
+
+
+def export_otlp(endpoint, spans=None, headers=None, service_name=SERVICE_NAME, timeout=10):
+    """ Send spans to an OTLP/HTTP collector (JSON encoding), e.g. http://localhost:4318/v1/traces.
+    Attributes:
+        endpoint (str): collector traces url
+        spans (list): spans to send, all finished spans of the shared tracer if not provided
+        headers (dict): extra headers (e.g. authorization)
+    Returns:
+        success (bool): if the collector accepted the spans
+    """
+    spans = tracer.finished_spans() if spans is None else spans
+    try:
+        rr = requests.post(endpoint, data=json.dumps(otlp_traces(spans, service_name)), timeout=timeout,
+                           headers=dict({"Content-Type": "application/json"}, **(headers or {})))
+    except Exception as e:
+        log.error(f'TELEMETRY: spans are NOT exported to {endpoint}. {e}')
+        return False
+    if rr.status_code not in [200, 202]:
+        log.error(f'TELEMETRY: [{rr.status_code}] spans are NOT exported to {endpoint}. {rr.text}')
+        return False
+    log.info(f'TELEMETRY: {len(spans)} spans exported to {endpoint}.')
+    return True
+
+
+def _labels(items):
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in items]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def prometheus_snapshot(metrics=None):
+    """ Metrics as Prometheus text exposition format.
+    Attributes:
+        metrics (dict): aggregated metrics (see Tracer.metrics), the shared tracer if not provided
+    Returns:
+        text (str): ai_search_rest_* and ai_search_stage_* metrics
+    """
+    metrics = tracer.metrics() if metrics is None else metrics
+    rest = {k: v for k, v in metrics.items() if k[0] == REST}
+    stages = {k: v for k, v in metrics.items() if k[0] == STAGE}
+    lines = []
+
+    def _histogram(family, series, help_text):
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} histogram')
+        for labels, (count, total, _, _, buckets) in series:
+            for bound, n in zip(DURATION_BUCKETS, buckets):
+                lines.append(f'{family}_bucket{_labels(labels + [("le", bound)])} {n}')
+            lines.append(f'{family}_bucket{_labels(labels + [("le", "+Inf")])} {count}')
+            lines.append(f'{family}_sum{_labels(labels)} {total:.6f}')
+            lines.append(f'{family}_count{_labels(labels)} {count}')
+
+    _histogram('ai_search_rest_request_duration_seconds',
+               [(list(labels), v) for (_, _, _, labels), v in sorted(rest.items(), key=lambda i: str(i[0]))],
+               'Duration of REST call attempts to the search service.')
+    lines.append('# HELP ai_search_rest_bytes_total Bytes sent to / received from the search service.')
+    lines.append('# TYPE ai_search_rest_bytes_total counter')
+    for direction, i in [('sent', 2), ('received', 3)]:
+        totals = collections.Counter()
+        for (_, _, _, labels), v in rest.items():
+            totals[dict(labels).get('endpoint')] += v[i]
+        for endpoint, n in sorted(totals.items(), key=lambda i: str(i[0])):
+            lines.append(f'ai_search_rest_bytes_total{_labels([("endpoint", endpoint), ("direction", direction)])} {n}')
+
+    _histogram('ai_search_stage_duration_seconds',
+               [([("stage", name), ("status", status)], v)
+                for (_, name, status, _), v in sorted(stages.items(), key=lambda i: str(i[0]))],
+               'Duration of provisioning stages.')
+    return '\n'.join(lines) + '\n'
+
+
+def trace_summary(spans):
+    """ Where the time of a trace goes: duration, count and REST calls per stage name.
+    Returns:
+        rows (list): name, kind, count, total_s, max_s, errors - longest first
+    """
+    rows = {}
+    for s in spans:
+        row = rows.setdefault((s["kind"], s["name"]), {"name": s["name"], "kind": s["kind"], "count": 0,
+                                                         "total_s": 0.0, "max_s": 0.0, "errors": 0})
+        row["count"] += 1
+        row["total_s"] += s["duration_s"]
+        row["max_s"] = max(row["max_s"], s["duration_s"])
+        row["errors"] += s["status"] == ERROR
+    return sorted(rows.values(), key=lambda r: r["total_s"], reverse=True)
+
+
+def _replay(spans):
+    """ Tracer holding the spans (e.g. read from a JSON log), for metrics export. """
+    replay = Tracer(max_spans=len(spans) or 1)
+    for s in spans:
+        replay._finish(s)
+    return replay
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export spans of a JSON span log.')
+    parser.add_argument('--spans', required=True, help='JSON lines file written by JsonLogExporter')
+    parser.add_argument('--format', default='prometheus', choices=['prometheus', 'otlp', 'summary'])
+    parser.add_argument('--otlp-endpoint', default='', help='OTLP/HTTP traces url, spans are printed if not set')
+    args = parser.parse_args()
+
+    with open(args.spans, 'r') as f:
+        spans = [json.loads(line) for line in f if line.strip()]
+
+    if args.format == 'prometheus':
+        sys.stdout.write(prometheus_snapshot(_replay(spans).metrics()))
+    elif args.format == 'summary':
+        for row in trace_summary(spans):
+            print(f'{row["kind"]:>5} {row["name"]:<40} {row["count"]:>6} {row["total_s"]:>10.3f} s '
+                  f'{row["max_s"]:>8.3f} s {row["errors"]:>4} errors')
+    elif args.otlp_endpoint:
+        exit(0 if export_otlp(args.otlp_endpoint, spans) else 1)
+    else:
+        print(json.dumps(otlp_traces(spans), indent=4))
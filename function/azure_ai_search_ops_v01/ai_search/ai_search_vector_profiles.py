@@ -0,0 +1,205 @@
+"""
+Vector storage profiles of the index: compression (scalar / binary quantization) with rescoring and oversampling,
+narrower vector type (Edm.Half) and stored: false for vectors which do not need to be retrievable.
+HNSW parameters (m, efConstruction, efSearch, metric) of the template could be overridden (see ai_search_hnsw_sweep).
+Profiles are applied to the rendered index definition and the vector index memory of every profile is estimated,
+vector index quota per search unit is the scaling limit of vector indexes.
+https://learn.microsoft.com/en-us/azure/search/vector-search-how-to-configure-compression-storage
+
+Usage:
+python ai_search_vector_profiles.py --index-schema ./data/vector-index/ai_search_index_schema.json --vectors 1000000
+"""
+import argparse
+import json
+
+from azure_ai_search_ops_v01.ai_search import ai_search_template as ais_template
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+SINGLE = 'Collection(Edm.Single)'
+HALF = 'Collection(Edm.Half)'
+
+# named vector storage profiles
+# compression: None, scalarQuantization or binaryQuantization
+# vector_type: vector field type, None - as in the template
+# stored: vector field 'stored' (False - not retrievable, no second copy on disk), None - as in the template
+VECTOR_PROFILES = {
+    'full': {"compression": None, "vector_type": None, "stored": None},
+    'half': {"compression": None, "vector_type": HALF, "stored": None},
+    'lean': {"compression": None, "vector_type": None, "stored": False},
+    'scalar': {"compression": 'scalarQuantization', "vector_type": None, "stored": None,
+               "rerank": True, "oversampling": 4},
+    'scalar-lean': {"compression": 'scalarQuantization', "vector_type": None, "stored": False,
+                    "rerank": True, "oversampling": 4},
+    'binary': {"compression": 'binaryQuantization', "vector_type": None, "stored": None,
+               "rerank": True, "oversampling": 10},
+    'binary-lean': {"compression": 'binaryQuantization', "vector_type": None, "stored": False,
+                    "rerank": True, "oversampling": 10},
+}
+
+# bytes per vector dimension held in the vector index (memory)
+_TYPE_BYTES = {SINGLE: 4, HALF: 2}
+_COMPRESSION_BYTES = {'scalarQuantization': 1, 'binaryQuantization': 1 / 8}
+
+# allowed HNSW parameter values (2024-07-01)
+HNSW_RANGES = {"m": (4, 10), "efConstruction": (100, 1000), "efSearch": (100, 1000)}
+METRICS = ['cosine', 'euclidean', 'dotProduct']
+
+# HNSW graph: 2 * m neighbour links of 4 bytes on the base layer, upper layers add about 1 / (m - 1) of it
+_LINK_BYTES = 4
+
+
+def _vector_fields(data):
+    return [f for f in data.get("fields", []) if f.get("dimensions")]
+
+
+def apply_vector_profile(data, profile_name):
+    """ Apply the named vector storage profile to the rendered index definition (in place).
+    Attributes:
+        data (dict): rendered index definition
+        profile_name (str): VECTOR_PROFILES key
+    Returns:
+        data (dict): updated index definition
+    """
+    if profile_name not in VECTOR_PROFILES:
+        raise ValueError(f"Unknown vector profile '{profile_name}', available: {list(VECTOR_PROFILES)}.")
+    profile = VECTOR_PROFILES[profile_name]
+    vector_search = data.get("vectorSearch")
+    if not vector_search:
+        return data
+
+    if profile["compression"] == 'binaryQuantization' and profile["vector_type"] == HALF:
+        raise ValueError('Binary quantization requires Collection(Edm.Single) vectors.')
+
+    if profile["compression"]:
+        compression_name = f'{profile_name}-compression'
+        compression = {"name": compression_name,
+                       "kind": profile["compression"],
+                       "rerankWithOriginalVectors": profile["rerank"],
+                       "defaultOversampling": profile["oversampling"]}
+        if profile["compression"] == 'scalarQuantization':
+            compression["scalarQuantizationParameters"] = {"quantizedDataType": "int8"}
+
+        vector_search["compressions"] = [c for c in vector_search.get("compressions") or []
+                                         if c.get("name") != compression_name] + [compression]
+        for vector_profile in vector_search.get("profiles", []):
+            vector_profile["compression"] = compression_name
+
+    for field in _vector_fields(data):
+        if profile["vector_type"]:
+            field["type"] = profile["vector_type"]
+        if profile["stored"] is False:
+            # not stored vectors could not be retrievable
+            field["stored"] = False
+            field["retrievable"] = False
+    return data
+
+
+def apply_hnsw_parameters(data, hnsw):
+    """ Set HNSW parameters of the hnsw algorithms of the rendered index definition (in place).
+    Attributes:
+        data (dict): rendered index definition
+        hnsw (dict): any of m, efConstruction, efSearch, metric - other parameters are kept from the template
+    Returns:
+        data (dict): updated index definition
+    """
+    unknown = set(hnsw) - set(HNSW_RANGES) - {'metric'}
+    if unknown:
+        raise ValueError(f"Unknown HNSW parameters {sorted(unknown)}, available: {list(HNSW_RANGES) + ['metric']}.")
+    for name, (low, high) in HNSW_RANGES.items():
+        if name in hnsw and not low <= hnsw[name] <= high:
+            raise ValueError(f"HNSW {name} {hnsw[name]} is out of range {low} - {high}.")
+    if 'metric' in hnsw and hnsw["metric"] not in METRICS:
+        raise ValueError(f"Unknown metric '{hnsw['metric']}', available: {METRICS}.")
+
+    for algorithm in (data.get("vectorSearch") or {}).get("algorithms", []):
+        if algorithm.get("kind") == 'hnsw':
+            algorithm["hnswParameters"] = dict(algorithm.get("hnswParameters") or {}, **hnsw)
+    return data
+
+
+def _field_compression(data, field):
+    """ Compression kind of the vector field (through its vector search profile), None if not compressed. """
+    vector_search = data.get("vectorSearch") or {}
+    profile = next((p for p in vector_search.get("profiles", []) if p["name"] == field.get("vectorSearchProfile")), {})
+    compression = next((c for c in vector_search.get("compressions") or []
+                        if c["name"] == profile.get("compression")), {})
+    algorithm = next((a for a in vector_search.get("algorithms", []) if a["name"] == profile.get("algorithm")), {})
+    return compression.get("kind"), (algorithm.get("hnswParameters") or {}).get("m"), algorithm.get("kind")
+
+
+def estimate_vector_storage(data, vector_count):
+    """ Estimated vector index memory and disk size of the index definition.
+    Attributes:
+        data (dict): index definition
+        vector_count (int): number of documents (chunks) with vectors
+    Returns:
+        estimate (dict): vector_index_bytes (memory, counted against vector index quota) and disk_bytes per field and total
+    """
+    fields = {}
+    for field in _vector_fields(data):
+        dims = field["dimensions"]
+        type_bytes = _TYPE_BYTES.get(field.get("type"), 4)
+        compression, m, kind = _field_compression(data, field)
+
+        per_vector = dims * _COMPRESSION_BYTES.get(compression, type_bytes)
+        if kind == 'hnsw' and m:
+            per_vector += 2 * m * _LINK_BYTES * (1 + 1 / max(1, m - 1))
+
+        # full precision vectors are kept on disk (for rescoring), retrievable copy is stored on top
+        disk_per_vector = dims * type_bytes * (2 if field.get("stored", True) else 1)
+        if compression:
+            disk_per_vector += dims * _COMPRESSION_BYTES[compression]
+
+        fields[field["name"]] = {"dimensions": dims, "type": field.get("type"), "compression": compression,
+                                 "stored": field.get("stored", True),
+                                 "vector_index_bytes": int(per_vector * vector_count),
+                                 "disk_bytes": int(disk_per_vector * vector_count)}
+
+    return {"vector_count": vector_count,
+            "fields": fields,
+            "vector_index_bytes": sum(f["vector_index_bytes"] for f in fields.values()),
+            "disk_bytes": sum(f["disk_bytes"] for f in fields.values())}
+
+
+def vector_profiles_report(data, vector_count, profiles=None):
+    """ Estimated vector storage of the index definition for every vector profile.
+    Attributes:
+        data (dict): rendered index definition (not changed)
+        vector_count (int): number of documents (chunks) with vectors
+        profiles (list): profile names, all VECTOR_PROFILES if not provided
+    Returns:
+        rows (list): profile, vector_index_bytes, disk_bytes and memory ratio compared to 'full'
+    """
+    rows = []
+    compact = json.dumps(data)
+    for name in profiles or list(VECTOR_PROFILES):
+        estimate = estimate_vector_storage(apply_vector_profile(json.loads(compact), name), vector_count)
+        rows.append({"profile": name,
+                     "vector_index_bytes": estimate["vector_index_bytes"],
+                     "disk_bytes": estimate["disk_bytes"]})
+
+    base = estimate_vector_storage(apply_vector_profile(json.loads(compact), 'full'), vector_count)
+    for row in rows:
+        row["memory_ratio"] = row["vector_index_bytes"] / base["vector_index_bytes"] if base["vector_index_bytes"] else 0.0
+    return rows
+
+
+def format_report(rows):
+    """ Vector profiles report as a text table (sizes in MB). """
+    lines = [f'{"profile":>12} {"vector index MB":>16} {"disk MB":>12} {"memory ratio":>13}']
+    for r in rows:
+        lines.append(f'{r["profile"]:>12} {r["vector_index_bytes"] / 1024 ** 2:>16.1f} '
+                     f'{r["disk_bytes"] / 1024 ** 2:>12.1f} {r["memory_ratio"]:>13.3f}')
+    return '\n'.join(lines)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Estimate vector index memory of the vector storage profiles.')
+    parser.add_argument('--index-schema', default='./data/vector-index/ai_search_index_schema.json')
+    parser.add_argument('--vectors', type=int, required=True, help='number of documents (chunks) with vectors')
+    args = parser.parse_args()
+
+    print(format_report(vector_profiles_report(ais_template.load_template(args.index_schema), args.vectors)))
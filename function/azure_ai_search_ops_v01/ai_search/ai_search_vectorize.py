@@ -0,0 +1,399 @@
+"""
+Client-side chunking and embedding pipeline (alternative to SplitSkill + AzureOpenAIEmbeddingSkill skillset).
+Documents are split into pages the same way as SplitSkill in 'pages' mode (maximumPageLength / pageOverlapLength),
+chunks are embedded in batches by a pluggable embedding backend with bounded parallelism and the
+chunk_id / parent_id / chunk / title / text_vector records are pushed through the docs API (ai_search_push.py).
+https://learn.microsoft.com/en-us/azure/search/cognitive-search-skill-textsplit
+
+Usage:
+python ai_search_vectorize.py --index vect-index-release01 --folder ./docs --config ../config.json --batch-size 16 --max-workers 4
+python ai_search_vectorize.py --index vect-index-release01 --folder ./docs --config ../config.json --stub
+python ai_search_vectorize.py --index vect-index-release02 --folder ./docs --config ../config.json --cache ./embeddings.sqlite
+"""
+import argparse
+import base64
+import concurrent.futures
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from azure_ai_search_ops_v01.ai_search import ai_search_client as ais_client
+from azure_ai_search_ops_v01.ai_search import ai_search_embedding_cache as ais_embedding_cache
+from azure_ai_search_ops_v01.ai_search import ai_search_push as ais_push
+from azure_ai_search_ops_v01.ai_search import ai_search_template as ais_template
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+AOAI_API_VERSION = '2024-02-01'
+
+# SplitSkill defaults of the vector skillset
+MAX_PAGE_LENGTH = 2000
+PAGE_OVERLAP_LENGTH = 500
+
+_SENTENCE_ENDS = '.!?\n'
+
+
+def _page_end(text, start, end):
+    """ End of the page: last sentence end in the second half of the window, else last whitespace, else hard cut. """
+    half = start + (end - start) // 2
+    for i in range(end - 1, half, -1):
+        if text[i] in _SENTENCE_ENDS and (i + 1 >= len(text) or text[i + 1].isspace()):
+            return i + 1
+    for i in range(end - 1, half, -1):
+        if text[i].isspace():
+            return i + 1
+    return end
+
+
+def _overlap_start(text, start, end):
+    """ Overlap starts on a word boundary (not in the middle of a word). """
+    if start == 0 or text[start - 1].isspace():
+        return start
+    for i in range(start, end):
+        if text[i].isspace():
+            return i + 1
+    return start
+
+
+def split_pages(text, max_page_length=MAX_PAGE_LENGTH, page_overlap_length=PAGE_OVERLAP_LENGTH, max_pages=0):
+    """ Split text into pages (SplitSkill 'pages' mode).
+    Pages are at most max_page_length characters long and end on a sentence (or word) boundary if possible,
+    each page starts with the last page_overlap_length characters of the previous one.
+    Attributes:
+        text (str): document text
+        max_page_length (int): maximumPageLength
+        page_overlap_length (int): pageOverlapLength, must be less than max_page_length
+        max_pages (int): maximumPagesToTake, 0 - all pages
+    Returns:
+        pages (list): page texts
+    """
+    if page_overlap_length >= max_page_length:
+        raise ValueError(f'pageOverlapLength {page_overlap_length} must be less than maximumPageLength {max_page_length}.')
+
+    text = text or ''
+    pages = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + max_page_length)
+        if end < len(text):
+            end = _page_end(text, start, end)
+
+        page = text[start:end].strip()
+        if page:
+            pages.append(page)
+        if end >= len(text) or (max_pages and len(pages) >= max_pages):
+            break
+
+        next_start = max(end - page_overlap_length, start + 1)
+        start = _overlap_start(text, next_start, end) if page_overlap_length else end
+    return pages
+
+
+def split_settings(skillset_def_path):
+    """ SplitSkill settings of the skillset definition.
+    Returns:
+        settings (dict): max_page_length, page_overlap_length, max_pages
+    """
+    skillset = ais_template.load_template(skillset_def_path)
+    skill = next(s for s in skillset["skills"] if s["@odata.type"] == '#Microsoft.Skills.Text.SplitSkill')
+    return {"max_page_length": skill.get("maximumPageLength") or MAX_PAGE_LENGTH,
+            "page_overlap_length": skill.get("pageOverlapLength") or 0,
+            "max_pages": skill.get("maximumPagesToTake") or 0}
+
+
+def chunk_key(parent_id, page_number):
+    """ Chunk key (letters, digits, _ - = only), stable for the same parent and page. """
+    parent_key = base64.urlsafe_b64encode(parent_id.encode('utf-8')).decode('ascii')
+    return f'{parent_key}_pages_{page_number}'
+
+
+class StubEmbeddingBackend:
+    def __init__(self, dimensions=1536, model_name='stub-embedding', latency_s=0.0):
+        """
+        Deterministic local embedding backend for tests and offline runs:
+        the same text always gets the same unit vector (seeded by the text hash).
+
+        Args:
+            dimensions (int): vector dimensions
+            model_name (str): model name reported by the backend
+            latency_s (float): simulated latency per call
+        """
+        self.dimensions = dimensions
+        self.model_name = model_name
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def _vector(self, text):
+        rng = random.Random(hashlib.sha256(text.encode('utf-8')).digest())
+        vector = [rng.gauss(0.0, 1.0) for _ in range(self.dimensions)]
+        norm = math.sqrt(sum(v * v for v in vector)) or 1.0
+        return [v / norm for v in vector]
+
+    def embed(self, texts):
+        """ Embeddings of the texts, in the same order. """
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return [self._vector(text) for text in texts]
+
+
+class AzureOpenAIEmbeddingBackend:
+    def __init__(self, aoai_resource, aoai_apikey, deployment_id, model_name, dimensions=1536,
+                 send_dimensions=False, api_version=AOAI_API_VERSION, timeout=(5, 60), pool_maxsize=16,
+                 retry_policy=None):
+        """
+        Azure OpenAI embeddings backend, one pooled session, throttled calls, connection errors and timeouts
+        are retried (see RetryPolicy) - embedding calls have no side effects, they are safe to re-send.
+
+        Args:
+            aoai_resource (str): Azure OpenAI resource url
+            aoai_apikey (str): Azure OpenAI API key
+            deployment_id (str): embedding model deployment
+            model_name (str): embedding model name
+            dimensions (int): vector dimensions
+            send_dimensions (bool): send dimensions in the request (text-embedding-3 models only)
+            api_version (str): Azure OpenAI API version
+            timeout (tuple): connect and read timeout in seconds
+            pool_maxsize (int): max number of kept-alive connections
+            retry_policy (RetryPolicy): retry policy, default policy if not provided
+        """
+        self.url = f"{aoai_resource.rstrip('/')}/openai/deployments/{deployment_id}/embeddings"
+        self.model_name = model_name
+        self.dimensions = dimensions
+        self.send_dimensions = send_dimensions
+        self.api_version = api_version
+        self.timeout = timeout
+        self.retry_policy = retry_policy or ais_client.RetryPolicy()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({"Content-Type": "application/json", "api-key": aoai_apikey})
+
+    def embed(self, texts):
+        """ Embeddings of the texts, in the same order. """
+        body = {"input": list(texts)}
+        if self.send_dimensions:
+            body["dimensions"] = self.dimensions
+        data = json.dumps(body)
+
+        attempt = 0
+        while True:
+            with self._lock:
+                self.calls += 1
+            try:
+                rr = self.session.post(self.url, params={"api-version": self.api_version}, data=data,
+                                       timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if attempt >= self.retry_policy.max_retries:
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                log.warning(f"EMBEDDINGS [{e}] - retry {attempt + 1} in {delay:.2f} s.")
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            if rr.status_code == 200:
+                items = sorted(rr.json()["data"], key=lambda item: item["index"])
+                return [item["embedding"] for item in items]
+
+            if attempt >= self.retry_policy.max_retries or not self.retry_policy.should_retry('POST', rr.status_code):
+                raise RuntimeError(f"[{rr.status_code}]: embeddings of {len(texts)} texts are NOT created. {rr.text}")
+
+            delay = self.retry_policy.delay(attempt, rr)
+            log.warning(f"EMBEDDINGS [{rr.status_code}] - retry {attempt + 1} in {delay:.2f} s.")
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        self.session.close()
+
+
+def iter_text_files(folder, extensions=('.txt', '.md')):
+    """ Source documents of a local folder, read lazily.
+    Attributes:
+        folder (str): folder with text files (searched recursively)
+        extensions (tuple): file extensions to read
+    Yields:
+        doc (dict): parent_id (path relative to the folder), title (file name) and content
+    """
+    for root, _, files in os.walk(folder):
+        for file_name in sorted(files):
+            if not file_name.endswith(extensions):
+                continue
+            path = os.path.join(root, file_name)
+            with open(path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            yield {"parent_id": os.path.relpath(path, folder).replace(os.sep, '/'),
+                   "title": file_name,
+                   "content": content}
+
+
+class ChunkEmbeddingPipeline:
+    def __init__(self, backend, batch_size=16, max_workers=4,
+                 max_page_length=MAX_PAGE_LENGTH, page_overlap_length=PAGE_OVERLAP_LENGTH, max_pages=0,
+                 vector_field='text_vector'):
+        """
+        Chunk documents, embed chunks in batches (max_workers batches at the same time) and build index records.
+
+        Args:
+            backend: embedding backend with model_name, dimensions and embed(texts)
+            batch_size (int): chunks per embedding call
+            max_workers (int): embedding calls at the same time
+            max_page_length (int): SplitSkill maximumPageLength
+            page_overlap_length (int): SplitSkill pageOverlapLength
+            max_pages (int): SplitSkill maximumPagesToTake, 0 - all pages
+            vector_field (str): vector field of the index
+        """
+        self.backend = backend
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.max_page_length = max_page_length
+        self.page_overlap_length = page_overlap_length
+        self.max_pages = max_pages
+        self.vector_field = vector_field
+
+        self.stats = {"documents": 0, "chunks": 0, "embedding_batches": 0, "embedding_s": 0.0}
+        self._lock = threading.Lock()
+
+    def chunk_records(self, docs):
+        """ Index records without vectors.
+        Attributes:
+            docs (iterable): documents with parent_id, title and content
+        Yields:
+            record (dict): chunk_id, parent_id, chunk, title
+        """
+        for doc in docs:
+            self.stats["documents"] += 1
+            pages = split_pages(doc.get("content"), self.max_page_length, self.page_overlap_length, self.max_pages)
+            for page_number, page in enumerate(pages):
+                self.stats["chunks"] += 1
+                yield {"chunk_id": chunk_key(doc["parent_id"], page_number),
+                       "parent_id": doc["parent_id"],
+                       "chunk": page,
+                       "title": doc.get("title")}
+
+    def _embed_batch(self, batch):
+        start = time.perf_counter()
+        vectors = self.backend.embed([record["chunk"] for record in batch])
+        if len(vectors) != len(batch):
+            raise RuntimeError(f'Embedding backend returned {len(vectors)} vectors for {len(batch)} chunks.')
+
+        for record, vector in zip(batch, vectors):
+            if len(vector) != self.backend.dimensions:
+                raise RuntimeError(f'Embedding has {len(vector)} dimensions, {self.backend.dimensions} expected.')
+            record[self.vector_field] = vector
+
+        with self._lock:
+            self.stats["embedding_batches"] += 1
+            self.stats["embedding_s"] += time.perf_counter() - start
+        return batch
+
+    def _batches(self, records):
+        batch = []
+        for record in records:
+            batch.append(record)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def records(self, docs):
+        """ Index records with vectors, at most max_workers embedding batches are in flight.
+        Attributes:
+            docs (iterable): documents with parent_id, title and content
+        Yields:
+            record (dict): chunk_id, parent_id, chunk, title and vector
+        """
+        in_flight = []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch in self._batches(self.chunk_records(docs)):
+                if len(in_flight) >= self.max_workers:
+                    # records are yielded in document order
+                    yield from in_flight.pop(0).result()
+                in_flight.append(executor.submit(self._embed_batch, batch))
+
+            for future in in_flight:
+                yield from future.result()
+
+    def run(self, client, index_name, docs, key_field='chunk_id', max_in_flight=4, **kwargs):
+        """ Chunk, embed and push documents into the index.
+        Attributes:
+            client (AISearchClient): pooled REST client
+            index_name (str): target index name
+            docs (iterable): documents with parent_id, title and content
+            key_field (str): key field of the index
+            max_in_flight (int): push batches sent at the same time
+            kwargs: batch settings of DocumentPusher
+        Returns:
+            summary (dict): push summary with documents, chunks, embedding batches and chunks/s
+        """
+        log.info(f"VECTORIZE '{index_name}' ({self.backend.model_name}, batch {self.batch_size}, "
+                 f"{self.max_workers} workers) - start.")
+        start = time.perf_counter()
+
+        summary = ais_push.push_documents(client, index_name, key_field, self.records(docs),
+                                          max_in_flight=max_in_flight, **kwargs)
+
+        duration = time.perf_counter() - start
+        summary.update(self.stats)
+        summary["duration_s"] = duration
+        summary["chunks_per_s"] = self.stats["chunks"] / duration if duration > 0 else 0.0
+
+        # hit rate of cached backend (ai_search_embedding_cache.CachedEmbeddingBackend)
+        cache_stats = getattr(self.backend, 'cache_stats', None)
+        if cache_stats is not None:
+            summary.update(cache_stats())
+            log.info(f"VECTORIZE '{index_name}' - embedding cache hit rate {summary['cache_hit_rate']:.1%} "
+                     f"({summary['cache_hits']} hits, {summary['cache_misses']} misses).")
+
+        log.info(f"VECTORIZE '{index_name}' - end. {self.stats['documents']} documents, {self.stats['chunks']} chunks, "
+                 f"{self.stats['embedding_batches']} embedding batches, {summary['chunks_per_s']:.1f} chunks/s.")
+        return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Chunk, embed and push local documents into AI Search index.')
+    parser.add_argument('--index', required=True, help='target index name')
+    parser.add_argument('--folder', required=True, help='folder with .txt / .md documents')
+    parser.add_argument('--config', default='../config.json', help='config json file')
+    parser.add_argument('--skillset-def', default='./data/vector-index/ai_search_skillset_vector_def_v2.json',
+                        help='skillset definition the SplitSkill settings are taken from')
+    parser.add_argument('--batch-size', type=int, default=16, help='chunks per embedding call')
+    parser.add_argument('--max-workers', type=int, default=4, help='embedding calls at the same time')
+    parser.add_argument('--dimensions', type=int, default=1536, help='vector dimensions')
+    parser.add_argument('--stub', action='store_true', help='use deterministic stub embeddings (no Azure OpenAI)')
+    parser.add_argument('--cache', default='', help='SQLite embedding cache file shared by releases')
+    parser.add_argument('--cache-max-mb', type=float, default=2048, help='max embedding cache size in MB')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.loads(f.read())
+
+    if args.stub:
+        backend = StubEmbeddingBackend(dimensions=args.dimensions)
+    else:
+        backend = AzureOpenAIEmbeddingBackend(config["AOAIResource"], config["AOAIAPIKEY"],
+                                              config["AOAIDeploymentID"], config["AOAIModelName"],
+                                              dimensions=args.dimensions)
+    if args.cache:
+        cache = ais_embedding_cache.EmbeddingCache(args.cache, max_bytes=int(args.cache_max_mb * 1024 ** 2))
+        backend = ais_embedding_cache.CachedEmbeddingBackend(backend, cache)
+
+    client = ais_client.get_client(config["AISearchEndpoint"], config["AISearchAPIKey"], '2024-07-01')
+    pipeline = ChunkEmbeddingPipeline(backend, batch_size=args.batch_size, max_workers=args.max_workers,
+                                      **split_settings(args.skillset_def))
+    summary = pipeline.run(client, args.index, iter_text_files(args.folder))
+    print(json.dumps(summary, indent=4))
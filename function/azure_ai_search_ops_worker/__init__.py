@@ -0,0 +1,47 @@
+"""
+Queue triggered worker of the operations accepted by the HTTP function (azure_ai_search_ops_v01).
+Provisioning runs inside this invocation, status and progress are written to OPERATIONS_DIR (shared by instances),
+so the status is readable by any instance serving the HTTP function.
+A message redelivered after a timeout or crash of the worker resumes the interrupted operation: components
+with the names resolved by it are reconciled, no second stack is created.
+"""
+import json
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+import azure.functions as func
+
+import azure_ai_search_ops_v01 as ops_function
+from azure_ai_search_ops_v01.ai_search import ai_search_operations
+
+
+def _resume(aisearchops, record):
+    """Interrupted operation: reconcile the recorded names, create if it stopped before names were resolved"""
+    if record.get("names"):
+        return aisearchops.reconcile_search(names=record["names"])
+    return aisearchops.create_search()
+
+
+def main(msg: func.QueueMessage) -> None:
+    body = json.loads(msg.get_body().decode('utf-8'))
+    operation_id = body["operation_id"]
+    try:
+        operations = ops_function._get_operations()
+    except RuntimeError as e:
+        # message is retried and moved to the poison queue, status could not be recorded anywhere
+        log.error(e)
+        raise
+
+    record = operations.get(operation_id)
+    if record is None:
+        log.error(f"OPERATION '{operation_id}' is not recorded in OPERATIONS_DIR, message is dropped.")
+        return
+    if record["status"] in ai_search_operations.FINISHED:
+        # message delivered again after the operation finished
+        log.info(f"OPERATION '{operation_id}' is already {record['status']}, skipped.")
+        return
+
+    aisearchops = ops_function.new_ai_search_ops(body["release_name"], body["base_index_name"])
+    record = operations.run(operation_id, aisearchops.create_search, result=lambda: aisearchops.components,
+                            resume=lambda interrupted: _resume(aisearchops, interrupted))
+    log.info(f"OPERATION '{operation_id}' {record['status']} (dequeue count {msg.dequeue_count}).")
@@ -1,12 +1,49 @@
 
-import requests
 import json
 
+import ai_search_client as ais_client
+import ai_search_telemetry as ais_telemetry
+
 import logging as log
 log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
 
+
+def _prep_data_source_def(data_src_name, data_src_connstr, data_src_container, data_src_dir):
+    """ Data source definition.
+    Attributes:
+        data_src_name (str): data source name
+        data_src_connstr (str): storage account connection string
+        data_src_container (str): data container
+        data_src_dir (str): data folder
+    Returns:
+        data_source_def (dict): data source definition json
+    """
+    return {
+        "name": data_src_name,
+        "type": "adlsgen2",
+        "credentials": {"connectionString": data_src_connstr},
+        "container": {"name": data_src_container, "query": data_src_dir}
+    }
+
+
+def shard_folders(data_src_dir, shards):
+    """ Folders (blob prefixes) of the data source shards.
+    Attributes:
+        data_src_dir (str): data folder
+        shards (int or list): number of shards - sub-folders shard-00, shard-01, ... or list of sub-folder names
+    Returns:
+        folders (list): folder of every shard
+    """
+    if isinstance(shards, int):
+        shards = [f'shard-{i:02d}' for i in range(shards)]
+    base = data_src_dir.rstrip('/')
+    return [f'{base}/{sub.strip("/")}' if base else sub.strip('/') for sub in shards]
+
+
+@ais_telemetry.traced('create_data_source', component='data_src_name')
 def create_data_source(ai_search_resource, ai_search_apikey, search_api_version,
-                      data_src_name, data_src_connstr, data_src_container, data_src_dir):
+                      data_src_name, data_src_connstr, data_src_container, data_src_dir,
+                      client=None):
     """ Create data source in AI Search
     https://learn.microsoft.com/en-us/azure/search/search-howto-index-azure-data-lake-storage
     https://learn.microsoft.com/en-us/rest/api/searchservice/create-data-source 
@@ -19,6 +56,7 @@ def create_data_source(ai_search_resource, ai_search_apikey, search_api_version,
         data_src_connstr (str): storage account connection string
         data_src_container (str): data container
         data_src_dir (str): data folder
+        client (AISearchClient): pooled client, shared client for the service is used if not provided
     Returns:
         success (bool): True if creation is successful
     """
@@ -28,26 +66,17 @@ def create_data_source(ai_search_resource, ai_search_apikey, search_api_version,
     log.info(f'CREATE {elem} - start.')
 
     # create data source definition
-    data_source_def = {
-        "name": data_src_name,
-        "type": "adlsgen2",
-        "credentials": {"connectionString": data_src_connstr},
-        "container": {"name": data_src_container, "query": data_src_dir}
-    }
+    data_source_def = _prep_data_source_def(data_src_name, data_src_connstr, data_src_container, data_src_dir)
 
     # POST https://[service name].search.windows.net/datasources?api-version=[api-version]  
     # Content-Type: application/json  
     # api-key: [admin key]
 
     try:
-        headers = {
-                "Content-Type": "application/json",
-                "api-key": ai_search_apikey
-            }
-
-        url = f"{ai_search_resource}/datasources?api-version={search_api_version}"
+        if client is None:
+            client = ais_client.get_client(ai_search_resource, ai_search_apikey, search_api_version)
 
-        rr = requests.post(url=url, headers=headers, data=json.dumps(data_source_def))
+        rr = client.post('datasources', data=json.dumps(data_source_def))
 
         if rr.status_code in [200, 201]:
             log.info(f"[{rr.status_code}]: '{data_src_name}' data source created OK.")
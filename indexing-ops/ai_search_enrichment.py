@@ -0,0 +1,153 @@
+"""
+Incremental enrichment (enrichment cache) of the indexer and report of skills invalidated by a definition change.
+With the cache enabled, skill outputs are kept in a storage account and only skills affected by a skillset
+change (and skills downstream of them) are re-run, unchanged skills are served from the cache.
+https://learn.microsoft.com/en-us/azure/search/cognitive-search-incremental-indexing-conceptual
+
+Usage:
+python ai_search_enrichment.py --old-skillset ./old_skillset.json --new-skillset ./data/vector-index/ai_search_skillset_vector_def_v2.json
+"""
+import argparse
+import json
+
+import ai_search_reconcile as ais_reconcile
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+# skill keys which do not change skill outputs
+SKILL_IGNORED_KEYS = {'description'}
+
+# indexer keys which change document cracking - all skills are re-run
+INDEXER_CRACKING_KEYS = ('dataSourceName', 'fieldMappings', 'parameters')
+
+
+def enrichment_cache(storage_conn_str, enable_reprocessing=True):
+    """ Indexer 'cache' property.
+    Attributes:
+        storage_conn_str (str): storage account connection string of the cache
+        enable_reprocessing (bool): re-run skills invalidated by definition changes on the next run
+    Returns:
+        cache (dict): cache definition, None if no connection string is set
+    """
+    if not storage_conn_str:
+        return None
+    return {"storageConnectionString": storage_conn_str, "enableReprocessing": enable_reprocessing}
+
+
+def _skill_inputs(inputs):
+    """ Source paths of skill inputs (nested inputs included). """
+    sources = []
+    for i in inputs or []:
+        if i.get("source"):
+            sources.append(i["source"])
+        sources.extend(_skill_inputs(i.get("inputs")))
+    return sources
+
+
+def _skill_outputs(skill):
+    """ Enrichment tree paths written by the skill, e.g. /document/pages. """
+    context = (skill.get("context") or '/document').rstrip('/')
+    return [f'{context}/{o.get("targetName") or o["name"]}' for o in skill.get("outputs") or []]
+
+
+def _reads(skill, path):
+    """ If the skill reads the path (as input or context). """
+    path = path.rstrip('/')
+    reads = _skill_inputs(skill.get("inputs")) + [skill.get("context") or '/document']
+    return any(r == path or r.startswith(path + '/') for r in reads)
+
+
+def _comparable_skill(skill):
+    skill = {k: v for k, v in skill.items() if k not in SKILL_IGNORED_KEYS}
+    return ais_reconcile.normalize_definition(skill)
+
+
+def invalidation_report(old_skillset, new_skillset, old_indexer=None, new_indexer=None):
+    """ Skills which will be re-run after the definition change (changed skills and everything downstream).
+    Attributes:
+        old_skillset (dict): deployed (live) skillset definition, None if there is none
+        new_skillset (dict): new skillset definition
+        old_indexer (dict): deployed indexer definition, not compared if not provided
+        new_indexer (dict): new indexer definition, not compared if not provided
+    Returns:
+        report (dict): changed / added / removed skills, invalidated skills in pipeline order,
+                       projections_changed and full_reprocess flags
+    """
+    old_skills = {s["name"]: s for s in (old_skillset or {}).get("skills") or []}
+    new_skills = new_skillset.get("skills") or []
+
+    report = {"changed": [], "added": [], "removed": [n for n in old_skills
+                                                      if n not in {s["name"] for s in new_skills}],
+              "invalidated": [], "projections_changed": False, "full_reprocess": False, "reasons": []}
+
+    if old_skillset is None:
+        report["full_reprocess"] = True
+        report["reasons"].append('skillset is not deployed')
+    if old_indexer is not None and new_indexer is not None:
+        for key in INDEXER_CRACKING_KEYS:
+            if ais_reconcile.definition_diff(ais_reconcile.normalize_definition(new_indexer.get(key)),
+                                             ais_reconcile.normalize_definition(old_indexer.get(key))):
+                report["full_reprocess"] = True
+                report["reasons"].append(f'indexer {key} changed')
+
+    # changed skills invalidate skills reading their outputs, transitively (skills are in pipeline order)
+    invalidated_paths = []
+    for skill in new_skills:
+        name = skill["name"]
+        old = old_skills.get(name)
+        if old is None:
+            report["added"].append(name)
+            dirty = True
+        else:
+            dirty = _comparable_skill(old) != _comparable_skill(skill)
+            if dirty:
+                report["changed"].append(name)
+
+        upstream = [p for p in invalidated_paths if _reads(skill, p)]
+        if dirty or upstream or report["full_reprocess"]:
+            report["invalidated"].append(name)
+            invalidated_paths.extend(_skill_outputs(skill))
+            if upstream and not dirty:
+                report["reasons"].append(f"'{name}' reads invalidated {upstream}")
+
+    # projections / output field mappings only re-write the index, skills are not re-run
+    for key in ('indexProjections', 'knowledgeStore'):
+        if old_skillset is not None and ais_reconcile.normalize_definition(old_skillset.get(key)) != \
+                ais_reconcile.normalize_definition(new_skillset.get(key)):
+            report["projections_changed"] = True
+            report["reasons"].append(f'skillset {key} changed')
+
+    return report
+
+
+def format_report(report):
+    """ One line summary of the invalidation report. """
+    if report["full_reprocess"]:
+        return f'all skills are re-run ({", ".join(report["reasons"])}).'
+    if not report["invalidated"]:
+        suffix = ' projections are re-written.' if report["projections_changed"] else ''
+        return 'no skills are invalidated, cached enrichments are reused.' + suffix
+    return (f'{len(report["invalidated"])} skills are re-run: {report["invalidated"]} '
+            f'(changed {report["changed"]}, added {report["added"]}, removed {report["removed"]}).')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Report skills invalidated by a skillset change.')
+    parser.add_argument('--old-skillset', required=True, help='deployed skillset json file')
+    parser.add_argument('--new-skillset', required=True, help='new skillset json file')
+    parser.add_argument('--old-indexer', default='', help='deployed indexer json file')
+    parser.add_argument('--new-indexer', default='', help='new indexer json file')
+    args = parser.parse_args()
+
+    def _read(path):
+        if not path:
+            return None
+        with open(path, 'r') as f:
+            return json.loads(f.read())
+
+    report = invalidation_report(_read(args.old_skillset), _read(args.new_skillset),
+                                 _read(args.old_indexer), _read(args.new_indexer))
+    log.info(f'ENRICHMENT: {format_report(report)}')
+    print(json.dumps(report, indent=4))
@@ -1,15 +1,50 @@
 import datetime
-import requests
 import json
 
+import ai_search_client as ais_client
+import ai_search_template as ais_template
+import ai_search_telemetry as ais_telemetry
+import ai_search_vector_profiles as ais_vector_profiles
+
 import logging as log
 log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
 
 
+# declared binding paths of the index template parameters (see ai_search_template.py)
+AOAI_VECTORIZER = {"kind": "azureOpenAI"}
+INDEX_BINDINGS = [
+    (("name",), "index_name"),
+]
+VECTORIZER_BINDINGS = [
+    (("vectorSearch", "vectorizers", AOAI_VECTORIZER, "name"), "vectorizer_name"),
+    (("vectorSearch", "vectorizers", AOAI_VECTORIZER, "azureOpenAIParameters", "resourceUri"), "openai_resource"),
+    (("vectorSearch", "vectorizers", AOAI_VECTORIZER, "azureOpenAIParameters", "deploymentId"), "openai_deploymentid"),
+    (("vectorSearch", "vectorizers", AOAI_VECTORIZER, "azureOpenAIParameters", "apiKey"), "openai_apikey"),
+    (("vectorSearch", "vectorizers", AOAI_VECTORIZER, "azureOpenAIParameters", "modelName"), "openai_modelname"),
+]
+
+
+def _relink_vector_profiles(data, template_vectorizers, vectorizer_name, profile_name):
+    """ Profiles using the renamed vectorizers are renamed, vector fields follow their profile. """
+    renamed = {}
+    for profile in data["vectorSearch"].get("profiles", []):
+        if profile.get("vectorizer") in template_vectorizers:
+            new_name = profile_name if not renamed else f'{profile_name}-{len(renamed)}'
+            renamed[profile["name"]] = new_name
+            profile["name"] = new_name
+            profile["vectorizer"] = vectorizer_name
+
+    # check vector fields have correct vector profile
+    for field in data["fields"]:
+        if field.get("vectorSearchProfile") in renamed:
+            field["vectorSearchProfile"] = renamed[field["vectorSearchProfile"]]
+
+
 def _prep_update_definition_json(index_name, index_schema_path, vectorize_flag,
                                  openai_resource=None, openai_apikey=None, 
-                                 openai_deploymentid=None, openai_modelname=None):
+                                 openai_deploymentid=None, openai_modelname=None, vector_profile=None, hnsw=None):
     """ Update the base index definition file. 
+    Template is parsed once and cached, parameters are set through declared binding paths.
     Attributes:
         ndex_name
         index_schema_path
@@ -18,50 +53,46 @@ def _prep_update_definition_json(index_name, index_schema_path, vectorize_flag,
         openai_apikey (str): Azure OpenAI API key
         openai_deploymentid (str): Azure OpenAI deployment ID
         openai_modelname (str): Azure OpenAI model name
+        vector_profile (str): vector storage profile (see ai_search_vector_profiles.VECTOR_PROFILES), template as is if None
+        hnsw (dict): HNSW parameters (m, efConstruction, efSearch, metric), template as is if None
     Returns:
         data (dict): index definition json
         success (bool): indicates if index definition was created ok
     """
 
-    success = True
+    success = False
     data = {}
 
     try:
-        with open(index_schema_path, 'r') as f:
-            data = json.loads(f.read())
+        params = {"index_name": index_name}
+        bindings = list(INDEX_BINDINGS)
 
-        data["name"] = index_name
-        
-        if vectorize_flag and ("vectorSearch" in data.keys()):
+        template = ais_template.load_template(index_schema_path)
+        vector_index = vectorize_flag and ("vectorSearch" in template.keys())
+        if vector_index:
             # vector index is created
-
-            # update vectorizer name
-            vectorizer_name = f'vectorizer-AOAI-text-{index_name}'
-            data["vectorSearch"]["vectorizers"][0]["name"] = vectorizer_name
-
-            # update vectorizer
-            if openai_resource is not None and openai_apikey is not None and openai_deploymentid is not None and openai_modelname is not None:
-                data["vectorSearch"]["vectorizers"][0]["azureOpenAIParameters"]["resourceUri"] = openai_resource
-                data["vectorSearch"]["vectorizers"][0]["azureOpenAIParameters"]["deploymentId"] = openai_deploymentid
-                data["vectorSearch"]["vectorizers"][0]["azureOpenAIParameters"]["apiKey"] = openai_apikey
-                data["vectorSearch"]["vectorizers"][0]["azureOpenAIParameters"]["modelName"] = openai_modelname
-            else:
+            if openai_resource is None or openai_apikey is None or openai_deploymentid is None or openai_modelname is None:
                 log.error('Azure OpenAI resource details are not provided.')
                 return  False, {}
-            
-            # update profiles 
-            data["vectorSearch"]["profiles"][0]["vectorizer"] = vectorizer_name
-            profile_name = f'profile-AOAI-text-{index_name}'
-            data["vectorSearch"]["profiles"][0]["name"] = profile_name
-
-            # check vector fields have correct vector profile
-            for field in data["fields"]:
-                if field["vectorSearchProfile"] is not None:
-                    field["vectorSearchProfile"] = profile_name
 
-            # add vectoriser details
-            # print('vector index')
-            # print(f'\n\n{data["vectorSearch"]}\n\n')
+            params.update({"vectorizer_name": f'vectorizer-AOAI-text-{index_name}',
+                           "openai_resource": openai_resource,
+                           "openai_deploymentid": openai_deploymentid,
+                           "openai_apikey": openai_apikey,
+                           "openai_modelname": openai_modelname})
+            bindings.extend(VECTORIZER_BINDINGS)
+
+        data = ais_template.render_template(index_schema_path, bindings, params)
+
+        if vector_index:
+            # update profiles
+            template_vectorizers = ais_template.select(template, VECTORIZER_BINDINGS[0][0])
+            _relink_vector_profiles(data, template_vectorizers, params["vectorizer_name"],
+                                    f'profile-AOAI-text-{index_name}')
+            if vector_profile:
+                ais_vector_profiles.apply_vector_profile(data, vector_profile)
+            if hnsw:
+                ais_vector_profiles.apply_hnsw_parameters(data, hnsw)
 
         # save locally index definition file - if needed
         # with open('./data/vector-index/ai_search_index_schema_OUT.json', 'w') as f:
@@ -75,15 +106,19 @@ def _prep_update_definition_json(index_name, index_schema_path, vectorize_flag,
     return success, data
 
 
+@ais_telemetry.traced('create_index', component='search_index_name')
 def create_index(ai_search_resource, ai_search_apikey, search_api_version, index_schema_path,
                  search_index_name,
                  vectorize_flag,
                  openai_resource=None, openai_apikey=None, 
-                 openai_deploymentid=None, openai_modelname=None):
+                 openai_deploymentid=None, openai_modelname=None, client=None, vector_profile=None,
+                 hnsw=None):
     """ Create index based on the updated definition.
     https://learn.microsoft.com/en-us/rest/api/searchservice/create-index 
     https://learn.microsoft.com/en-us/rest/api/searchservice/indexes/create?view=rest-searchservice-2024-07-01&tabs=HTTP
-
+    Shared pooled client for the service is used if client is not provided.
+    Vector storage profile (compression, vector type, stored) is applied if vector_profile is provided,
+    HNSW parameters of the template are overridden by hnsw if provided.
     """
     success = False
     elem = 'INDEX'
@@ -93,7 +128,7 @@ def create_index(ai_search_resource, ai_search_apikey, search_api_version, index
     success_flag, data = _prep_update_definition_json(search_index_name, index_schema_path,
                                                       vectorize_flag,
                                                       openai_resource, openai_apikey, 
-                                                      openai_deploymentid, openai_modelname)
+                                                      openai_deploymentid, openai_modelname, vector_profile, hnsw)
     if not success_flag:
          log.error('AI Search index schema is not updated successfully. Index will not be created.')
          return False
@@ -102,14 +137,10 @@ def create_index(ai_search_resource, ai_search_apikey, search_api_version, index
     # Content-Type: application/json
     # api-key: [admin key]
     try: 
-        headers = {
-                "Content-Type": "application/json",
-                "api-key": ai_search_apikey
-            }
-
-        url = f"{ai_search_resource}/indexes?api-version={search_api_version}"
+        if client is None:
+            client = ais_client.get_client(ai_search_resource, ai_search_apikey, search_api_version)
 
-        rr = requests.post(url=url, headers=headers, data=json.dumps(data))
+        rr = client.post('indexes', data=json.dumps(data))
 
         if rr.status_code in [200, 201]:
                 log.info(f"[{rr.status_code}]: '{search_index_name}' index created OK.")
@@ -127,20 +158,17 @@ def create_index(ai_search_resource, ai_search_apikey, search_api_version, index
     return success
 
 
-def check_index_exists(ai_search_resource, ai_search_apikey, search_api_version, search_index_name):
+def check_index_exists(ai_search_resource, ai_search_apikey, search_api_version, search_index_name,
+                       client=None):
     """Check if the index exists"""
     #GET https://myservice.search.windows.net/indexes('hotels')?api-version=2024-07-01
 
     log.info(f"CHECK INDEX exists {search_index_name}.")
 
-    headers = {
-            #"Content-Type": "application/json",
-            "api-key": ai_search_apikey
-        }
-    url = f"{ai_search_resource}/indexes('{search_index_name}')?api-version={search_api_version}"
-    #print(url)
+    if client is None:
+        client = ais_client.get_client(ai_search_resource, ai_search_apikey, search_api_version)
 
-    rr = requests.get(url=url, headers=headers)
+    rr = client.get(f"indexes('{search_index_name}')")
     if rr.status_code in [404]:
         #index doesn't exist
         #log.info(f"Index doesn't exist - {self.search_index_name}")
@@ -1,19 +1,44 @@
-import requests
 import json
 
+import ai_search_client as ais_client
+import ai_search_template as ais_template
+import ai_search_telemetry as ais_telemetry
+
 import logging as log
 log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
 
+
+# declared binding paths of the indexer template parameters (see ai_search_template.py)
+INDEXER_BINDINGS = [
+    (("name",), "indexer_name"),
+    (("dataSourceName",), "data_source_name"),
+    (("targetIndexName",), "target_index_name"),
+]
+SKILLSET_BINDINGS = [
+    (("skillsetName",), "skillset_name"),
+]
+
+# indexer 'cache' (incremental enrichment) is available in preview API versions only
+CACHE_API_VERSION = '2024-05-01-preview'
+
+
+def api_params(data):
+    """ Query parameters of calls with the indexer definition: preview api-version if enrichment cache is set. """
+    return {"api-version": CACHE_API_VERSION} if data and data.get("cache") else None
+
+
 def _prep_indexer_def_json(indexer_name, indexer_def_path,
                    data_source_name, target_index_name, 
-                   skillset_name):
+                   skillset_name, cache=None):
     """ Update the base indexer json definition file
+    Template is parsed once and cached, parameters are set through declared binding paths.
     Attributes:
         indexer_name (str): indexer name 
         indexer_def_path (str): path to base indexer definition json file
         data_source_name (str): data source name 
         target_index_name (str): target index name
-        skillset_name (str): skillset name
+        skillset_name (str): skillset name, no skillset is set if empty
+        cache (dict): enrichment cache of the indexer (see ai_search_enrichment.enrichment_cache), not set if None
     Returns:
         data (dict): final indexer definition
     """
@@ -21,15 +46,14 @@ def _prep_indexer_def_json(indexer_name, indexer_def_path,
     data = {}
 
     try:
-        with open(indexer_def_path, 'r') as f:
-            data = json.loads(f.read())
-
-        data["name"] = indexer_name
-        data["dataSourceName"] = data_source_name
-        data["targetIndexName"] = target_index_name
-        data["skillsetName"] = skillset_name
-
-        #print(data)
+        bindings = INDEXER_BINDINGS + (SKILLSET_BINDINGS if skillset_name else [])
+        data = ais_template.render_template(indexer_def_path, bindings,
+                                            {"indexer_name": indexer_name,
+                                             "data_source_name": data_source_name,
+                                             "target_index_name": target_index_name,
+                                             "skillset_name": skillset_name})
+        if cache:
+            data["cache"] = dict(cache)
         success = True
     except Exception as e:
         log.error('Error while INDEXER definition update.')
@@ -38,11 +62,14 @@ def _prep_indexer_def_json(indexer_name, indexer_def_path,
     return success, data
 
 
+@ais_telemetry.traced('create_indexer', component='indexer_name')
 def create_indexer(ai_search_resource, ai_search_apikey, search_api_version,
                    indexer_name, indexer_def_path,
-                   data_source_name, target_index_name, skillset_name):
+                   data_source_name, target_index_name, skillset_name, client=None, cache=None):
     """ Create Indexer based on the definition. This requires data source, skill set and target index.
     https://learn.microsoft.com/en-us/rest/api/searchservice/create-indexer
+    Shared pooled client for the service is used if client is not provided.
+    Incremental enrichment is enabled if cache is provided (see ai_search_enrichment.enrichment_cache).
     """
 
     success = False
@@ -52,7 +79,7 @@ def create_indexer(ai_search_resource, ai_search_apikey, search_api_version,
     # load indexer json and replace temp name with new
     success_flag, data = _prep_indexer_def_json(indexer_name, indexer_def_path,
                                             data_source_name, target_index_name, 
-                                            skillset_name)
+                                            skillset_name, cache)
 
     if not success_flag:
         log.error(f'AI Search {elem} schema is not updated successfully. {elem} will not be created.')
@@ -62,15 +89,11 @@ def create_indexer(ai_search_resource, ai_search_apikey, search_api_version,
     # Content-Type: application/json  
     # api-key: [admin key]
     try:
-        headers = {
-                "Content-Type": "application/json",
-                "api-key": ai_search_apikey
-            }
+        if client is None:
+            client = ais_client.get_client(ai_search_resource, ai_search_apikey, search_api_version)
 
-        url = f"{ai_search_resource}/indexers?api-version={search_api_version}"
-        
         # create indexer request
-        rr = requests.post(url=url, headers=headers, data=json.dumps(data))
+        rr = client.post('indexers', data=json.dumps(data), params=api_params(data))
 
         if rr.status_code in [200, 201]:
             log.info(f"[{rr.status_code}]: '{indexer_name}' indexer created OK")
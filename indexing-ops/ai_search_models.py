@@ -0,0 +1,324 @@
+"""
+Typed, compact models of the index, data source, skillset and indexer definitions and offline validation.
+Models keep only the parts needed for cross-object checks (names, fields, mappings, projections, dimensions),
+so a release is validated in milliseconds before any component is created - no half-built stacks because of
+a wrong field name or mismatched embedding dimensions.
+
+Usage:
+python ai_search_models.py --index-schema ./data/vector-index/ai_search_index_schema.json --indexer-def ./data/vector-index/ai_search_indexer_vector_def_v2.json --skillset-def ./data/vector-index/ai_search_skillset_vector_def_v2.json
+"""
+import argparse
+import time
+from dataclasses import dataclass
+
+import ai_search_index as ais_index
+import ai_search_indexer as ais_indexer
+import ai_search_skillset as ais_skillset
+import ai_search_telemetry as ais_telemetry
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+EMBEDDING_SKILL_TYPE = '#Microsoft.Skills.Text.AzureOpenAIEmbeddingSkill'
+VECTOR_TYPES = {'Collection(Edm.Single)', 'Collection(Edm.Half)'}
+
+
+@dataclass(slots=True, frozen=True)
+class FieldModel:
+    name: str
+    type: str
+    key: bool = False
+    dimensions: int | None = None
+    vector_search_profile: str | None = None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data.get("type", ''), bool(data.get("key")),
+                   data.get("dimensions"), data.get("vectorSearchProfile"))
+
+    @property
+    def is_vector(self):
+        return self.type in VECTOR_TYPES
+
+
+@dataclass(slots=True, frozen=True)
+class VectorProfileModel:
+    name: str
+    algorithm: str | None
+    vectorizer: str | None
+    compression: str | None
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data["name"], data.get("algorithm"), data.get("vectorizer"), data.get("compression"))
+
+
+@dataclass(slots=True, frozen=True)
+class IndexModel:
+    name: str
+    fields: tuple
+    profiles: tuple = ()
+    algorithms: frozenset = frozenset()
+    vectorizers: frozenset = frozenset()
+    compressions: frozenset = frozenset()
+    semantic_fields: tuple = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        vector_search = data.get("vectorSearch") or {}
+        semantic_fields = []
+        for config in (data.get("semantic") or {}).get("configurations") or []:
+            prioritized = config.get("prioritizedFields") or {}
+            if prioritized.get("titleField"):
+                semantic_fields.append(prioritized["titleField"]["fieldName"])
+            for key in ('prioritizedContentFields', 'prioritizedKeywordsFields'):
+                semantic_fields.extend(f["fieldName"] for f in prioritized.get(key) or [])
+
+        return cls(name=data.get("name", ''),
+                   fields=tuple(FieldModel.from_dict(f) for f in data.get("fields", [])),
+                   profiles=tuple(VectorProfileModel.from_dict(p) for p in vector_search.get("profiles") or []),
+                   algorithms=frozenset(a["name"] for a in vector_search.get("algorithms") or []),
+                   vectorizers=frozenset(v["name"] for v in vector_search.get("vectorizers") or []),
+                   compressions=frozenset(c["name"] for c in vector_search.get("compressions") or []),
+                   semantic_fields=tuple(semantic_fields))
+
+    def field(self, name):
+        return next((f for f in self.fields if f.name == name), None)
+
+    def validate(self):
+        """ Issues of the index definition itself. """
+        issues = []
+        keys = [f.name for f in self.fields if f.key]
+        if len(keys) != 1:
+            issues.append(f"index '{self.name}': exactly one key field expected, found {keys}")
+        elif self.field(keys[0]).type != 'Edm.String':
+            issues.append(f"index '{self.name}': key field '{keys[0]}' must be Edm.String")
+
+        profiles = {p.name: p for p in self.profiles}
+        for f in self.fields:
+            if not f.is_vector:
+                continue
+            if not f.dimensions:
+                issues.append(f"index '{self.name}': vector field '{f.name}' has no dimensions")
+            if not f.vector_search_profile:
+                issues.append(f"index '{self.name}': vector field '{f.name}' has no vectorSearchProfile")
+            elif f.vector_search_profile not in profiles:
+                issues.append(f"index '{self.name}': vector field '{f.name}' refers to unknown profile "
+                              f"'{f.vector_search_profile}'")
+
+        for p in self.profiles:
+            if p.algorithm not in self.algorithms:
+                issues.append(f"index '{self.name}': profile '{p.name}' refers to unknown algorithm '{p.algorithm}'")
+            if p.vectorizer and p.vectorizer not in self.vectorizers:
+                issues.append(f"index '{self.name}': profile '{p.name}' refers to unknown vectorizer '{p.vectorizer}'")
+            if p.compression and p.compression not in self.compressions:
+                issues.append(f"index '{self.name}': profile '{p.name}' refers to unknown compression '{p.compression}'")
+
+        for name in self.semantic_fields:
+            if self.field(name) is None:
+                issues.append(f"index '{self.name}': semantic configuration refers to unknown field '{name}'")
+        return issues
+
+
+@dataclass(slots=True, frozen=True)
+class DataSourceModel:
+    name: str
+    type: str
+    container: str
+    has_credentials: bool
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("name", ''), data.get("type", ''), (data.get("container") or {}).get("name") or '',
+                   bool((data.get("credentials") or {}).get("connectionString")))
+
+    def validate(self):
+        issues = []
+        if not self.container:
+            issues.append(f"data source '{self.name}': container is not set")
+        if not self.has_credentials:
+            issues.append(f"data source '{self.name}': connection string is not set")
+        return issues
+
+
+@dataclass(slots=True, frozen=True)
+class SkillModel:
+    odata_type: str
+    name: str
+    context: str
+    outputs: tuple
+    dimensions: int | None = None
+
+    @classmethod
+    def from_dict(cls, data):
+        context = (data.get("context") or '/document').rstrip('/')
+        outputs = tuple(f'{context}/{o.get("targetName") or o["name"]}' for o in data.get("outputs") or [])
+        return cls(data.get("@odata.type", ''), data.get("name", ''), context, outputs, data.get("dimensions"))
+
+
+@dataclass(slots=True, frozen=True)
+class SelectorModel:
+    target_index_name: str
+    parent_key_field_name: str
+    source_context: str
+    mappings: tuple
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("targetIndexName", ''), data.get("parentKeyFieldName", ''),
+                   data.get("sourceContext", ''),
+                   tuple((m["name"], m.get("source")) for m in data.get("mappings") or []))
+
+
+@dataclass(slots=True, frozen=True)
+class SkillsetModel:
+    name: str
+    skills: tuple
+    selectors: tuple = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get("name", ''),
+                   tuple(SkillModel.from_dict(s) for s in data.get("skills") or []),
+                   tuple(SelectorModel.from_dict(s)
+                         for s in (data.get("indexProjections") or {}).get("selectors") or []))
+
+    def output_dimensions(self, path):
+        """ Dimensions of the embedding skill writing the path, None if not written by an embedding skill. """
+        for skill in self.skills:
+            if skill.odata_type == EMBEDDING_SKILL_TYPE and path in skill.outputs:
+                return skill.dimensions
+        return None
+
+    def validate(self):
+        issues = []
+        names = [s.name for s in self.skills]
+        if len(set(names)) != len(names):
+            issues.append(f"skillset '{self.name}': skill names are not unique {names}")
+        return issues
+
+
+@dataclass(slots=True, frozen=True)
+class IndexerModel:
+    name: str
+    data_source_name: str
+    target_index_name: str
+    skillset_name: str | None
+    field_mappings: tuple = ()
+    output_field_mappings: tuple = ()
+
+    @classmethod
+    def from_dict(cls, data):
+        def _mappings(key):
+            return tuple((m.get("sourceFieldName"), m.get("targetFieldName") or m.get("sourceFieldName"))
+                         for m in data.get(key) or [])
+        return cls(data.get("name", ''), data.get("dataSourceName", ''), data.get("targetIndexName", ''),
+                   data.get("skillsetName"), _mappings("fieldMappings"), _mappings("outputFieldMappings"))
+
+
+def _path_written(skillset, source):
+    """ If the mapping source is written by a skill (or is a document field). """
+    source = source.rstrip('/')
+    if any(source == o or source.startswith(o + '/') for s in skillset.skills for o in s.outputs):
+        return True
+    # /document/<field> without a skill writing it - document field (content, metadata, ...)
+    return source.count('/') == 2 and source.startswith('/document/')
+
+
+def validate_release(index, data_source=None, skillset=None, indexer=None):
+    """ Validate definitions of the release and their cross-object consistency, no network calls.
+    Attributes:
+        index (IndexModel): index model
+        data_source (DataSourceModel): data source model, not checked if None
+        skillset (SkillsetModel): skillset model, not checked if None
+        indexer (IndexerModel): indexer model, not checked if None
+    Returns:
+        issues (list): issue descriptions, empty if the release is consistent
+    """
+    issues = index.validate()
+    if data_source is not None:
+        issues.extend(data_source.validate())
+
+    if skillset is not None:
+        issues.extend(skillset.validate())
+        for selector in skillset.selectors:
+            if selector.target_index_name != index.name:
+                issues.append(f"skillset '{skillset.name}': projection targets index '{selector.target_index_name}', "
+                              f"release index is '{index.name}'")
+            if index.field(selector.parent_key_field_name) is None:
+                issues.append(f"skillset '{skillset.name}': parent key field '{selector.parent_key_field_name}' "
+                              f"is not in index '{index.name}'")
+            for name, source in selector.mappings:
+                field = index.field(name)
+                if field is None:
+                    issues.append(f"skillset '{skillset.name}': projection maps to unknown field '{name}'")
+                    continue
+                if source and not _path_written(skillset, source):
+                    issues.append(f"skillset '{skillset.name}': projection source '{source}' is not written by any skill")
+                dimensions = skillset.output_dimensions(source.rstrip('/')) if source else None
+                if field.is_vector and dimensions and field.dimensions and dimensions != field.dimensions:
+                    issues.append(f"skillset '{skillset.name}': embedding dimensions {dimensions} do not match "
+                                  f"field '{name}' dimensions {field.dimensions}")
+
+    if indexer is not None:
+        if indexer.target_index_name != index.name:
+            issues.append(f"indexer '{indexer.name}': targets index '{indexer.target_index_name}', "
+                          f"release index is '{index.name}'")
+        if data_source is not None and indexer.data_source_name != data_source.name:
+            issues.append(f"indexer '{indexer.name}': uses data source '{indexer.data_source_name}', "
+                          f"release data source is '{data_source.name}'")
+        if skillset is not None and indexer.skillset_name != skillset.name:
+            issues.append(f"indexer '{indexer.name}': uses skillset '{indexer.skillset_name}', "
+                          f"release skillset is '{skillset.name}'")
+        if skillset is None and indexer.skillset_name:
+            issues.append(f"indexer '{indexer.name}': uses skillset '{indexer.skillset_name}', release has no skillset")
+        for source, target in indexer.field_mappings + indexer.output_field_mappings:
+            if index.field(target) is None:
+                issues.append(f"indexer '{indexer.name}': field mapping '{source}' targets unknown field '{target}'")
+
+    return issues
+
+
+def validate_definitions(index_data, data_source_data=None, skillset_data=None, indexer_data=None):
+    """ Build models of the definition jsons and validate the release.
+    Returns:
+        issues (list): issue descriptions, empty if the release is consistent
+    """
+    start = time.perf_counter()
+    with ais_telemetry.span('validate_definitions') as span:
+        issues = validate_release(IndexModel.from_dict(index_data),
+                                  DataSourceModel.from_dict(data_source_data) if data_source_data else None,
+                                  SkillsetModel.from_dict(skillset_data) if skillset_data else None,
+                                  IndexerModel.from_dict(indexer_data) if indexer_data else None)
+        span["attributes"]["issues"] = len(issues)
+        if issues:
+            span["status"] = ais_telemetry.ERROR
+    log.info(f'VALIDATE: {len(issues)} issues in {(time.perf_counter() - start) * 1000:.2f} ms.')
+    for issue in issues:
+        log.error(f'VALIDATE: {issue}')
+    return issues
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Validate definition templates of a release offline.')
+    parser.add_argument('--index-schema', required=True)
+    parser.add_argument('--indexer-def', required=True)
+    parser.add_argument('--skillset-def', default='', help='skillset definition, no skillset if empty')
+    args = parser.parse_args()
+
+    # templates are rendered with placeholder names and AOAI details, as AISearchOps does
+    aoai = ['https://validate.openai.azure.com', 'validate', 'validate', 'validate']
+    _, index_data = ais_index._prep_update_definition_json('validate-index', args.index_schema,
+                                                           bool(args.skillset_def), *aoai)
+    skillset_data = None
+    if args.skillset_def:
+        _, skillset_data = ais_skillset._prep_update_definition_json('validate-skillset', args.skillset_def,
+                                                                     *aoai, 'validate-index')
+    _, indexer_data = ais_indexer._prep_indexer_def_json('validate-indexer', args.indexer_def,
+                                                         'validate-data-source', 'validate-index',
+                                                         'validate-skillset' if args.skillset_def else None)
+
+    issues = validate_definitions(index_data, None, skillset_data, indexer_data)
+    print('\n'.join(issues) if issues else 'OK')
+    exit(1 if issues else 0)
@@ -0,0 +1,252 @@
+"""
+Indexer run monitor.
+Polls indexer status with adaptive interval (short while items are flowing, backs off while nothing changes),
+streams progress events (items processed/failed, items per second, ETA) and ends with execution summary.
+https://learn.microsoft.com/en-us/rest/api/searchservice/indexers/get-status
+
+Usage:
+python ai_search_monitor.py --indexer indexer-adlgen2-release01 --config ../config.json --expected-items 10000
+python ai_search_monitor.py --indexer indexer-adlgen2-release01-00 --indexer indexer-adlgen2-release01-01 --config ../config.json
+"""
+import argparse
+import concurrent.futures
+import datetime
+import json
+import threading
+import time
+
+import ai_search_client as ais_client
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+IN_PROGRESS = 'inProgress'
+
+
+def _parse_time(value):
+    """ Service timestamp (e.g. 2024-10-03T10:00:00.1234567Z) to aware datetime, None if not set. """
+    if not value:
+        return None
+    value = value.replace('Z', '+00:00')
+    if '.' in value:
+        # python accepts at most 6 fraction digits
+        head, tail = value.split('.', 1)
+        digits = tail[:len(tail) - len(tail.lstrip('0123456789'))]
+        value = f'{head}.{digits[:6].ljust(6, "0")}{tail[len(digits):]}'
+    parsed = datetime.datetime.fromisoformat(value)
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=datetime.timezone.utc)
+
+
+def get_indexer_status(client, indexer_name):
+    """ Indexer status.
+    GET https://[service name].search.windows.net/indexers/[indexer name]/status?api-version=[api-version]
+    Returns:
+        status (dict): indexer status json
+    """
+    rr = client.get(f'indexers/{indexer_name}/status')
+    if rr.status_code != 200:
+        raise RuntimeError(f"[{rr.status_code}]: '{indexer_name}' indexer status is NOT retrieved. {rr.text}")
+    return rr.json()
+
+
+def progress_event(indexer_name, status, expected_items=None, now=None):
+    """ Progress event of the current (last) indexer run.
+    Attributes:
+        indexer_name (str): indexer name
+        status (dict): indexer status json
+        expected_items (int): number of items expected in the run, used for ETA
+        now (datetime): current time
+    Returns:
+        event (dict): status, items processed/failed, elapsed time, items per second and ETA
+    """
+    now = now or datetime.datetime.now(datetime.timezone.utc)
+    last = status.get("lastResult") or {}
+
+    processed = last.get("itemsProcessed") or 0
+    failed = last.get("itemsFailed") or 0
+    start = _parse_time(last.get("startTime"))
+    end = _parse_time(last.get("endTime"))
+
+    elapsed = ((end or now) - start).total_seconds() if start else 0.0
+    items_per_s = processed / elapsed if elapsed > 0 else 0.0
+
+    eta = None
+    if expected_items and items_per_s > 0 and last.get("status") == IN_PROGRESS:
+        eta = max(0.0, (expected_items - processed - failed) / items_per_s)
+
+    return {"indexer": indexer_name,
+            "indexer_status": status.get("status"),
+            "status": last.get("status"),
+            "items_processed": processed,
+            "items_failed": failed,
+            "elapsed_s": elapsed,
+            "items_per_s": items_per_s,
+            "eta_s": eta,
+            "errors": len(last.get("errors") or []),
+            "warnings": len(last.get("warnings") or []),
+            "error_message": last.get("errorMessage")}
+
+
+class IndexerMonitor:
+    def __init__(self, client, indexer_name, expected_items=None,
+                 min_interval=2.0, max_interval=60.0, backoff=2.0, timeout=None):
+        """
+        Monitor of one indexer run.
+
+        Args:
+            client (AISearchClient): pooled REST client
+            indexer_name (str): indexer name
+            expected_items (int): number of items expected in the run, used for ETA
+            min_interval (float): shortest poll interval in seconds
+            max_interval (float): longest poll interval in seconds
+            backoff (float): interval multiplier while there is no progress
+            timeout (float): stop monitoring after this number of seconds, no limit if None
+        """
+        self.client = client
+        self.indexer_name = indexer_name
+        self.expected_items = expected_items
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.timeout = timeout
+        self.polls = 0
+
+    def _next_interval(self, interval, progressed):
+        """ Poll sooner while items are flowing, back off while nothing changes. """
+        if progressed:
+            return max(self.min_interval, interval / self.backoff)
+        return min(self.max_interval, interval * self.backoff)
+
+    def events(self):
+        """ Progress events until the indexer run is finished (or timeout).
+        Yields:
+            event (dict): progress event, see progress_event
+        """
+        start = time.monotonic()
+        interval = self.min_interval
+        last_processed = None
+
+        while True:
+            status = get_indexer_status(self.client, self.indexer_name)
+            self.polls += 1
+
+            event = progress_event(self.indexer_name, status, self.expected_items)
+            event["poll_interval_s"] = interval
+            yield event
+
+            # run is registered and not in progress any more, or indexer is in error state
+            finished = (event["status"] is not None and event["status"] != IN_PROGRESS) or event["indexer_status"] == 'error'
+            if finished:
+                return
+            if self.timeout is not None and time.monotonic() - start >= self.timeout:
+                log.warning(f"MONITOR: '{self.indexer_name}' timeout after {self.timeout} s.")
+                return
+
+            processed = event["items_processed"] + event["items_failed"]
+            interval = self._next_interval(interval, last_processed is not None and processed != last_processed)
+            last_processed = processed
+            time.sleep(interval)
+
+    def run(self, callback=None):
+        """ Monitor the run until it is finished.
+        Attributes:
+            callback (function): called with every progress event, events are logged if not provided
+        Returns:
+            summary (dict): last progress event with final status and number of polls
+        """
+        log.info(f"MONITOR INDEXER '{self.indexer_name}' - start.")
+        event = None
+        for event in self.events():
+            if callback is not None:
+                callback(event)
+            else:
+                eta = f"{event['eta_s']:.0f} s" if event['eta_s'] is not None else 'n/a'
+                log.info(f"MONITOR: '{self.indexer_name}' {event['status']}: {event['items_processed']} processed, "
+                         f"{event['items_failed']} failed, {event['items_per_s']:.2f} items/s, ETA {eta}.")
+
+        summary = dict(event or {})
+        summary["polls"] = self.polls
+        summary["success"] = summary.get("status") == 'success'
+
+        log.info(f"MONITOR INDEXER '{self.indexer_name}' - end. Summary: {summary}")
+        return summary
+
+
+def monitor_indexers(client, indexer_names, expected_items=None, callback=None, **kwargs):
+    """ Monitor runs of several indexers (e.g. shards of one index) together, until all are finished.
+    Attributes:
+        client (AISearchClient): pooled REST client
+        indexer_names (list): indexer names
+        expected_items (int): number of items expected per indexer, used for ETA
+        callback (function): called with every progress event of any indexer and the combined progress
+        kwargs: poll settings of IndexerMonitor (min_interval, max_interval, backoff, timeout)
+    Returns:
+        summary (dict): summary per indexer, total items processed / failed, combined items per second
+    """
+    log.info(f"MONITOR INDEXERS {indexer_names} - start.")
+    latest = {}
+    lock = threading.Lock()
+
+    def _combined():
+        return {"items_processed": sum(e["items_processed"] for e in latest.values()),
+                "items_failed": sum(e["items_failed"] for e in latest.values()),
+                "items_per_s": sum(e["items_per_s"] for e in latest.values()),
+                "running": sum(1 for e in latest.values() if e["status"] == IN_PROGRESS)}
+
+    def _on_event(event):
+        with lock:
+            latest[event["indexer"]] = event
+            combined = _combined()
+        if callback is not None:
+            callback(event, combined)
+        else:
+            log.info(f"MONITOR: '{event['indexer']}' {event['status']}: {event['items_processed']} processed. "
+                     f"Total {combined['items_processed']} processed, {combined['items_failed']} failed, "
+                     f"{combined['items_per_s']:.2f} items/s, {combined['running']} running.")
+
+    def _run(indexer_name):
+        return IndexerMonitor(client, indexer_name, expected_items=expected_items, **kwargs).run(callback=_on_event)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, len(indexer_names))) as executor:
+        summaries = dict(zip(indexer_names, executor.map(_run, indexer_names)))
+
+    elapsed = max((s.get("elapsed_s") or 0.0 for s in summaries.values()), default=0.0)
+    processed = sum(s.get("items_processed", 0) for s in summaries.values())
+    summary = {"indexers": summaries,
+               "items_processed": processed,
+               "items_failed": sum(s.get("items_failed", 0) for s in summaries.values()),
+               "elapsed_s": elapsed,
+               "items_per_s": processed / elapsed if elapsed > 0 else 0.0,
+               "success": all(s["success"] for s in summaries.values())}
+
+    log.info(f"MONITOR INDEXERS - end. {summary['items_processed']} processed, {summary['items_failed']} failed, "
+             f"{summary['items_per_s']:.2f} items/s, success: {summary['success']}.")
+    return summary
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Monitor AI Search indexer run.')
+    parser.add_argument('--indexer', required=True, action='append', help='indexer name, could be repeated')
+    parser.add_argument('--config', default='../config.json', help='config json file')
+    parser.add_argument('--expected-items', type=int, default=None, help='number of items expected (per indexer), used for ETA')
+    parser.add_argument('--min-interval', type=float, default=2.0, help='shortest poll interval in seconds')
+    parser.add_argument('--max-interval', type=float, default=60.0, help='longest poll interval in seconds')
+    parser.add_argument('--timeout', type=float, default=None, help='stop monitoring after seconds')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.loads(f.read())
+
+    client = ais_client.get_client(config["AISearchEndpoint"], config["AISearchAPIKey"], '2024-07-01')
+    if len(args.indexer) == 1:
+        monitor = IndexerMonitor(client, args.indexer[0], expected_items=args.expected_items,
+                                 min_interval=args.min_interval, max_interval=args.max_interval,
+                                 timeout=args.timeout)
+        summary = monitor.run(callback=lambda e: print(json.dumps(e)))
+    else:
+        summary = monitor_indexers(client, args.indexer, expected_items=args.expected_items,
+                                   callback=lambda e, combined: print(json.dumps(dict(e, combined=combined))),
+                                   min_interval=args.min_interval, max_interval=args.max_interval,
+                                   timeout=args.timeout)
+    print(json.dumps(summary, indent=4))
@@ -0,0 +1,261 @@
+"""
+Long running operations (asynchronous request-reply): provisioning is started in a background worker thread
+and an operation id is returned at once, the caller polls the operation status instead of holding the
+connection open. Status has per-component progress and timings, taken from the stage spans of the
+operation (see ai_search_telemetry): create_index, create_data_source, create_skillset, create_indexer ...
+Operation records could be written to a folder (shared by instances) to be readable from any instance.
+Operations are run by a background thread (submit) or accepted by one process and run by another one, e.g. a queue
+triggered worker (accept, run) - the folder is required then.
+https://learn.microsoft.com/en-us/azure/architecture/patterns/async-request-reply
+"""
+import concurrent.futures
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+import ai_search_state as ais_state
+import ai_search_telemetry as ais_telemetry
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+# operation status
+ACCEPTED = 'accepted'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+FINISHED = {SUCCEEDED, FAILED}
+
+# stage spans reported as progress of the operation
+PROGRESS_STAGES = {'validate_definitions', 'resolve_names', 'create_index', 'create_data_source',
+                   'create_skillset', 'create_indexer', 'reconcile_component'}
+
+
+class OperationTracker:
+    def __init__(self, max_workers=2, max_operations=100, store_dir=None):
+        """
+        Background operations with status and progress.
+
+        Args:
+            max_workers (int): operations running at the same time, others wait (status accepted)
+            max_operations (int): number of last operations kept in memory
+            store_dir (str): folder where operation records are written (json per operation), memory only if None
+        """
+        self.max_operations = max_operations
+        self.store_dir = store_dir
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix='ai-search-operation')
+        self._operations = OrderedDict()
+        # trace id -> record of running operations
+        self._traces = {}
+        self._lock = threading.Lock()
+        if store_dir:
+            os.makedirs(store_dir, exist_ok=True)
+        ais_telemetry.tracer.add_exporter(self)
+
+    def _accept(self, name, attributes):
+        record = {"operation_id": uuid.uuid4().hex,
+                  "name": name,
+                  "status": ACCEPTED,
+                  "attributes": attributes,
+                  "accepted_at": ais_state.now_iso(),
+                  "started_at": None,
+                  "finished_at": None,
+                  "duration_s": None,
+                  "components": {},
+                  "rest_calls": 0,
+                  "rest_s": 0.0,
+                  "result": None,
+                  "error": None}
+        self._keep(record)
+        self._save(record)
+        log.info(f"OPERATION '{record['operation_id']}' ({name}) accepted.")
+        return record
+
+    def _keep(self, record):
+        with self._lock:
+            self._operations[record["operation_id"]] = record
+            while len(self._operations) > self.max_operations:
+                self._operations.popitem(last=False)
+
+    def accept(self, name, **attributes):
+        """ Record the operation as accepted, it is run later by run() - e.g. by a queue triggered worker.
+        Attributes:
+            name (str): operation name, e.g. create_search
+            attributes: saved with the operation, e.g. release_name
+        Returns:
+            operation_id (str): operation id
+        """
+        return self._accept(name, attributes)["operation_id"]
+
+    def submit(self, name, func, result=None, **attributes):
+        """ Start the operation in the background (thread of this process).
+        Attributes:
+            name (str): operation name, e.g. create_search
+            func (function): operation returning success flag
+            result (function): called after func, its value is saved as operation result (e.g. components)
+            attributes: saved with the operation, e.g. release_name
+        Returns:
+            operation_id (str): operation id
+        """
+        record = self._accept(name, attributes)
+        self._executor.submit(self._run, record, func, result)
+        return record["operation_id"]
+
+    def run(self, operation_id, func, result=None, resume=None):
+        """ Run the accepted operation in the calling thread, the record is read from the store folder if needed.
+        Finished operations are not run again. An operation which is still running was interrupted (message
+        redelivered after a timeout or crash of the worker): it is resumed or marked as failed.
+        Attributes:
+            operation_id (str): operation id returned by accept
+            func (function): operation returning success flag
+            result (function): called after func, its value is saved as operation result (e.g. components)
+            resume (function): called with the record instead of func if the operation was interrupted,
+                e.g. reconcile of the recorded names - the operation is marked as failed if None
+        Returns:
+            record (dict): operation record, None if the operation is not known
+        """
+        record = self.get(operation_id)
+        if record is None:
+            log.error(f"OPERATION '{operation_id}' is not known, it is not run.")
+            return None
+        if record["status"] in FINISHED:
+            log.info(f"OPERATION '{operation_id}' is already {record['status']}, it is not run again.")
+            return record
+
+        self._keep(record)
+        if record["status"] == RUNNING:
+            if resume is None:
+                log.error(f"OPERATION '{operation_id}' was interrupted, it is marked as failed.")
+                with self._lock:
+                    record.update(status=FAILED, finished_at=ais_state.now_iso(),
+                                  error='operation was interrupted (timeout or crash of the worker)')
+                self._save(record)
+                return self.get(operation_id)
+            log.warning(f"OPERATION '{operation_id}' was interrupted, resuming.")
+            interrupted = json.loads(json.dumps(record, default=str))
+            func = functools.partial(resume, interrupted)
+        self._run(record, func, result)
+        return self.get(operation_id)
+
+    def _run(self, record, func, result):
+        operation_id, name = record["operation_id"], record["name"]
+        start = time.perf_counter()
+        with ais_telemetry.span('operation', operation_id=operation_id, operation=name) as span:
+            with self._lock:
+                # progress is not reported if the tracer is disabled (no trace id)
+                if span.get("trace_id"):
+                    self._traces[span["trace_id"]] = record
+                record.update(status=RUNNING, started_at=ais_state.now_iso())
+            self._save(record)
+
+            success, error, value = False, None, None
+            try:
+                success = func()
+                value = result() if result is not None else None
+            except Exception as e:
+                log.error(f"OPERATION '{operation_id}' failed.")
+                log.error(e)
+                error = str(e)
+            if not success:
+                span["status"] = ais_telemetry.ERROR
+
+        with self._lock:
+            self._traces.pop(span.get("trace_id"), None)
+            record.update(status=SUCCEEDED if success else FAILED, finished_at=ais_state.now_iso(),
+                          duration_s=time.perf_counter() - start, result=value, error=error)
+        self._save(record)
+        log.info(f"OPERATION '{operation_id}' ({name}) {record['status']} in {record['duration_s']:.1f} s.")
+
+    def _progress(self, span, finished):
+        """ Component progress of the operation the span belongs to. """
+        with self._lock:
+            record = self._traces.get(span.get("trace_id"))
+            if record is None:
+                return
+
+            if span["kind"] == ais_telemetry.REST:
+                if finished:
+                    record["rest_calls"] += 1
+                    record["rest_s"] += span["duration_s"]
+                return
+            if span["name"] not in PROGRESS_STAGES:
+                return
+
+            attrs = span["attributes"]
+            component = attrs.get("component")
+            key = f'{span["name"]}:{component}' if component else span["name"]
+            entry = record["components"].setdefault(key, {"stage": span["name"], "component": component,
+                                                          "status": RUNNING, "duration_s": None,
+                                                          "started_at": ais_state.now_iso()})
+            if finished:
+                entry.update(status=span["status"], duration_s=span["duration_s"])
+                if attrs.get("outcome"):
+                    entry["outcome"] = attrs["outcome"]
+                # final component names - an interrupted operation is resumed with them
+                if attrs.get("names"):
+                    record["names"] = dict(attrs["names"])
+        self._save(record)
+
+    def on_start(self, span):
+        self._progress(span, False)
+
+    def __call__(self, span):
+        self._progress(span, True)
+
+    def _path(self, operation_id):
+        return os.path.join(self.store_dir, f'{operation_id}.json')
+
+    def _save(self, record):
+        if not self.store_dir:
+            return
+        with self._lock:
+            text = json.dumps(record, default=str)
+        tmp = f'{self._path(record["operation_id"])}.{threading.get_ident()}.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                f.write(text)
+            os.replace(tmp, self._path(record["operation_id"]))
+        except Exception as e:
+            log.warning(f"OPERATION '{record['operation_id']}' status is NOT saved. {e}")
+
+    def get(self, operation_id):
+        """ Operation status, from the store folder if it is not known to this instance or not finished here
+        (it could be run by another instance).
+        Returns:
+            record (dict): operation record, None if not found
+        """
+        with self._lock:
+            record = self._operations.get(operation_id)
+            if record is not None:
+                record = json.loads(json.dumps(record, default=str))
+        if record is not None and record["status"] in FINISHED:
+            return record
+        # operation ids are hex, nothing else is read from the folder
+        if not self.store_dir or not all(c in '0123456789abcdef' for c in operation_id):
+            return record
+        try:
+            with open(self._path(operation_id), 'r') as f:
+                return json.loads(f.read())
+        except (FileNotFoundError, ValueError):
+            return record
+
+    def wait(self, operation_id, timeout=None, interval=0.1):
+        """ Wait until the operation is finished (e.g. for scripts and tests).
+        Returns:
+            record (dict): operation record, not finished if timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            record = self.get(operation_id)
+            if record is None or record["status"] in FINISHED:
+                return record
+            if deadline is not None and time.monotonic() >= deadline:
+                return record
+            time.sleep(interval)
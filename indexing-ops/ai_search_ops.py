@@ -8,25 +8,45 @@ This Azure Function for release will:
 Based on REST API Calls
 
 """
-import datetime
+import concurrent.futures
 import json
+import secrets
 
 import ai_search_index as ais_index
 import ai_seach_data_source as ais_datasrc
 import ai_search_indexer as ais_indexer
 import ai_search_skillset as ais_skillset
+import ai_search_capacity as ais_capacity
+import ai_search_client as ais_client
+import ai_search_embedding_cache as ais_embedding_cache
+import ai_search_enrichment as ais_enrichment
+import ai_search_reconcile as ais_reconcile
+import ai_search_retention as ais_retention
+import ai_search_state as ais_state
+import ai_search_telemetry as ais_telemetry
+import ai_search_inventory as ais_inventory
+import ai_search_models as ais_models
+import ai_search_monitor as ais_monitor
+import ai_search_push as ais_push
+import ai_search_query as ais_query
+import ai_search_template as ais_template
+import ai_search_vector_profiles as ais_vector_profiles
+import ai_search_vectorize as ais_vectorize
 
 import logging as log
 log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
 
 
+# AI Search REST API version used by all components
+SEARCH_API_VERSION = '2024-07-01'
 
 
 class AISearchOps:
     def __init__(self, config, base_index_name, release_name, 
                  index_schema_path, indexer_def_path, 
                  vectorize_flag = False, 
-                 skillset_def_path=''):
+                 skillset_def_path='', client=None, vector_profile=None, capacity=None, state=None,
+                 hnsw=None):
         """
         Create initial ai search ops object. Note that specified version of the AI Search API is used.
         This might need to be updated in the future, however re-test is needed.
@@ -38,6 +58,12 @@ class AISearchOps:
             indexer_def_path (str): path to the json file with indexer definition
             vectorize (bool): if there is vectorization
             skillset_def_path (str): path to the json file with skillset definition
+            client (AISearchClient): pooled REST client, shared client for the service is used if not provided
+            vector_profile (str): vector storage profile of the index (see ai_search_vector_profiles.VECTOR_PROFILES)
+            capacity (dict): corpus profile and service tier checked before anything is created (see plan_capacity),
+                e.g. {"documents": 2000000, "avg_document_chars": 12000, "tier": "standard", "target_qps": 50}
+            state: release state store (see ai_search_state.open_state_store), nothing is recorded if None
+            hnsw (dict): HNSW parameters of the index (m, efConstruction, efSearch, metric), e.g. picked by ai_search_hnsw_sweep
         Returns:
 
         """
@@ -48,7 +74,7 @@ class AISearchOps:
         # to be loaded from config
         self.ai_search_resource = ''
         self.ai_search_apikey = ''
-        self.search_api_version = '2024-07-01'
+        self.search_api_version = SEARCH_API_VERSION
         # vectorize flag - should be AOAI resources provided, will need skillset creation
         self.vectorize_flag = vectorize_flag
 
@@ -63,6 +89,12 @@ class AISearchOps:
         self.index_schema = index_schema_path
         self.indexer_def = indexer_def_path
         self.skillset_def = skillset_def_path
+        # compression / vector type / stored of vector fields, template as is if None
+        self.vector_profile = vector_profile
+        # HNSW parameters of the vector index, template as is if None
+        self.hnsw = hnsw
+        # capacity check before creation, skipped if None
+        self.capacity = capacity
 
         # DATA SOURCE
         self.data_source_storage_acc = ''
@@ -79,10 +111,26 @@ class AISearchOps:
         self.aoai_apikey = ''
         self.aoai_deploymentid = ''
         self.aoai_modelname = ''
+
+        # Incremental enrichment (indexer cache) - optional, loaded from config
+        self.enrichment_cache_conn_str = ''
+        self.enrichment_cache_reprocessing = True
         
+        # components created by the last create_search call
+        self.components = {}
+        # data source / indexer shards created by the last create_sharded_search call: (folder, data source, indexer)
+        self.shards = []
+        # final names, definition hashes and outcomes of the release are recorded here
+        self.state = state
+
         # load resources and API keys
         self._get_config(config)
 
+        # pooled REST client - keep-alive connections are reused by all components
+        self.client = client if client is not None else ais_client.get_client(self.ai_search_resource,
+                                                                              self.ai_search_apikey,
+                                                                              self.search_api_version)
+
     def _get_config(self, config):
         """ 
         Retrieve config & env vars.
@@ -115,26 +163,99 @@ class AISearchOps:
                 log.info('Vect: Azure OpenAI - resource details found.')
             except Exception as e:
                 log.error('Vect: Azure OpenAI - resource details NOT found.')
+
+            # optional - skill outputs are cached, only invalidated skills are re-run
+            if config.get("EnrichmentCacheConnStr"):
+                self.enrichment_cache_conn_str = config["EnrichmentCacheConnStr"]
+                self.enrichment_cache_reprocessing = str(config.get("EnrichmentCacheReprocessing", True)).lower() \
+                    not in ('false', '0', 'no')
+                log.info('Vect: Enrichment cache - storage details found.')
             
 
-    def prep_index(self):
+    @ais_telemetry.traced('resolve_names')
+    def resolve_names(self, shards=0):
+        """ Check if any component of the release exists, if so - time is added to the names of all components.
+        Names of all indexes, indexers, skillsets and data sources are listed at once (one snapshot).
+        Must be done before any component is created, all components refer to these names.
+        Args:
+        shards (int): number of data source / indexer shards, their names are checked as well
+        """
+        names = {'indexes': self.search_index_name,
+                 'datasources': self.data_source_name,
+                 'skillsets': self.search_skillset_name,
+                 'indexers': self.search_indexer_name}
+
+        inventory = ais_inventory.list_component_names(self.client)
+        names = ais_inventory.resolve_collisions(names, inventory,
+                                                 {'datasources': shards, 'indexers': shards} if shards else None)
+        self._set_names(names)
+        ais_telemetry.annotate(names=names)
+
+    def _set_names(self, names):
+        self.search_index_name = names['indexes']
+        self.data_source_name = names['datasources']
+        self.search_indexer_name = names['indexers']
+        self.search_skillset_name = names['skillsets']
+
+    def restore_state(self):
+        """ Final names of the release components (time suffix, shards) from the release state, no network calls.
+        The newest recorded instance of the release is used.
+        Returns:
+        record (dict): release record, None if there is no state store or the release is not recorded
+        """
+        if self.state is None:
+            return None
+        record = ais_state.latest_release(self.state, self.ai_search_base_index_name, self.release_name)
+        if record is None:
+            return None
+        self._set_names(record["names"])
+        self.shards = [tuple(s) for s in record["shards"]]
+        log.info(f"STATE: '{self.release_name}' names restored from release state: {record['names']}")
+        return record
+
+    def _record_state(self, operation, outcomes, success):
+        """ Record final names, definition hashes and outcomes of the release components in the release state.
+        Args:
+        operation (str): create, create sharded or reconcile
+        outcomes (dict): component (or shard data source / indexer name) -> outcome
+        success (bool): if the operation is successful
+        """
+        if self.state is None:
+            return None
+        names = {'indexes': self.search_index_name,
+                 'datasources': self.data_source_name,
+                 'skillsets': self.search_skillset_name,
+                 'indexers': self.search_indexer_name}
+        record = self.state.get(self.search_index_name) or \
+            ais_state.new_record(self.ai_search_base_index_name, self.release_name, names)
+        record.update(names=names, shards=[list(s) for s in self.shards], operation=operation, success=success)
+        salt = record.setdefault("secret_salt", secrets.token_hex(16))
+
+        definitions = self.render_definitions()
+        for component, outcome in outcomes.items():
+            rendered = definitions.get(component)
+            record["components"][component] = {
+                "name": rendered[1] if rendered else component,
+                "hash": ais_state.definition_hash(rendered[2], salt) if rendered else None,
+                "secrets": ais_state.secret_digest(rendered[2], salt) if rendered else None,
+                "outcome": outcome}
+        try:
+            return self.state.put(record)
+        except Exception as e:
+            log.error(f"STATE: '{self.search_index_name}' is NOT recorded. {e}")
+            return None
+
+    def prep_index(self, check_exists=True):
         """ Create index with needed configuration. 
-        First is checked if index exists, then name will be updated.
+        First is checked if components exist, then names will be updated.
+        Args:
+        check_exists (bool): check index exists, False if names are already resolved
         Returts:
         success (bool): if execution is successful
         """
-        # check if index exists and create
-       
-        if ais_index.check_index_exists(ai_search_resource=self.ai_search_resource,
-                                        ai_search_apikey=self.ai_search_apikey,
-                                        search_api_version=self.search_api_version,
-                                        search_index_name=self.search_index_name):
-            # add time to index name and create
-            dd = datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
-            self.search_index_name += '-%s' %dd
-            self.data_source_name += '-%s' %dd
-            self.search_indexer_name += '-%s' %dd
-            self.search_skillset_name += '-%s' %dd
+        # check if components exist and create
+        if check_exists:
+            self.resolve_names()
             
         if self.vectorize_flag:
             # AOAI resource needed loaded
@@ -144,44 +265,57 @@ class AISearchOps:
                                index_schema_path=self.index_schema,
                                search_index_name=self.search_index_name,
                                vectorize_flag=self.vectorize_flag,
+                               client=self.client,
                                openai_resource=self.aoai_resource,
                                openai_apikey=self.aoai_apikey,
                                openai_deploymentid=self.aoai_deploymentid,
-                               openai_modelname=self.aoai_modelname)
+                               openai_modelname=self.aoai_modelname,
+                               vector_profile=self.vector_profile,
+                               hnsw=self.hnsw)
         else:
             success = ais_index.create_index(ai_search_resource=self.ai_search_resource,
                                ai_search_apikey=self.ai_search_apikey,
                                search_api_version=self.search_api_version,
                                index_schema_path=self.index_schema,
                                search_index_name=self.search_index_name,
-                               vectorize_flag=self.vectorize_flag)
+                               vectorize_flag=self.vectorize_flag,
+                               client=self.client)
         return success
 
-    def prep_data_source(self):
+    def prep_data_source(self, data_source_name=None, data_source_folder=None):
         """Create data source.
+        Args:
+        data_source_name (str): data source name, release data source if not provided (shards)
+        data_source_folder (str): data folder, configured folder if not provided (shards)
         """
         success = ais_datasrc.create_data_source(ai_search_resource=self.ai_search_resource,
                                         ai_search_apikey=self.ai_search_apikey,
                                         search_api_version=self.search_api_version,
-                                        data_src_name=self.data_source_name,
+                                        data_src_name=data_source_name or self.data_source_name,
                                         data_src_connstr=self.data_source_conn_str,
                                         data_src_container=self.data_source_container,
-                                        data_src_dir=self.data_source_folder)  
+                                        data_src_dir=data_source_folder or self.data_source_folder,
+                                        client=self.client)  
         return success
 
         
-    def prep_indexer(self):
+    def prep_indexer(self, indexer_name=None, data_source_name=None):
         """
         Create Indexer
+        Args:
+        indexer_name (str): indexer name, release indexer if not provided (shards)
+        data_source_name (str): data source of the indexer, release data source if not provided (shards)
         """
         success = ais_indexer.create_indexer(ai_search_resource=self.ai_search_resource,
                                         ai_search_apikey=self.ai_search_apikey,
                                         search_api_version=self.search_api_version,
-                                        indexer_name= self.search_indexer_name,
+                                        indexer_name=indexer_name or self.search_indexer_name,
                                         indexer_def_path=self.indexer_def,
-                                        data_source_name=self.data_source_name,
+                                        data_source_name=data_source_name or self.data_source_name,
                                         target_index_name=self.search_index_name,
-                                        skillset_name=self.search_skillset_name) 
+                                        skillset_name=self.search_skillset_name if self.vectorize_flag else None,
+                                        client=self.client,
+                                        cache=self.enrichment_cache())
         return success
     
     def prep_skillset(self):
@@ -196,42 +330,528 @@ class AISearchOps:
                                         openai_apikey=self.aoai_apikey, 
                                         openai_deploymentid=self.aoai_deploymentid, 
                                         openai_modelname=self.aoai_modelname,
-                                        target_index_name=self.search_index_name)
+                                        target_index_name=self.search_index_name,
+                                        client=self.client)
         return success
 
+    def _run_parallel(self, steps):
+        """ Run independent creation steps at the same time.
+        Args:
+        steps (dict): component name -> function returning success flag
+        Returns:
+        results (dict): component name -> success flag
+        """
+        results = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(steps)) as executor:
+            # steps run in the span context of the caller (create_search), their spans are its children
+            futures = {executor.submit(ais_telemetry.propagate(step)): component for component, step in steps.items()}
+            for future in concurrent.futures.as_completed(futures):
+                component = futures[future]
+                try:
+                    results[component] = future.result()
+                except Exception as e:
+                    log.error(e)
+                    results[component] = False
+        return results
+
+    @ais_telemetry.traced('create_search')
     def create_search(self):
         """ Main method to create following AI Search components:
-        1. Index 2. Data Source 3. Skillset 4. Indexer.
+        1. Index, Data Source, Skillset - created at the same time, they do not depend on each other.
+        2. Indexer - created once all of the above are created OK.
         Note, there is no rollback. 
         """
 
         log.info('>>> AI SEARCH - creation started.')
+        ais_telemetry.annotate(release=self.release_name)
+        components = {i:'' for i in ['index', 'data source', 'skillset', 'indexer']}
+        self.components = components
 
-        # prepare index definition and create index
-        if not self.prep_index():
-            log.error('>>> Index is NOT created. AI Search componenets creation is stopped.')
+        # definitions are consistent and planned partitions / replicas fit the service tier
+        if self.validate_definitions():
+            log.error('>>> Definitions are NOT valid, nothing is created.')
             return False
-        
-        # prepare data source definition and create data source 
-        if not self.prep_data_source():
-            log.error('>>> Data Source is NOT created. AI Search componenets creation is stopped.')
+        if not self.check_capacity():
             return False
 
-        # prepare skillset definition and create skillset   
+        # names of all components are final before anything is created
+        self.resolve_names()
+        ais_telemetry.annotate(index=self.search_index_name)
+
+        # prepare definitions and create index, data source and skillset
+        steps = {'index': lambda: self.prep_index(check_exists=False),
+                 'data source': self.prep_data_source}
         if self.vectorize_flag:
             # vectorization - need vect skillset creaion
-            if not self.prep_skillset():
-                log.error('>>> Skillset is NOT created. AI Search componenets creation is stopped.')
-                return False
+            steps['skillset'] = self.prep_skillset
+        names = {'index': self.search_index_name,
+                 'data source': self.data_source_name,
+                 'skillset': self.search_skillset_name}
+
+        results = self._run_parallel(steps)
+        for component in steps:
+            if results[component]:
+                components[component] = names[component]
+            else:
+                log.error(f'>>> {component.title()} is NOT created.')
+
+        outcomes = {c: ais_reconcile.CREATED if results[c] else ais_reconcile.FAILED for c in steps}
+        if not all(results.values()):
+            log.error(f'>>> AI Search componenets creation is stopped. Components created: {components}')
+            self._record_state('create', outcomes, False)
+            return False
 
         # prepare indexer definition and create indexer  
         if not self.prep_indexer():
-            log.error('>>> Indexer is NOT created. AI Search componenets creation is stopped.')
+            log.error(f'>>> Indexer is NOT created. AI Search componenets creation is stopped. Components created: {components}')
+            self._record_state('create', dict(outcomes, indexer=ais_reconcile.FAILED), False)
             return False
-        
-        log.info('>>> AI SEARCH - creation completed OK.')
+        components['indexer'] = self.search_indexer_name
+
+        self._record_state('create', dict(outcomes, indexer=ais_reconcile.CREATED), True)
+        log.info(f'>>> AI SEARCH - creation completed OK. Components created: {components}')
+        return True
+
+    @ais_telemetry.traced('create_sharded_search')
+    def create_sharded_search(self, shards):
+        """ Create index and skillset with N data sources and N indexers (one per data folder shard),
+        all indexers load the same index through the same skillset, so they run in parallel.
+        1. Index, Skillset and all Data Sources - created at the same time.
+        2. All Indexers - created at the same time once all of the above are created OK.
+        Args:
+        shards (int or list): number of shards (sub-folders shard-00, shard-01, ...) or list of sub-folders
+            of the configured data folder
+        Returns:
+        success (bool): if execution is successful, components in self.components, shards in self.shards
+        """
+        folders = ais_datasrc.shard_folders(self.data_source_folder, shards)
+        log.info(f'>>> AI SEARCH - sharded creation started ({len(folders)} shards).')
+        ais_telemetry.annotate(release=self.release_name, shards=len(folders))
+        components = {'index': '', 'data source': [], 'skillset': '', 'indexer': []}
+        self.components = components
+
+        if self.validate_definitions():
+            log.error('>>> Definitions are NOT valid, nothing is created.')
+            return False
+        if not self.check_capacity():
+            return False
+
+        self.resolve_names(shards=len(folders))
+        self.shards = list(zip(folders,
+                               ais_inventory.shard_names(self.data_source_name, len(folders)),
+                               ais_inventory.shard_names(self.search_indexer_name, len(folders))))
+
+        steps = {'index': lambda: self.prep_index(check_exists=False)}
+        if self.vectorize_flag:
+            steps['skillset'] = self.prep_skillset
+        for folder, data_source_name, _ in self.shards:
+            steps[data_source_name] = lambda n=data_source_name, f=folder: self.prep_data_source(n, f)
+
+        results = self._run_parallel(steps)
+        if results['index']:
+            components['index'] = self.search_index_name
+        if results.get('skillset'):
+            components['skillset'] = self.search_skillset_name
+        components['data source'] = [n for _, n, _ in self.shards if results[n]]
+
+        # index and skillset with definition hash, shard data sources / indexers by name
+        outcomes = {c: ais_reconcile.CREATED if r else ais_reconcile.FAILED for c, r in results.items()}
+        if not all(results.values()):
+            log.error(f'>>> AI Search componenets creation is stopped. Components created: {components}')
+            self._record_state('create sharded', outcomes, False)
+            return False
+
+        results = self._run_parallel({indexer_name: lambda i=indexer_name, d=data_source_name: self.prep_indexer(i, d)
+                                      for _, data_source_name, indexer_name in self.shards})
+        components['indexer'] = [i for _, _, i in self.shards if results[i]]
+        outcomes.update({c: ais_reconcile.CREATED if r else ais_reconcile.FAILED for c, r in results.items()})
+        if not all(results.values()):
+            log.error(f'>>> Indexers are NOT created. Components created: {components}')
+            self._record_state('create sharded', outcomes, False)
+            return False
+
+        self._record_state('create sharded', outcomes, True)
+        log.info(f'>>> AI SEARCH - sharded creation completed OK. Components created: {components}')
+        return True
+
+    def monitor_shards(self, expected_items=None, callback=None, **kwargs):
+        """ Monitor indexer runs of all shards together until all are finished.
+        Args:
+        expected_items (int): number of items expected per shard, used for ETA
+        callback (function): called with every progress event and the combined progress of all shards
+        kwargs: poll settings of IndexerMonitor (min_interval, max_interval, backoff, timeout)
+        Returns:
+        summary (dict): summary per indexer, total items and combined throughput
+        """
+        if not self.shards:
+            self.restore_state()
+        summary = ais_monitor.monitor_indexers(self.client, [i for _, _, i in self.shards],
+                                               expected_items=expected_items, callback=callback, **kwargs)
+        summary["release_name"] = self.release_name
+        self._record_ingestion(summary)
+        return summary
+
+    def _record_ingestion(self, summary):
+        """ Record outcome of the indexer run(s) in the release state. """
+        if self.state is None:
+            return
+        record = self.state.get(self.search_index_name)
+        if record is None:
+            return
+        record["ingestion"] = {k: summary.get(k) for k in ['success', 'status', 'items_processed', 'items_failed',
+                                                           'elapsed_s', 'items_per_s']}
+        record["ingestion"]["at"] = ais_state.now_iso()
+        self.state.put(record)
+
+    def enrichment_cache(self):
+        """ Indexer enrichment cache of the release, None if not configured or there is no skillset. """
+        if not self.vectorize_flag:
+            return None
+        return ais_enrichment.enrichment_cache(self.enrichment_cache_conn_str, self.enrichment_cache_reprocessing)
+
+    def render_definitions(self):
+        """ Render definitions of all components of the release, no network calls.
+        Returns:
+        definitions (dict): component -> (collection, name, definition json), None if rendering failed
+        """
+        definitions = {}
+
+        success, data = ais_index._prep_update_definition_json(self.search_index_name, self.index_schema,
+                                                               self.vectorize_flag,
+                                                               self.aoai_resource, self.aoai_apikey,
+                                                               self.aoai_deploymentid, self.aoai_modelname,
+                                                               self.vector_profile, self.hnsw)
+        definitions['index'] = ('indexes', self.search_index_name, data) if success else None
+
+        data = ais_datasrc._prep_data_source_def(self.data_source_name, self.data_source_conn_str,
+                                                 self.data_source_container, self.data_source_folder)
+        definitions['data source'] = ('datasources', self.data_source_name, data)
+
+        if self.vectorize_flag:
+            success, data = ais_skillset._prep_update_definition_json(self.search_skillset_name, self.skillset_def,
+                                                                      self.aoai_resource, self.aoai_apikey,
+                                                                      self.aoai_deploymentid, self.aoai_modelname,
+                                                                      self.search_index_name)
+            definitions['skillset'] = ('skillsets', self.search_skillset_name, data) if success else None
+
+        success, data = ais_indexer._prep_indexer_def_json(self.search_indexer_name, self.indexer_def,
+                                                           self.data_source_name, self.search_index_name,
+                                                           self.search_skillset_name if self.vectorize_flag else None,
+                                                           self.enrichment_cache())
+        definitions['indexer'] = ('indexers', self.search_indexer_name, data) if success else None
+
+        return definitions
+
+    def plan_capacity(self, documents, avg_document_chars, tier='standard', target_qps=0, min_replicas=1,
+                      partitions=None, replicas=None):
+        """ Capacity plan of the release index (partitions, replicas) checked against the service tier, no network calls.
+        Args:
+        documents (int): number of source documents
+        avg_document_chars (int): average document text length
+        tier (str): service tier (see ai_search_capacity.SERVICE_TIERS)
+        target_qps (float): target queries per second
+        min_replicas (int): min replicas
+        partitions (int): partitions of the existing service, checked if provided
+        replicas (int): replicas of the existing service, checked if provided
+        Returns:
+        report (dict): see ais_capacity.plan_capacity, None if index is not rendered
+        """
+        success, data = ais_index._prep_update_definition_json(self.search_index_name, self.index_schema,
+                                                               self.vectorize_flag,
+                                                               self.aoai_resource, self.aoai_apikey,
+                                                               self.aoai_deploymentid, self.aoai_modelname,
+                                                               self.vector_profile, self.hnsw)
+        if not success:
+            return None
+
+        profile = ais_capacity.corpus_profile(documents, avg_document_chars,
+                                              self.skillset_def if self.vectorize_flag else '')
+        report = ais_capacity.plan_capacity(data, profile, tier=tier, target_qps=target_qps,
+                                            min_replicas=min_replicas,
+                                            provisioned={"partitions": partitions, "replicas": replicas})
+        log.info(f"CAPACITY '{self.search_index_name}': {ais_capacity.format_plan(report)}")
+        return report
+
+    def validate_definitions(self):
+        """ Render definitions of the release and validate them (fields, mappings, projections, dimensions)
+        and their cross-object consistency, no network calls.
+        Returns:
+        issues (list): issue descriptions, empty if the release is consistent
+        """
+        definitions = self.render_definitions()
+        failed = [c for c, d in definitions.items() if d is None]
+        if failed:
+            return [f'{c} definition is not rendered' for c in failed]
+
+        skillset = definitions.get('skillset')
+        return ais_models.validate_definitions(definitions['index'][2], definitions['data source'][2],
+                                               skillset[2] if skillset else None, definitions['indexer'][2])
+
+    def check_capacity(self):
+        """ Capacity plan of self.capacity fits the service tier (True if no capacity is configured). """
+        if not self.capacity:
+            return True
+        report = self.plan_capacity(**self.capacity)
+        if report is None or not report["fits"]:
+            log.error(f'>>> Capacity check failed, nothing is created. {report["reasons"] if report else ""}')
+            return False
+        return True
+
+    def vector_storage_report(self, vector_count):
+        """ Estimated vector index memory of the release index for every vector storage profile, no network calls.
+        Args:
+        vector_count (int): number of documents (chunks) with vectors
+        Returns:
+        rows (list): profile, vector_index_bytes, disk_bytes, memory_ratio
+        """
+        success, data = ais_index._prep_update_definition_json(self.search_index_name, self.index_schema,
+                                                               self.vectorize_flag,
+                                                               self.aoai_resource, self.aoai_apikey,
+                                                               self.aoai_deploymentid, self.aoai_modelname,
+                                                               hnsw=self.hnsw)
+        if not success:
+            return []
+        rows = ais_vector_profiles.vector_profiles_report(data, vector_count)
+        log.info(f'VECTOR STORAGE of {vector_count} vectors:\n{ais_vector_profiles.format_report(rows)}')
+        return rows
+
+    @ais_telemetry.traced('reconcile_search')
+    def reconcile_search(self, use_state=True, force=False, names=None):
+        """ Idempotent deploy of the release: live definitions are compared with rendered templates
+        and only missing or changed components are created or updated (PUT). Names are not changed,
+        re-running unchanged release makes no write calls and does not trigger re-indexing.
+        Index, Data Source, Skillset are reconciled at the same time, then Indexer.
+        With release state, recorded names are used and components with the recorded definition hash
+        are not compared with the live definition (no network call).
+        Data source, skillset and indexer written to another index (names taken by another stack) are not updated,
+        reconcile stops with conflict outcome.
+        Secrets (api keys, connection strings) are never returned by the service, components whose secrets
+        differ from the recorded ones (salted digest in the release state) are updated without comparison.
+        Args:
+        use_state (bool): trust the release state, False - every component is compared with the live one
+        force (bool): update every existing component, e.g. secrets rotated without release state
+        names (dict): collection -> final name to reconcile instead of the release names, e.g. resolved names
+        of an interrupted create (see ai_search_operations), release state is not used then
+        Returns:
+        success (bool): if execution is successful, outcome per component is in self.components
+        """
+        log.info('>>> AI SEARCH - reconcile started.')
+        ais_telemetry.annotate(release=self.release_name)
+        if names:
+            self._set_names(names)
+        record = self.restore_state() if use_state and not self.components and not names else None
+        components = {i:'' for i in ['index', 'data source', 'skillset', 'indexer']}
+        self.components = components
+
+        if self.validate_definitions():
+            log.error('>>> Definitions are NOT valid, nothing is reconciled.')
+            return False
+        if not self.check_capacity():
+            return False
+
+        definitions = self.render_definitions()
+        failed = [c for c, d in definitions.items() if d is None]
+        if failed:
+            log.error(f'>>> Definitions are NOT rendered: {failed}. AI Search reconcile is stopped.')
+            return False
+
+        # unchanged since the last recorded deploy - no live comparison, rotated secrets - update
+        salt = record.get("secret_salt") if record else None
+        unchanged = set() if force else ais_state.unchanged_components(
+            record, {c: (d[1], ais_state.definition_hash(d[2], salt)) for c, d in definitions.items()})
+        rotated = ais_state.rotated_secrets(record, {c: (d[1], ais_state.secret_digest(d[2], salt))
+                                                     for c, d in definitions.items()}) if salt else set()
+        for component in unchanged:
+            log.info(f"RECONCILE {definitions[component][0].upper()}: '{definitions[component][1]}' "
+                     f"is up to date (release state), skipped.")
+            components[component] = ais_reconcile.UNCHANGED
+
+        # names shared with another stack (same release of another base) are not taken over
+        try:
+            conflicts = ais_reconcile.ownership_conflicts(
+                self.client, {c: d for c, d in definitions.items() if c not in unchanged}, self.search_index_name)
+        except Exception as e:
+            log.error(f'>>> Live definitions are NOT retrieved, AI Search reconcile is stopped. {e}')
+            return False
+        if conflicts:
+            for component, foreign in conflicts.items():
+                log.error(f"RECONCILE {definitions[component][0].upper()}: '{definitions[component][1]}' "
+                          f"belongs to another stack (writes to {foreign}), it is NOT updated.")
+                components[component] = ais_reconcile.CONFLICT
+            log.error(f'>>> AI Search reconcile is stopped, names are taken by another stack. Components: {components}')
+            return False
+
+        def _step(component):
+            collection, name, data = definitions[component]
+            if component in unchanged:
+                return lambda: ais_reconcile.UNCHANGED
+            return lambda: ais_reconcile.reconcile_component(self.client, collection, name, data,
+                                                             force=force or component in rotated)
+
+        steps = {c: _step(c) for c in definitions if c != 'indexer'}
+        results = self._run_parallel(steps)
+        components.update(results)
+        outcomes = {c: ais_reconcile.FAILED if r is False else r for c, r in results.items()}
+
+        if any(r in [ais_reconcile.FAILED, False] for r in results.values()):
+            log.error(f'>>> AI Search reconcile is stopped. Components: {components}')
+            self._record_state('reconcile', outcomes, False)
+            return False
+
+        components['indexer'] = _step('indexer')()
+        outcomes['indexer'] = components['indexer']
+        if components['indexer'] == ais_reconcile.FAILED:
+            log.error(f'>>> Indexer is NOT reconciled. Components: {components}')
+            self._record_state('reconcile', outcomes, False)
+            return False
+
+        self._record_state('reconcile', outcomes, True)
+        log.info(f'>>> AI SEARCH - reconcile completed OK. Components: {components}')
         return True
 
+    def enrichment_invalidation_report(self):
+        """ Skills which will be re-run if the rendered skillset / indexer replace the deployed ones (reconcile).
+        Returns:
+        report (dict): see ais_enrichment.invalidation_report, None if there is no skillset
+        """
+        if not self.vectorize_flag:
+            return None
+
+        definitions = self.render_definitions()
+        if definitions['skillset'] is None or definitions['indexer'] is None:
+            log.error('Definitions are NOT rendered, invalidation report is not created.')
+            return None
+
+        live_skillset = ais_reconcile.get_definition(self.client, 'skillsets', self.search_skillset_name)
+        live_indexer = ais_reconcile.get_definition(self.client, 'indexers', self.search_indexer_name,
+                                                    ais_indexer.api_params({"cache": self.enrichment_cache()}))
+        report = ais_enrichment.invalidation_report(live_skillset, definitions['skillset'][2],
+                                                    live_indexer, definitions['indexer'][2])
+        if live_indexer is not None and not live_indexer.get("cache"):
+            report["reasons"].append('enrichment cache is not enabled on the deployed indexer')
+
+        log.info(f"ENRICHMENT '{self.search_skillset_name}': {ais_enrichment.format_report(report)}")
+        return report
+
+    def cleanup_releases(self, keep_last=3, keep=(), dry_run=True, use_aliases=True, other_bases=()):
+        """ Delete stale release instances of the base index (index, data sources, skillset, indexers).
+        The newest keep_last instances, instances referenced by an alias, listed in keep and this release are kept.
+        Args:
+        keep_last (int): number of newest release instances kept
+        keep (list): release instances (or index names) always kept
+        dry_run (bool): only preview what would be deleted
+        use_aliases (bool): keep release instances with index referenced by an alias
+        other_bases (list): other base index names sharing the prefix of this base, recorded bases are added
+        Returns:
+        plan (dict): retention plan, with deletion results if not dry run
+        """
+        if self.state is not None and not self.components:
+            self.restore_state()
+        current = self.search_index_name[len(self.ai_search_base_index_name) + 1:]
+        # recorded releases: creation times (indexer statuses are not read) and recorded names are used,
+        # other recorded bases are never treated as releases of this base
+        records = self.state.releases(self.ai_search_base_index_name) if self.state else None
+        other_bases = list(other_bases) + (self.state.base_index_names() if self.state else [])
+        plan = ais_retention.cleanup_releases(self.client, self.ai_search_base_index_name, keep_last=keep_last,
+                                              keep=list(keep) + [current], dry_run=dry_run,
+                                              use_aliases=use_aliases, records=records, other_bases=other_bases)
+
+        if self.state is not None and not dry_run:
+            deleted = plan["results"].get('indexes', {})
+            for release in plan["delete"]:
+                index_name = f'{self.ai_search_base_index_name}-{release}'
+                if deleted.get(index_name):
+                    self.state.delete(index_name)
+        return plan
+
+    def monitor_indexer(self, expected_items=None, callback=None, **kwargs):
+        """ Monitor the indexer run of the release until it is finished.
+        Indexer name is taken from the release state if the release was not created by this object.
+        Args:
+        expected_items (int): number of items expected in the run, used for ETA
+        callback (function): called with every progress event
+        kwargs: poll settings of IndexerMonitor (min_interval, max_interval, backoff, timeout)
+        Returns:
+        summary (dict): execution summary with throughput (items per second)
+        """
+        if self.state is not None and not self.components:
+            self.restore_state()
+        monitor = ais_monitor.IndexerMonitor(self.client, self.search_indexer_name,
+                                             expected_items=expected_items, **kwargs)
+        summary = monitor.run(callback=callback)
+        summary["release_name"] = self.release_name
+        self._record_ingestion(summary)
+        return summary
+
+    def push_documents(self, docs, key_field=None, max_in_flight=4, **kwargs):
+        """ Push documents into the index of the release (push mode, no indexer needed).
+        Args:
+        docs (iterable): documents, e.g. ais_push.iter_documents(path)
+        key_field (str): key field of the index, taken from the index definition if not provided
+        max_in_flight (int): max batches sent at the same time
+        kwargs: batch settings of DocumentPusher (max_docs, max_bytes, max_key_retries)
+        Returns:
+        summary (dict): push summary with docs/s
+        """
+        if key_field is None:
+            template = ais_template.load_template(self.index_schema)
+            key_field = next(f["name"] for f in template["fields"] if f.get("key"))
+
+        return ais_push.push_documents(self.client, self.search_index_name, key_field, docs,
+                                       max_in_flight=max_in_flight, **kwargs)
+
+    def vectorize_documents(self, docs, backend=None, batch_size=16, max_workers=4, max_in_flight=4,
+                            embedding_cache=None, **kwargs):
+        """ Chunk and embed documents locally (instead of the skillset) and push chunks into the index of the release.
+        Chunking follows the SplitSkill settings of the skillset definition, vector dimensions are checked against the index.
+        Args:
+        docs (iterable): documents with parent_id, title and content, e.g. ais_vectorize.iter_text_files(folder)
+        backend: embedding backend, Azure OpenAI of the config if not provided
+        batch_size (int): chunks per embedding call
+        max_workers (int): embedding calls at the same time
+        max_in_flight (int): push batches sent at the same time
+        embedding_cache (EmbeddingCache): embeddings shared by releases, only new chunks are embedded
+        kwargs: batch settings of DocumentPusher
+        Returns:
+        summary (dict): push summary with chunks, chunks/s and cache hit rate
+        """
+        index = ais_template.load_template(self.index_schema)
+        vector_field = next(f for f in index["fields"] if f.get("dimensions"))
+        key_field = next(f["name"] for f in index["fields"] if f.get("key"))
+
+        if backend is None:
+            backend = ais_vectorize.AzureOpenAIEmbeddingBackend(self.aoai_resource, self.aoai_apikey,
+                                                                self.aoai_deploymentid, self.aoai_modelname,
+                                                                dimensions=vector_field["dimensions"])
+        if backend.dimensions != vector_field["dimensions"]:
+            raise ValueError(f"Embedding backend has {backend.dimensions} dimensions, "
+                             f"'{vector_field['name']}' field has {vector_field['dimensions']}.")
+        if embedding_cache is not None:
+            backend = ais_embedding_cache.CachedEmbeddingBackend(backend, embedding_cache)
+
+        pipeline = ais_vectorize.ChunkEmbeddingPipeline(backend, batch_size=batch_size, max_workers=max_workers,
+                                                        vector_field=vector_field["name"],
+                                                        **ais_vectorize.split_settings(self.skillset_def))
+        return pipeline.run(self.client, self.search_index_name, docs, key_field=key_field,
+                            max_in_flight=max_in_flight, **kwargs)
+
+    def query_client(self, embedding_backend=None, embedding_cache=None, **kwargs):
+        """ Query client of the index of the release, sharing the pooled client of AISearchOps.
+        Vector field and semantic configuration are taken from the index template (no request).
+        Args:
+        embedding_backend: backend embedding vector query texts on the client, the index vectorizer is used if None
+        embedding_cache (EmbeddingCache): persistent query embeddings, used with embedding_backend
+        kwargs: SearchQueryClient settings (cache_size, ttl_s, embedding_cache_size, max_workers, top)
+        Returns:
+        query_client (SearchQueryClient): query client
+        """
+        if embedding_backend is not None and embedding_cache is not None:
+            embedding_backend = ais_embedding_cache.CachedEmbeddingBackend(embedding_backend, embedding_cache)
+        index = ais_template.load_template(self.index_schema)
+        return ais_query.SearchQueryClient(self.client, self.search_index_name, embedding_backend=embedding_backend,
+                                           **dict(ais_query.query_settings(index), **kwargs))
+
+
 if __name__ == '__main__':
     # simple index creation (no vector): crate index, data source, indexer without skills
     # working version
@@ -260,3 +880,7 @@ if __name__ == '__main__':
                               vectorize_flag=vectorize_flag,
                               skillset_def_path=skillset_def_path)
     aisearchops.create_search()
+    # idempotent re-deploy of the same release - only changed components are updated
+    # aisearchops.reconcile_search()
+    # wait for the indexer run and log ingestion throughput
+    # aisearchops.monitor_indexer()
@@ -0,0 +1,303 @@
+"""
+Query client of an index created by AISearchOps: pooled connection (AISearchClient), LRU + TTL result cache keyed by
+the normalized query and filter, query embedding cache for vector queries embedded on the client and fan-out of many
+queries sent concurrently with results returned in the same order (identical queries of a fan-out are sent once).
+https://learn.microsoft.com/en-us/rest/api/searchservice/documents/search-post
+
+Queries are dicts (same format as the load test query file), optional keys: filter, select, top, k,
+query_type ('simple' - default, or 'full' Lucene syntax of keyword / hybrid queries):
+{"kind": "keyword", "search": "retention policy"}
+{"kind": "vector", "text": "how long are backups kept"}          - embedded by the embedding backend, or by the index vectorizer
+{"kind": "vector", "vector": [0.01, ...]}
+{"kind": "hybrid", "search": "backup", "text": "how long are backups kept"}
+{"kind": "semantic", "search": "how long are backups kept"}       - semantic configuration of the index
+
+Usage:
+python ai_search_query.py --index vect-index-release-3oct --search "retention policy" --config ../config.json
+python ai_search_query.py --index vect-index-release-3oct --queries ./data/vector-index/sample_queries.jsonl --config ../config.json
+"""
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+import ai_search_client as ais_client
+import ai_search_telemetry as ais_telemetry
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+KINDS = ['keyword', 'vector', 'hybrid', 'semantic']
+
+
+def query_settings(index_data):
+    """ Vector field and semantic configuration of the index definition used by the queries. """
+    vector_field = next((f["name"] for f in index_data.get("fields", []) if f.get("dimensions")), None)
+    semantic = index_data.get("semantic") or {}
+    configurations = [c["name"] for c in semantic.get("configurations") or []]
+    return {"vector_field": vector_field,
+            "semantic_configuration": semantic.get("defaultConfiguration") or (configurations[0] if configurations else None)}
+
+
+def build_query(query, vector_field=None, semantic_configuration=None, top=10):
+    """ Search request body of the query.
+    Attributes:
+        query (dict): query (see module docstring)
+        vector_field (str): vector field of vector / hybrid queries
+        semantic_configuration (str): semantic configuration of semantic queries
+        top (int): results per query, if not set by the query
+    Returns:
+        body (dict): POST docs/search.post.search body
+    """
+    kind = query["kind"]
+    body = {"top": query.get("top", top)}
+    for key in ['filter', 'select']:
+        if query.get(key):
+            body[key] = query[key]
+
+    if kind in ['keyword', 'hybrid', 'semantic']:
+        body["search"] = query.get("search") or '*'
+    if kind in ['keyword', 'hybrid'] and query.get("query_type") == 'full':
+        body["queryType"] = 'full'
+    if kind in ['vector', 'hybrid'] or (kind == 'semantic' and (query.get("text") or query.get("vector"))):
+        if not vector_field:
+            raise ValueError('Index has no vector field, vector queries could not be sent.')
+        vector_query = {"fields": vector_field, "k": query.get("k", body["top"])}
+        if query.get("vector"):
+            vector_query.update(kind='vector', vector=query["vector"])
+        else:
+            vector_query.update(kind='text', text=query.get("text") or query.get("search"))
+        body["vectorQueries"] = [vector_query]
+    if kind == 'semantic':
+        body["queryType"] = 'semantic'
+        if semantic_configuration:
+            body["semanticConfiguration"] = semantic_configuration
+    return body
+
+
+def normalize_text(text):
+    """ Query text with collapsed whitespace. """
+    return ' '.join(text.split()) if text else text
+
+
+def query_key(query, top=10):
+    """ Cache key of the query: kind, query type, search text, vector text or vector hash, filter, select, top, k.
+    Filter is taken as is (string literals are compared exactly), search text of simple syntax queries is case
+    insensitive, full Lucene syntax is taken as is (operators, case sensitive terms).
+    """
+    kind = query["kind"]
+    full = kind in ['keyword', 'hybrid'] and query.get("query_type") == 'full'
+    key = {"kind": kind,
+           "query_type": 'full' if full else 'simple',
+           "filter": query.get("filter") or None,
+           "select": ','.join(s.strip() for s in query["select"].split(',')) if query.get("select") else None,
+           "top": query.get("top", top),
+           "k": query.get("k")}
+    if kind != 'vector':
+        search = query.get("search") or '*'
+        key["search"] = search if full else normalize_text(search).casefold()
+    if query.get("vector"):
+        key["vector"] = hashlib.sha256(json.dumps(query["vector"]).encode('utf-8')).hexdigest()
+    elif kind != 'keyword':
+        key["text"] = normalize_text(query.get("text") or query.get("search"))
+    return json.dumps(key, sort_keys=True)
+
+
+class LRUCache:
+    def __init__(self, max_entries=1024, ttl_s=None):
+        """
+        Thread safe LRU cache with optional time to live.
+
+        Args:
+            max_entries (int): max number of entries, least recently used are evicted above it
+            ttl_s (float): entry time to live in seconds, no expiry if None
+        """
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        """ Cached value, None if not cached or expired. """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl_s is None or now - entry[0] < self.ttl_s):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """ Entries, hits, misses, evictions and hit rate. """
+        with self._lock:
+            total = self.hits + self.misses
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses,
+                    "evictions": self.evictions, "hit_rate": self.hits / total if total else 0.0}
+
+
+class SearchQueryClient:
+    def __init__(self, client, index_name, vector_field=None, semantic_configuration=None, embedding_backend=None,
+                 cache_size=1024, ttl_s=60.0, embedding_cache_size=4096, max_workers=8, top=10):
+        """
+        Query client of one index.
+
+        Args:
+            client (AISearchClient): pooled REST client (pool_maxsize should be >= max_workers)
+            index_name (str): index name
+            vector_field (str): vector field of vector / hybrid queries
+            semantic_configuration (str): semantic configuration of semantic queries
+            embedding_backend: backend embedding vector query texts on the client (e.g. CachedEmbeddingBackend),
+                texts are sent to the index vectorizer if None
+            cache_size (int): max cached results, 0 disables the result cache
+            ttl_s (float): result time to live in seconds (new documents become visible after it)
+            embedding_cache_size (int): max cached query embeddings
+            max_workers (int): queries sent at the same time by search_many
+            top (int): results per query, if not set by the query
+        """
+        self.client = client
+        self.index_name = index_name
+        self.vector_field = vector_field
+        self.semantic_configuration = semantic_configuration
+        self.embedding_backend = embedding_backend
+        self.max_workers = max_workers
+        self.top = top
+        self.results = LRUCache(cache_size, ttl_s) if cache_size else None
+        self.embeddings = LRUCache(embedding_cache_size)
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers,
+                                                               thread_name_prefix='ai-search-query')
+
+    def _embed(self, text):
+        """ Embedding of the query text, from the embedding cache if available. """
+        text = normalize_text(text)
+        vector = self.embeddings.get(text)
+        if vector is None:
+            vector = self.embedding_backend.embed([text])[0]
+            self.embeddings.put(text, vector)
+        return vector
+
+    def _body(self, query):
+        if self.embedding_backend is not None and query["kind"] != 'keyword' and not query.get("vector") and \
+                (query["kind"] != 'semantic' or query.get("text")):
+            query = dict(query, vector=self._embed(query.get("text") or query.get("search")))
+        return build_query(query, self.vector_field, self.semantic_configuration, self.top)
+
+    def _search_text(self, query):
+        """ Search response text of the query, from the result cache if available. """
+        if query.get("kind") not in KINDS:
+            raise ValueError(f"Unknown query kind '{query.get('kind')}', available: {KINDS}.")
+
+        key = query_key(query, self.top)
+        with ais_telemetry.span('search_query', index=self.index_name, query_kind=query["kind"]) as span:
+            text = self.results.get(key) if self.results is not None else None
+            span["attributes"]["cache_hit"] = text is not None
+            if text is None:
+                rr = self.client.post(f"indexes('{self.index_name}')/docs/search.post.search",
+                                      data=json.dumps(self._body(query)))
+                if rr.status_code != 200:
+                    raise RuntimeError(f"[{rr.status_code}]: query of '{self.index_name}' failed. {rr.text}")
+                text = rr.text
+                if self.results is not None:
+                    self.results.put(key, text)
+        return text
+
+    def search(self, query):
+        """ Results of the query, from the result cache if available.
+        Attributes:
+            query (dict or str): query (see module docstring), str is a keyword query
+        Returns:
+            results (dict): search response (value, @odata.count ...), a new copy on every call
+        """
+        if isinstance(query, str):
+            query = {"kind": 'keyword', "search": query}
+        return json.loads(self._search_text(query))
+
+    def search_many(self, queries):
+        """ Results of the queries sent concurrently, in the order of the queries.
+        Identical queries (same cache key) are sent once. The first failed query is raised.
+        Returns:
+            results (list): search responses
+        """
+        queries = [{"kind": 'keyword', "search": q} if isinstance(q, str) else q for q in queries]
+        keys = [query_key(q, self.top) for q in queries]
+        unique = dict(zip(keys, queries))
+        futures = {k: self._executor.submit(ais_telemetry.propagate(self._search_text), q) for k, q in unique.items()}
+        texts = {k: f.result() for k, f in futures.items()}
+        return [json.loads(texts[k]) for k in keys]
+
+    def clear_cache(self):
+        """ Drop cached results (e.g. after documents are pushed), embeddings are kept. """
+        if self.results is not None:
+            self.results.clear()
+
+    def cache_stats(self):
+        """ Result and query embedding cache stats. """
+        return {"results": self.results.stats() if self.results is not None else None,
+                "embeddings": self.embeddings.stats()}
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+def query_client(client, index_name, index_data=None, **kwargs):
+    """ Query client of the index, vector field and semantic configuration are taken from the index definition.
+    Attributes:
+        client (AISearchClient): pooled REST client
+        index_name (str): index name
+        index_data (dict): index definition, read from the service if None
+        kwargs: SearchQueryClient settings (embedding_backend, cache_size, ttl_s ...)
+    Returns:
+        query_client (SearchQueryClient): query client
+    """
+    if index_data is None:
+        rr = client.get(f"indexes('{index_name}')")
+        if rr.status_code != 200:
+            raise RuntimeError(f"[{rr.status_code}]: '{index_name}' index definition is NOT retrieved. {rr.text}")
+        index_data = rr.json()
+    return SearchQueryClient(client, index_name, **dict(query_settings(index_data), **kwargs))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Query an AI Search index.')
+    parser.add_argument('--index', required=True, help='index name')
+    parser.add_argument('--search', default='', help='keyword query')
+    parser.add_argument('--queries', default='', help='query file (json lines), sent concurrently')
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--max-workers', type=int, default=8)
+    parser.add_argument('--config', default='../config.json', help='config json file')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.loads(f.read())
+
+    client = ais_client.get_client(config["AISearchEndpoint"], config["AISearchAPIKey"], '2024-07-01')
+    qc = query_client(client, args.index, max_workers=args.max_workers, top=args.top)
+    if args.queries:
+        with open(args.queries, 'r') as f:
+            results = qc.search_many([json.loads(line) for line in f if line.strip()])
+    else:
+        results = [qc.search(args.search or '*')]
+    qc.close()
+    print(json.dumps(results, indent=4))
@@ -0,0 +1,333 @@
+"""
+Retention of release components: every release (and every re-run with a time suffix) leaves an index, data source(s),
+skillset and indexer(s) on the service. Release instances are found by the AISearchOps naming scheme
+({base}-{release}, data-source-{release}, skillset-vector-{release}, indexer-adlgen2-{release}, shards -NN),
+the newest N instances and instances referenced by an alias (or listed explicitly) are kept,
+the rest is deleted concurrently in dependency order: indexers, skillsets, data sources, indexes.
+Only components created by the base are deleted: names recorded in the release state, otherwise indexers writing
+to the release index and the data sources / skillsets they use (the index only if such indexer exists).
+Indexes of other bases with the same prefix (vect-index-big-r1 of vect-index-big, not a release of vect-index)
+are not release instances - other bases are taken from the state or listed explicitly.
+
+Usage:
+python ai_search_retention.py --base-index-name vect-index --keep-last 3 --config ../config.json
+python ai_search_retention.py --base-index-name vect-index --keep-last 3 --keep release-3oct --config ../config.json --apply
+python ai_search_retention.py --base-index-name vect-index --keep-last 3 --state ./release_state.json --other-base vect-index-big --config ../config.json --apply
+"""
+import argparse
+import concurrent.futures
+import datetime
+import json
+import re
+
+import ai_search_client as ais_client
+import ai_search_inventory as ais_inventory
+import ai_search_monitor as ais_monitor
+import ai_search_reconcile as ais_reconcile
+import ai_search_state as ais_state
+import ai_search_telemetry as ais_telemetry
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+# component names of a release instance (see AISearchOps.__init__), collection -> name format
+NAMING_SCHEME = {
+    'indexes': '{base}-{release}',
+    'datasources': 'data-source-{release}',
+    'skillsets': 'skillset-vector-{release}',
+    'indexers': 'indexer-adlgen2-{release}',
+}
+
+# deletion order - components referring to others go first
+DELETE_ORDER = ['indexers', 'skillsets', 'datasources', 'indexes']
+
+# index aliases are available in preview API versions only
+ALIASES_API_VERSION = '2024-05-01-preview'
+
+_TIME_SUFFIX = re.compile(r'-(\d{8}-\d{6})(?:-\d+)?$')
+_SHARD_SUFFIX = re.compile(r'^-\d{2}$')
+
+
+def release_instances(base_index_name, inventory, other_bases=()):
+    """ Release instances of the base index and their components (by name, see owned_components).
+    Attributes:
+        base_index_name (str): base index name
+        inventory (dict): collection -> set of existing names (see ai_search_inventory.list_component_names)
+        other_bases (list): other base index names, their indexes are not releases of this base
+    Returns:
+        instances (dict): release instance (release name with time suffix if any) -> collection -> list of names
+    """
+    prefix = f'{base_index_name}-'
+    # longer bases starting with this base own the indexes with their prefix
+    longer = [f'{b}-' for b in other_bases if b != base_index_name and b.startswith(prefix)]
+    releases = [n[len(prefix):] for n in sorted(inventory.get('indexes', set()))
+                if n.startswith(prefix) and not any(n.startswith(p) for p in longer)]
+
+    instances = {}
+    for collection, name_format in NAMING_SCHEME.items():
+        existing = inventory.get(collection, set())
+        exact = {name_format.format(base=base_index_name, release=r) for r in releases}
+        for release in releases:
+            name = name_format.format(base=base_index_name, release=release)
+            # component itself and its shards (name-00, name-01, ...), not a component of another release
+            names = [n for n in existing if n == name or
+                     (n not in exact and n.startswith(name) and _SHARD_SUFFIX.match(n[len(name):]))]
+            instances.setdefault(release, {})[collection] = sorted(names)
+    return instances
+
+
+def recorded_components(record):
+    """ Components of the release instance recorded in the release state (see ai_search_state.new_record). """
+    names = record["names"]
+    shards = record.get("shards") or []
+    return {'indexes': [names['indexes']],
+            'datasources': sorted({names['datasources']} | {s[1] for s in shards}),
+            'skillsets': [names['skillsets']],
+            'indexers': sorted({names['indexers']} | {s[2] for s in shards})}
+
+
+def list_indexers(client):
+    """ Definitions of all indexers of the service (one call), their targets and references prove ownership. """
+    rr = client.get('indexers')
+    if rr.status_code != 200:
+        raise RuntimeError(f"[{rr.status_code}]: indexers are NOT listed. {rr.text}")
+    return rr.json().get("value", [])
+
+
+def owned_components(client, index_name, components, indexers):
+    """ Components of the release instance created by its base. Names matching the naming scheme are not enough -
+    the same names could belong to another base. Foreign indexers are indexers other than the ones of the instance
+    writing to its index: components they write to or use are not owned, nor are skillsets projecting to another
+    index. Index without any indexer (half-built stack) is owned together with its naming scheme components.
+    Attributes:
+        client (AISearchClient): pooled REST client
+        index_name (str): index of the release instance
+        components (dict): collection -> names matched by name (see release_instances)
+        indexers (list): definitions of all indexers (see list_indexers)
+    Returns:
+        owned (dict): collection -> names which could be deleted
+    """
+    names = set(components['indexers'])
+    own = [i for i in indexers if i["name"] in names and i.get("targetIndexName") == index_name]
+    foreign = [i for i in indexers if i not in own]
+    foreign_targets = {i.get("targetIndexName") for i in foreign}
+    foreign_data_sources = {i.get("dataSourceName") for i in foreign}
+    foreign_skillsets = {i.get("skillsetName") for i in foreign}
+
+    skillsets = []
+    for name in components['skillsets']:
+        if name in foreign_skillsets:
+            continue
+        live = ais_reconcile.get_definition(client, 'skillsets', name)
+        if live is not None and ais_reconcile.target_indexes('skillsets', live) <= {index_name}:
+            skillsets.append(name)
+
+    return {'indexers': sorted(i["name"] for i in own),
+            'skillsets': skillsets,
+            'datasources': [n for n in components['datasources'] if n not in foreign_data_sources],
+            'indexes': [n for n in components['indexes'] if n == index_name and n not in foreign_targets]}
+
+
+def _suffix_time(release):
+    """ Time of the time suffix added to the release name on name collision, None if there is none. """
+    match = _TIME_SUFFIX.search(release)
+    if match is None:
+        return None
+    # suffix is local time (see ai_search_inventory.resolve_collisions)
+    return datetime.datetime.strptime(match.group(1), '%Y%m%d-%H%M%S').astimezone()
+
+
+def _indexer_time(client, indexer_name):
+    """ Start time of the first indexer run in the execution history, None if not available. """
+    try:
+        status = ais_monitor.get_indexer_status(client, indexer_name)
+    except Exception as e:
+        log.warning(f"RETENTION: status of '{indexer_name}' is not available. {e}")
+        return None
+    times = [ais_monitor._parse_time(r.get("startTime")) for r in status.get("executionHistory") or []]
+    times.append(ais_monitor._parse_time((status.get("lastResult") or {}).get("startTime")))
+    times = [t for t in times if t is not None]
+    return min(times) if times else None
+
+
+def release_times(client, instances, known_times=None):
+    """ Creation time of release instances: known time (e.g. release state), time suffix of the name
+    or first indexer run (statuses are read in parallel), None if not known.
+    Returns:
+        times (dict): release instance -> aware datetime or None
+    """
+    times = {r: (known_times or {}).get(r) or _suffix_time(r) for r in instances}
+    pending = {r: instances[r]['indexers'][0] for r, t in times.items() if t is None and instances[r]['indexers']}
+    if pending:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(pending))) as executor:
+            futures = {r: executor.submit(_indexer_time, client, n) for r, n in pending.items()}
+            times.update({r: f.result() for r, f in futures.items()})
+    return times
+
+
+def list_alias_targets(client, api_version=ALIASES_API_VERSION):
+    """ Indexes referenced by index aliases, empty if aliases are not available.
+    GET https://[service name].search.windows.net/aliases?api-version=[preview api-version]
+    """
+    try:
+        rr = client.get('aliases', params={"api-version": api_version})
+    except Exception as e:
+        log.warning(f'RETENTION: aliases are not listed. {e}')
+        return set()
+    if rr.status_code != 200:
+        log.warning(f'RETENTION: [{rr.status_code}] aliases are not listed, no index is kept because of an alias.')
+        return set()
+    return {index for alias in rr.json().get("value", []) for index in alias.get("indexes", [])}
+
+
+def plan_retention(client, base_index_name, keep_last=3, keep=(), use_aliases=True, known_times=None,
+                   records=None, other_bases=()):
+    """ Release instances to keep and to delete, no component is deleted.
+    Attributes:
+        client (AISearchClient): pooled REST client
+        base_index_name (str): base index name
+        keep_last (int): number of newest release instances kept
+        keep (list): release instances (or index names) always kept
+        use_aliases (bool): release instances with index referenced by an alias are kept
+        known_times (dict): release instance -> creation time, e.g. from release state
+        records (list): release state records of the base, their recorded names are deleted as is
+        other_bases (list): other base index names sharing the prefix of this base
+    Returns:
+        plan (dict): keep / delete release instances, reasons, components to delete per collection
+            and components matched by name but not owned by the base (not deleted)
+    """
+    records = {r["instance"]: r for r in records or []}
+    inventory = ais_inventory.list_component_names(client)
+    instances = release_instances(base_index_name, inventory, other_bases)
+    recorded_times = {r: datetime.datetime.fromisoformat(rec["created_at"])
+                      for r, rec in records.items() if rec.get("created_at")}
+    times = release_times(client, instances, dict(known_times or {}, **recorded_times))
+    aliased = list_alias_targets(client) if use_aliases else set()
+
+    # newest first, unknown time is treated as the oldest
+    oldest = datetime.datetime.min.replace(tzinfo=datetime.timezone.utc)
+    ordered = sorted(instances, key=lambda r: (times[r] or oldest, r), reverse=True)
+
+    reasons = {}
+    for i, release in enumerate(ordered):
+        index_name = NAMING_SCHEME['indexes'].format(base=base_index_name, release=release)
+        if release in keep or index_name in keep:
+            reasons[release] = 'kept explicitly'
+        elif index_name in aliased:
+            reasons[release] = 'referenced by alias'
+        elif i < keep_last:
+            reasons[release] = f'newest {keep_last}'
+
+    delete = [r for r in ordered if r not in reasons]
+    owned = {}
+    for release in delete:
+        if release in records:
+            recorded = recorded_components(records[release])
+            owned[release] = {c: [n for n in recorded[c] if n in inventory.get(c, set())] for c in DELETE_ORDER}
+    # not recorded - ownership is checked on the live definitions, releases in parallel
+    pending = [r for r in delete if r not in owned]
+    if pending:
+        indexers = list_indexers(client)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(pending))) as executor:
+            futures = {r: executor.submit(ais_telemetry.propagate(owned_components), client,
+                                          NAMING_SCHEME['indexes'].format(base=base_index_name, release=r),
+                                          instances[r], indexers)
+                       for r in pending}
+            owned.update({r: f.result() for r, f in futures.items()})
+
+    not_owned = {c: sorted(n for r in delete for n in instances[r][c] if n not in owned[r][c]) for c in DELETE_ORDER}
+    for collection, names in not_owned.items():
+        for name in names:
+            log.warning(f"RETENTION: '{name}' {collection} is not proven to be created by '{base_index_name}', kept.")
+    return {"base_index_name": base_index_name,
+            "keep": [r for r in ordered if r in reasons],
+            "delete": delete,
+            "reasons": reasons,
+            "times": {r: t.isoformat() if t else None for r, t in times.items()},
+            "components": {c: sorted(n for r in delete for n in owned[r][c]) for c in DELETE_ORDER},
+            "not_owned": not_owned}
+
+
+def _delete(client, collection, name):
+    rr = client.delete(f"{collection}('{name}')")
+    if rr.status_code in [204, 404]:
+        log.info(f"[{rr.status_code}]: '{name}' {collection} deleted.")
+        return True
+    log.error(f"[{rr.status_code}]: '{name}' {collection} is NOT deleted. {rr.text}")
+    return False
+
+
+def delete_components(client, components, max_workers=8):
+    """ Delete components concurrently, collection by collection in DELETE_ORDER.
+    A collection is not deleted if deletion of the previous one failed (components still refer to each other).
+    Attributes:
+        client (AISearchClient): pooled REST client
+        components (dict): collection -> list of names
+        max_workers (int): deletions at the same time
+    Returns:
+        results (dict): collection -> name -> deleted flag
+    """
+    results = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for collection in DELETE_ORDER:
+            names = components.get(collection) or []
+            futures = {n: executor.submit(_delete, client, collection, n) for n in names}
+            results[collection] = {n: f.result() for n, f in futures.items()}
+            if not all(results[collection].values()):
+                log.error(f'RETENTION: {collection} are not all deleted, remaining collections are skipped.')
+                break
+    return results
+
+
+def cleanup_releases(client, base_index_name, keep_last=3, keep=(), dry_run=True, use_aliases=True,
+                     known_times=None, max_workers=8, records=None, other_bases=()):
+    """ Delete release instances of the base index except the newest keep_last, aliased and explicitly kept ones.
+    Attributes:
+        dry_run (bool): only plan (preview), nothing is deleted
+        see plan_retention and delete_components
+    Returns:
+        plan (dict): retention plan, with deletion results if not dry run
+    """
+    plan = plan_retention(client, base_index_name, keep_last, keep, use_aliases, known_times, records, other_bases)
+    log.info(f"RETENTION '{base_index_name}': keep {plan['keep']}, delete {plan['delete']}.")
+
+    if dry_run:
+        for collection in DELETE_ORDER:
+            for name in plan["components"][collection]:
+                log.info(f"RETENTION (dry run): '{name}' {collection} would be deleted.")
+        return plan
+
+    plan["results"] = delete_components(client, plan["components"], max_workers)
+    plan["success"] = all(all(r.values()) for r in plan["results"].values()) and \
+        len(plan["results"]) == len(DELETE_ORDER)
+    return plan
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Delete stale release components of a base index.')
+    parser.add_argument('--base-index-name', required=True)
+    parser.add_argument('--keep-last', type=int, default=3, help='number of newest releases kept')
+    parser.add_argument('--keep', action='append', default=[], help='release (or index name) kept, could be repeated')
+    parser.add_argument('--no-aliases', action='store_true', help='do not keep releases referenced by aliases')
+    parser.add_argument('--other-base', action='append', default=[],
+                        help='other base index name sharing the prefix, could be repeated')
+    parser.add_argument('--state', default='', help='release state file, recorded releases and other bases are used')
+    parser.add_argument('--config', default='../config.json', help='config json file')
+    parser.add_argument('--apply', action='store_true', help='delete components, dry run (preview) otherwise')
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = json.loads(f.read())
+
+    records, other_bases = None, list(args.other_base)
+    if args.state:
+        store = ais_state.open_state_store(args.state)
+        records = store.releases(args.base_index_name)
+        other_bases += store.base_index_names()
+
+    client = ais_client.get_client(config["AISearchEndpoint"], config["AISearchAPIKey"], '2024-07-01')
+    plan = cleanup_releases(client, args.base_index_name, keep_last=args.keep_last, keep=args.keep,
+                            dry_run=not args.apply, use_aliases=not args.no_aliases, records=records,
+                            other_bases=other_bases)
+    print(json.dumps(plan, indent=4))
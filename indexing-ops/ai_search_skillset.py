@@ -1,14 +1,31 @@
-import requests
 import json
 
+import ai_search_client as ais_client
+import ai_search_template as ais_template
+import ai_search_telemetry as ais_telemetry
+
 import logging as log
 log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
 
+
+# declared binding paths of the skillset template parameters (see ai_search_template.py)
+EMBEDDING_SKILL = {"@odata.type": "#Microsoft.Skills.Text.AzureOpenAIEmbeddingSkill"}
+SKILLSET_BINDINGS = [
+    (("name",), "skillset_name"),
+    (("indexProjections", "selectors", "*", "targetIndexName"), "target_index_name"),
+    (("skills", EMBEDDING_SKILL, "resourceUri"), "openai_resource"),
+    (("skills", EMBEDDING_SKILL, "apiKey"), "openai_apikey"),
+    (("skills", EMBEDDING_SKILL, "deploymentId"), "openai_deploymentid"),
+    (("skills", EMBEDDING_SKILL, "modelName"), "openai_modelname"),
+]
+
+
 def _prep_update_definition_json(skillset_name, skillset_def_path,
                                  openai_resource, openai_apikey, 
                                  openai_deploymentid, openai_modelname,
                                  target_index_name):
     """ Update the base skillset json definition file. 
+    Template is parsed once and cached, parameters are set through declared binding paths.
     Attributes:
         skillset_name (str): skillset name
         skillset_def_path (str): skillset definition json file path
@@ -25,37 +42,33 @@ def _prep_update_definition_json(skillset_name, skillset_def_path,
     data = {}
 
     try:
-        # read template json file
-        with open(skillset_def_path, 'r') as f:
-            data = json.loads(f.read())
-
-        data["name"] = skillset_name
-        data["indexProjections"]["selectors"][0]["targetIndexName"] = target_index_name
-
-        # pass AOAI details
-        data["skills"][1]["resourceUri"] = openai_resource
-        data["skills"][1]["apiKey"] = openai_apikey
-        data["skills"][1]["deploymentId"] = openai_deploymentid
-        data["skills"][1]["modelName"] = openai_modelname
-
-        #print(data)
+        # cached template json file, AOAI details are passed to the embedding skill
+        data = ais_template.render_template(skillset_def_path, SKILLSET_BINDINGS,
+                                            {"skillset_name": skillset_name,
+                                             "target_index_name": target_index_name,
+                                             "openai_resource": openai_resource,
+                                             "openai_apikey": openai_apikey,
+                                             "openai_deploymentid": openai_deploymentid,
+                                             "openai_modelname": openai_modelname})
         success = True
 
     except Exception as e:
-        log.error('Error while INDEX definition update.')
+        log.error('Error while SKILLSET definition update.')
         log.error(e)
 
     return success, data
 
 
+@ais_telemetry.traced('create_skillset', component='skillset_name')
 def create_skillset(ai_search_resource, ai_search_apikey, search_api_version,
                     skillset_name, skillset_def_path,
                     openai_resource, openai_apikey, 
                     openai_deploymentid, openai_modelname,
-                    target_index_name):
+                    target_index_name, client=None):
     """
     Create Skillset using updated definition.
     https://learn.microsoft.com/en-us/azure/search/cognitive-search-defining-skillset
+    Shared pooled client for the service is used if client is not provided.
     """
 
     success = False
@@ -75,15 +88,11 @@ def create_skillset(ai_search_resource, ai_search_apikey, search_api_version,
     # Content-Type: application/json  
     # api-key: [admin key]
     try: 
-        headers = {
-                "Content-Type": "application/json",
-                "api-key": ai_search_apikey
-            }
-
-        url = f"{ai_search_resource}/skillsets?api-version={search_api_version}"
+        if client is None:
+            client = ais_client.get_client(ai_search_resource, ai_search_apikey, search_api_version)
 
         # create skillset request
-        rr = requests.post(url=url, headers=headers, data=json.dumps(data))
+        rr = client.post('skillsets', data=json.dumps(data))
 
         if rr.status_code in [200, 201]:
             log.info(f"[{rr.status_code}]: '{skillset_name}' {elem} created OK")
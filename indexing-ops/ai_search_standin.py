@@ -0,0 +1,567 @@
+"""
+Local Azure AI Search stand-in server (localhost HTTP) for offline runs and benchmarks.
+Serves the REST surface used by this project:
+    /indexes, /datasources, /skillsets, /indexers    - list ($select), POST create, GET/PUT/DELETE by name
+    /indexers/{name}/status                          - simulated indexer run
+    /indexers/{name}/run, /indexers/{name}/reset     - start / reset indexer run
+    /indexes/{name}/docs/index                       - push documents (200 / 207)
+    /indexes/{name}/docs/search                      - keyword, vector (exact, metric of the profile),
+                                                       hybrid (RRF) and semantic (reranker score) search
+    /indexes/{name}/docs/$count                      - number of documents
+Latency, throttling (429 with Retry-After), errors (503) and failed documents (207) are injected as configured.
+Definitions are not validated as thoroughly as by the service, only name / key field are checked.
+Text vector queries are vectorized by a deterministic stub (same text - same vector), filters support
+'field eq value' clauses joined by 'and' only. Searches run outside of the state lock (in parallel).
+
+Usage:
+python ai_search_standin.py --port 8080 --latency-ms 50 --throttle-rate 0.05
+"""
+import argparse
+import json
+import math
+import operator
+import random
+import re
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ai_search_vectorize as ais_vectorize
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+COLLECTIONS = ['indexes', 'datasources', 'skillsets', 'indexers']
+
+SEARCH_PATHS = ['docs/search', 'docs/search.post.search']
+
+# reciprocal rank fusion constant of hybrid queries
+RRF_K = 60
+
+# norms of vector fields are kept with the stored document (not returned)
+_NORMS = '@standin.norms'
+
+# /collection, /collection('name'), /collection/name, /collection/name/sub/path
+_PATH = re.compile(r"^/(?P<collection>[A-Za-z]+)(?:\('(?P<qname>[^']+)'\)|/(?P<name>[^/]+))?(?:/(?P<sub>.*))?$")
+
+
+class StandInState:
+    def __init__(self, indexer_items=100, indexer_items_per_s=50.0):
+        """
+        Components, documents and simulated indexer runs of the stand-in.
+
+        Args:
+            indexer_items (int): number of items processed by every indexer run
+            indexer_items_per_s (float): simulated indexer throughput
+        """
+        self.components = {c: {} for c in COLLECTIONS}
+        self.documents = {}
+        self.indexer_runs = {}
+        self.indexer_items = indexer_items
+        self.indexer_items_per_s = indexer_items_per_s
+        # (method, collection) -> number of requests
+        self.request_counts = {}
+        self.lock = threading.Lock()
+
+    def count(self, method, collection):
+        with self.lock:
+            key = (method, collection)
+            self.request_counts[key] = self.request_counts.get(key, 0) + 1
+
+    def total_requests(self):
+        with self.lock:
+            return sum(self.request_counts.values())
+
+    def start_run(self, indexer_name):
+        self.indexer_runs[indexer_name] = time.time()
+
+    def indexer_status(self, indexer_name):
+        started = self.indexer_runs.get(indexer_name)
+        if started is None:
+            return {"status": "running", "lastResult": None, "executionHistory": []}
+
+        elapsed = time.time() - started
+        processed = min(self.indexer_items, int(elapsed * self.indexer_items_per_s))
+        done = processed >= self.indexer_items
+        start_time = _iso(started)
+        end_time = _iso(started + self.indexer_items / self.indexer_items_per_s) if done else None
+        last = {"status": "success" if done else "inProgress",
+                "errorMessage": None,
+                "startTime": start_time,
+                "endTime": end_time,
+                "itemsProcessed": processed,
+                "itemsFailed": 0,
+                "errors": [],
+                "warnings": []}
+        return {"status": "running", "lastResult": last, "executionHistory": [last]}
+
+
+def _iso(ts):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(ts)) + f'.{int((ts % 1) * 1000):03d}Z'
+
+
+def _error(code, message):
+    return code, {"error": {"code": str(code), "message": message}}
+
+
+def _api_view(collection, definition, preview):
+    """ Definition as returned by the api-version, indexer cache is returned by preview versions only. """
+    if collection == 'indexers' and not preview and "cache" in definition:
+        return {k: v for k, v in definition.items() if k != "cache"}
+    return definition
+
+
+def _key_field(index_def):
+    for field in index_def.get("fields", []):
+        if field.get("key"):
+            return field["name"]
+    return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AISearchStandIn/1.0'
+    # headers and body are written separately, without this every response waits for delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+    def _send(self, code, body=None, headers=None):
+        data = json.dumps(body).encode() if body is not None else b''
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if data:
+            self.wfile.write(data)
+
+    def _body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if not length:
+            return None
+        return json.loads(self.rfile.read(length))
+
+    def _handle(self, method):
+        standin = self.server.standin
+        url = urllib.parse.urlsplit(self.path)
+        query = dict(urllib.parse.parse_qsl(url.query))
+        match = _PATH.match(urllib.parse.unquote(url.path))
+        collection = match.group('collection') if match else ''
+        standin.state.count(method, collection)
+
+        try:
+            body = self._body()
+        except ValueError:
+            return self._send(*_error(400, 'Request body is not valid json.'))
+
+        # injected latency and faults
+        delay = standin.latency_s + (standin.rng.uniform(0, standin.latency_jitter_s) if standin.latency_jitter_s else 0)
+        if delay:
+            time.sleep(delay)
+        roll = standin.rng.random()
+        if roll < standin.throttle_rate:
+            return self._send(*_error(429, 'Too many requests (stand-in).'),
+                              headers={'Retry-After': str(standin.retry_after_s)})
+        if roll < standin.throttle_rate + standin.error_rate:
+            return self._send(*_error(503, 'Service unavailable (stand-in).'))
+
+        if not self.headers.get('api-key'):
+            return self._send(*_error(403, 'api-key header is missing.'))
+        if 'api-version' not in query:
+            return self._send(*_error(400, 'api-version query parameter is missing.'))
+        if match is None or collection not in COLLECTIONS:
+            return self._send(*_error(404, f'Resource {url.path} not found.'))
+
+        name = match.group('qname') or match.group('name')
+        sub = match.group('sub')
+        if method == 'POST' and collection == 'indexes' and sub in SEARCH_PATHS:
+            return self._send(*standin.search(name, body or {}))
+        with standin.state.lock:
+            code, payload = standin.route(method, collection, name, sub, query, body)
+        self._send(code, payload)
+
+    def do_GET(self):
+        self._handle('GET')
+
+    def do_POST(self):
+        self._handle('POST')
+
+    def do_PUT(self):
+        self._handle('PUT')
+
+    def do_DELETE(self):
+        self._handle('DELETE')
+
+
+class AISearchStandIn:
+    def __init__(self, host='127.0.0.1', port=0, latency_s=0.0, latency_jitter_s=0.0,
+                 throttle_rate=0.0, error_rate=0.0, retry_after_s=1, seed=None,
+                 indexer_items=100, indexer_items_per_s=50.0, doc_error_rate=0.0):
+        """
+        Local stand-in of Azure AI Search service.
+
+        Args:
+            host (str): host to listen on
+            port (int): port to listen on, free port is picked if 0
+            latency_s (float): latency added to every request in seconds
+            latency_jitter_s (float): random latency (0 - jitter) added on top
+            throttle_rate (float): share of requests answered with 429
+            error_rate (float): share of requests answered with 503
+            retry_after_s (float): Retry-After of throttled responses
+            seed (int): seed of injected faults, for repeatable runs
+            indexer_items (int): number of items processed by every indexer run
+            indexer_items_per_s (float): simulated indexer throughput
+            doc_error_rate (float): share of pushed documents failed with 503 (207 response)
+        """
+        self.host = host
+        self.port = port
+        self.latency_s = latency_s
+        self.latency_jitter_s = latency_jitter_s
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after_s = retry_after_s
+        self.doc_error_rate = doc_error_rate
+        self.rng = random.Random(seed)
+        self.state = StandInState(indexer_items, indexer_items_per_s)
+        self._server = None
+        self._thread = None
+
+    @property
+    def endpoint(self):
+        return f'http://{self.host}:{self.port}'
+
+    def start(self):
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.standin = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        log.info(f'STAND-IN: AI Search stand-in listening on {self.endpoint}')
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # routing (called under state lock)
+    def route(self, method, collection, name, sub, query, body):
+        components = self.state.components[collection]
+        # incremental enrichment (indexer cache) is a preview feature
+        preview = query.get('api-version', '').endswith('-preview')
+        if collection == 'indexers' and not sub and (body or {}).get("cache") and not preview:
+            return _error(400, f"Indexer 'cache' is not supported in api-version '{query.get('api-version')}'.")
+
+        if sub:
+            if collection == 'indexers':
+                return self._route_indexer(method, name, sub)
+            if collection == 'indexes' and sub.startswith('docs'):
+                return self._route_docs(method, name, sub, query, body)
+            return _error(404, f'{sub} not found.')
+
+        if name is None:
+            if method == 'GET':
+                select = query.get('$select')
+                items = [{"name": n} if select == 'name' else _api_view(collection, d, preview)
+                         for n, d in components.items()]
+                return 200, {"value": items}
+            if method == 'POST':
+                if not body or not body.get("name"):
+                    return _error(400, 'Definition name is missing.')
+                if body["name"] in components:
+                    return _error(409, f"'{body['name']}' already exists.")
+                return self._store(collection, body["name"], body, 201)
+            return _error(405, f'{method} is not supported.')
+
+        if method == 'GET':
+            if name not in components:
+                return _error(404, f"No {collection} with the name '{name}' was found.")
+            return 200, _api_view(collection, components[name], preview)
+        if method == 'PUT':
+            if not body:
+                return _error(400, 'Definition is missing.')
+            code = 200 if name in components else 201
+            return self._store(collection, name, dict(body, name=name), code)
+        if method == 'DELETE':
+            if components.pop(name, None) is None:
+                return _error(404, f"No {collection} with the name '{name}' was found.")
+            if collection == 'indexes':
+                self.state.documents.pop(name, None)
+            if collection == 'indexers':
+                self.state.indexer_runs.pop(name, None)
+            return 204, None
+        return _error(405, f'{method} is not supported.')
+
+    def _store(self, collection, name, body, code):
+        if collection == 'indexes':
+            if _key_field(body) is None:
+                return _error(400, 'Index must have a key field.')
+            self.state.documents.setdefault(name, {})
+        if collection == 'indexers':
+            for ref, target in [("dataSourceName", 'datasources'), ("targetIndexName", 'indexes'),
+                                ("skillsetName", 'skillsets')]:
+                if body.get(ref) and body[ref] not in self.state.components[target]:
+                    return _error(400, f"{target} '{body[ref]}' does not exist.")
+            # indexer runs right after it is created or updated
+            self.state.start_run(name)
+        stored = dict(body)
+        stored["@odata.etag"] = f'"{time.time_ns()}"'
+        self.state.components[collection][name] = stored
+        return code, stored
+
+    def _route_indexer(self, method, name, sub):
+        if name not in self.state.components['indexers']:
+            return _error(404, f"No indexer with the name '{name}' was found.")
+        if sub in ['status', 'search.status'] and method == 'GET':
+            return 200, self.state.indexer_status(name)
+        if sub in ['run', 'search.run', 'reset', 'search.reset'] and method == 'POST':
+            if 'run' in sub:
+                self.state.start_run(name)
+            else:
+                self.state.indexer_runs.pop(name, None)
+            return 202 if 'run' in sub else 204, None
+        return _error(404, f'{sub} not found.')
+
+    def _route_docs(self, method, name, sub, query, body):
+        index = self.state.components['indexes'].get(name)
+        if index is None:
+            return _error(404, f"No index with the name '{name}' was found.")
+        docs = self.state.documents.setdefault(name, {})
+
+        if sub == 'docs/$count' and method == 'GET':
+            return 200, len(docs)
+
+        if sub in ['docs/index', 'docs/search.index'] and method == 'POST':
+            return self._index_documents(index, docs, body)
+
+        return _error(404, f'{sub} not found.')
+
+    def _index_documents(self, index, docs, body):
+        key = _key_field(index)
+        actions = (body or {}).get("value", [])
+        if not actions:
+            return _error(400, 'Batch is empty.')
+
+        results = []
+        for action in actions:
+            doc_key = action.get(key)
+            kind = action.get("@search.action", "upload")
+            if doc_key is None:
+                results.append({"key": None, "status": False, "errorMessage": 'Key is missing.', "statusCode": 400})
+                continue
+            if self.doc_error_rate and self.rng.random() < self.doc_error_rate:
+                results.append({"key": doc_key, "status": False, "errorMessage": 'Service unavailable (stand-in).',
+                                "statusCode": 503})
+                continue
+            doc = {k: v for k, v in action.items() if k != "@search.action"}
+            if kind == 'delete':
+                docs.pop(doc_key, None)
+            elif kind in ['merge', 'mergeOrUpload'] and doc_key in docs:
+                docs[doc_key].update(doc)
+            elif kind == 'merge':
+                results.append({"key": doc_key, "status": False, "errorMessage": 'Document not found.',
+                                "statusCode": 404})
+                continue
+            else:
+                docs[doc_key] = doc
+            if kind != 'delete':
+                _set_norms(index, docs[doc_key])
+            results.append({"key": doc_key, "status": True, "errorMessage": None,
+                            "statusCode": 201 if kind == 'upload' else 200})
+
+        code = 200 if all(r["status"] for r in results) else 207
+        return code, {"value": results}
+
+    def search(self, name, body):
+        """ Search request, documents are snapshotted under the state lock and scored outside of it. """
+        with self.state.lock:
+            index = self.state.components['indexes'].get(name)
+            if index is None:
+                return _error(404, f"No index with the name '{name}' was found.")
+            docs = list(self.state.documents.get(name, {}).values())
+
+        try:
+            docs = _filter_docs(docs, body.get("filter"))
+        except ValueError as e:
+            return _error(400, str(e))
+
+        rankings = []
+        text = (body.get("search") or '').strip()
+        if text or not body.get("vectorQueries"):
+            rankings.append(_keyword_ranking(index, docs, text or '*'))
+        for vector_query in body.get("vectorQueries") or []:
+            try:
+                rankings.append(self._vector_ranking(index, docs, vector_query))
+            except ValueError as e:
+                return _error(400, str(e))
+
+        if len(rankings) == 1:
+            hits = rankings[0]
+        else:
+            # hybrid - reciprocal rank fusion of keyword and vector rankings
+            fused = {}
+            for ranking in rankings:
+                for rank, (score, doc) in enumerate(ranking):
+                    key = id(doc)
+                    fused[key] = (fused.get(key, (0.0, doc))[0] + 1.0 / (RRF_K + rank + 1), doc)
+            hits = sorted(fused.values(), key=lambda h: -h[0])
+
+        semantic = body.get("queryType") == 'semantic'
+        if semantic:
+            configurations = {c["name"] for c in (index.get("semantic") or {}).get("configurations") or []}
+            configuration = body.get("semanticConfiguration") or (index.get("semantic") or {}).get("defaultConfiguration")
+            if configuration not in configurations:
+                return _error(400, f"Semantic configuration '{configuration}' is not defined in the index.")
+
+        skip = body.get("skip") or 0
+        top = body.get("top") or 50
+        fields = _returned_fields(index, body.get("select"))
+        top_score = hits[0][0] if hits else 0.0
+        value = []
+        for score, doc in hits[skip:skip + top]:
+            item = {f: doc[f] for f in fields if f in doc}
+            item["@search.score"] = float(score)
+            if semantic:
+                # reranker score 0 - 4, relative to the best hit
+                item["@search.rerankerScore"] = 4.0 * score / top_score if top_score else 0.0
+            value.append(item)
+
+        result = {"value": value}
+        if body.get("count"):
+            result["@odata.count"] = len(hits)
+        return 200, result
+
+    def _vector_ranking(self, index, docs, vector_query):
+        """ Exact nearest neighbours of the vector query, scored as the service does for the metric. """
+        fields = [f.strip() for f in (vector_query.get("fields") or '').split(',') if f.strip()]
+        if not fields:
+            raise ValueError('Vector query fields are missing.')
+        definitions = {f["name"]: f for f in index.get("fields", [])}
+
+        if vector_query.get("kind") == 'text':
+            vector = None
+        elif vector_query.get("vector"):
+            vector = vector_query["vector"]
+        else:
+            raise ValueError('Vector query has no vector.')
+
+        scores = {}
+        for field in fields:
+            definition = definitions.get(field)
+            if not definition or not definition.get("dimensions"):
+                raise ValueError(f"'{field}' is not a vector field.")
+            query = vector if vector is not None else \
+                ais_vectorize.StubEmbeddingBackend(definition["dimensions"]).embed([vector_query.get("text") or ''])[0]
+            if len(query) != definition["dimensions"]:
+                raise ValueError(f"Vector query has {len(query)} dimensions, '{field}' has {definition['dimensions']}.")
+            metric = _field_metric(index, definition)
+            query_norm = math.sqrt(sum(v * v for v in query)) or 1.0
+
+            for doc in docs:
+                values = doc.get(field)
+                if not values:
+                    continue
+                score = _vector_score(metric, query, query_norm, values, doc[_NORMS][field])
+                if score > scores.get(id(doc), (-math.inf, None))[0]:
+                    scores[id(doc)] = (score, doc)
+
+        k = vector_query.get("k") or vector_query.get("kNearestNeighborsCount") or 50
+        return sorted(scores.values(), key=lambda h: -h[0])[:k]
+
+
+def _set_norms(index, doc):
+    doc[_NORMS] = {f["name"]: math.sqrt(sum(v * v for v in doc[f["name"]])) or 1.0
+                   for f in index.get("fields", []) if f.get("dimensions") and doc.get(f["name"])}
+
+
+def _field_metric(index, field):
+    """ Similarity metric of the vector field (through its profile and algorithm), cosine by default. """
+    vector_search = index.get("vectorSearch") or {}
+    profile = next((p for p in vector_search.get("profiles", []) if p["name"] == field.get("vectorSearchProfile")), {})
+    algorithm = next((a for a in vector_search.get("algorithms", []) if a["name"] == profile.get("algorithm")), {})
+    parameters = algorithm.get("hnswParameters") or algorithm.get("exhaustiveKnnParameters") or {}
+    return parameters.get("metric") or 'cosine'
+
+
+def _vector_score(metric, query, query_norm, values, norm):
+    """ @search.score of the vector: cosine 1 / (2 - cos), euclidean 1 / (1 + distance), dotProduct as is. """
+    dot = sum(map(operator.mul, query, values))
+    if metric == 'euclidean':
+        return 1.0 / (1.0 + math.sqrt(max(0.0, query_norm * query_norm + norm * norm - 2 * dot)))
+    if metric == 'dotProduct':
+        return dot
+    return 1.0 / (2.0 - dot / (query_norm * norm))
+
+
+def _keyword_ranking(index, docs, text):
+    """ Documents matching the search terms, scored by term counts in searchable string fields. """
+    terms = [] if text == '*' else text.lower().split()
+    searchable = [f["name"] for f in index.get("fields", []) if f.get("searchable") and f.get("type") == 'Edm.String']
+
+    hits = []
+    for doc in docs:
+        content = ' '.join(str(doc.get(f, '')) for f in searchable).lower()
+        score = sum(content.count(t) for t in terms) if terms else 1.0
+        if score:
+            hits.append((float(score), doc))
+    hits.sort(key=lambda h: -h[0])
+    return hits
+
+
+def _filter_docs(docs, expression):
+    """ Documents matching the filter, only "field eq 'value'" (or number / true / false) clauses joined by 'and'. """
+    if not expression:
+        return docs
+    clauses = []
+    for clause in re.split(r'\s+and\s+', expression.strip()):
+        match = re.fullmatch(r"\s*(\w+)\s+eq\s+(?:'((?:[^']|'')*)'|(\S+))\s*", clause)
+        if match is None:
+            raise ValueError(f"Filter '{expression}' is not supported by the stand-in.")
+        if match.group(2) is not None:
+            value = match.group(2).replace("''", "'")
+        else:
+            value = json.loads(match.group(3))
+        clauses.append((match.group(1), value))
+    return [d for d in docs if all(d.get(f) == v for f, v in clauses)]
+
+
+def _returned_fields(index, select):
+    """ Fields returned by the search: selected or all retrievable fields. """
+    retrievable = [f["name"] for f in index.get("fields", []) if f.get("retrievable", True) and f.get("stored", True)]
+    if not select or select.strip() == '*':
+        return retrievable
+    return [f.strip() for f in select.split(',') if f.strip() in retrievable]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local Azure AI Search stand-in server.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='latency added to every request')
+    parser.add_argument('--jitter-ms', type=float, default=0.0, help='random latency added on top')
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help='share of requests answered with 429')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of requests answered with 503')
+    parser.add_argument('--retry-after', type=float, default=1, help='Retry-After of throttled responses')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    standin = AISearchStandIn(args.host, args.port, args.latency_ms / 1000, args.jitter_ms / 1000,
+                              args.throttle_rate, args.error_rate, args.retry_after, args.seed).start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        standin.stop()
@@ -0,0 +1,163 @@
+"""
+Compiled, cached definition templates.
+Each definition json file is read and parsed once and cached by path and modification time, rendering is
+a copy of the cached template plus substitution of parameters through declared binding paths.
+Copy is made by decoding the cached compact json text - C json decoder is about 2x faster than
+copy.deepcopy or a python copy of the parsed dict. Binding paths are compiled to the concrete
+locations in the template once, rendering only sets values at these locations.
+
+Binding is (path, parameter name). Path is a tuple of segments:
+    'key'                  - dict key
+    0                      - list index
+    '*'                    - every list element
+    {'kind': 'azureOpenAI'} - every list element with all listed key/value pairs
+e.g. (('skills', {'@odata.type': '#Microsoft.Skills.Text.AzureOpenAIEmbeddingSkill'}, 'resourceUri'), 'openai_resource')
+Binding which matches nothing in the template raises TemplateBindingError, nothing is patched silently.
+"""
+import json
+import os
+import threading
+
+import ai_search_telemetry as ais_telemetry
+
+import logging as log
+log.basicConfig(level=log.INFO, format='%(asctime)s : %(levelname)s : %(message)s')
+
+
+class TemplateBindingError(Exception):
+    pass
+
+
+# path -> (mtime, parsed template, compact json text, compiled binding locations)
+_templates = {}
+_templates_lock = threading.Lock()
+
+
+def _load(template_path):
+    """ Cached (mtime, parsed template, compact json text), json file is parsed again only if it was modified. """
+    path = template_path
+    mtime = os.stat(path).st_mtime_ns
+
+    with _templates_lock:
+        cached = _templates.get(path)
+    if cached is not None and cached[0] == mtime:
+        return cached
+
+    with ais_telemetry.span('template_load', path=path):
+        with open(path, 'r') as f:
+            template = json.loads(f.read())
+        cached = (mtime, template, json.dumps(template, separators=(',', ':')), {})
+    log.debug(f'TEMPLATE parsed: {path}')
+
+    with _templates_lock:
+        _templates[path] = cached
+    return cached
+
+
+def load_template(template_path):
+    """ Parsed template, shared by all callers - must not be modified, use render_template for a copy.
+    Attributes:
+        template_path (str): path to definition json file
+    Returns:
+        template (dict): parsed definition json
+    """
+    return _load(template_path)[1]
+
+
+def clear_cache():
+    with _templates_lock:
+        _templates.clear()
+
+
+def _matches(item, matcher):
+    return isinstance(item, dict) and all(item.get(k) == v for k, v in matcher.items())
+
+
+def _children(node, segment):
+    """ Elements of the node selected by the path segment, as (container, key) pairs. """
+    if isinstance(segment, dict):
+        if not isinstance(node, list):
+            return []
+        return [(node, i) for i, item in enumerate(node) if _matches(item, segment)]
+
+    if segment == '*':
+        return [(node, i) for i in range(len(node))] if isinstance(node, list) else []
+
+    if isinstance(segment, int):
+        return [(node, segment)] if isinstance(node, list) and -len(node) <= segment < len(node) else []
+
+    return [(node, segment)] if isinstance(node, dict) and segment in node else []
+
+
+def _locations(data, path):
+    """ Concrete locations (tuples of keys and list indexes) selected by the binding path. """
+    locations = [()]
+    nodes = [data]
+    for segment in path[:-1]:
+        pairs = [(loc, container, key) for node, loc in zip(nodes, locations)
+                 for container, key in _children(node, segment)]
+        nodes = [container[key] for _, container, key in pairs]
+        locations = [loc + (key,) for loc, _, key in pairs]
+
+    last = path[-1]
+    result = []
+    for node, loc in zip(nodes, locations):
+        if isinstance(last, str) and last != '*' and isinstance(node, dict):
+            result.append(loc + (last,))
+        else:
+            result.extend(loc + (key,) for _, key in _children(node, last))
+    return result
+
+
+def select(data, path):
+    """ Values selected by the binding path.
+    Attributes:
+        data (dict): definition json
+        path (tuple): binding path
+    Returns:
+        values (list): selected values
+    """
+    values = []
+    for location in _locations(data, path):
+        node = data
+        for k in location[:-1]:
+            node = node[k]
+        if isinstance(location[-1], int) or location[-1] in node:
+            values.append(node[location[-1]])
+    return values
+
+
+def render_template(template_path, bindings, params):
+    """ Render definition: copy of the cached template with parameters set through the bindings.
+    Attributes:
+        template_path (str): path to definition json file
+        bindings (list): (path, parameter name) pairs
+        params (dict): parameter name -> value
+    Returns:
+        data (dict): rendered definition json
+    """
+    with ais_telemetry.span('template_render', path=template_path, bindings=len(bindings)):
+        return _render(template_path, bindings, params)
+
+
+def _render(template_path, bindings, params):
+    _, template, text, compiled = _load(template_path)
+
+    data = json.loads(text)
+    for path, param in bindings:
+        # binding paths are declared once (module constants), compiled locations are cached by path identity
+        entry = compiled.get(id(path))
+        if entry is None or entry[0] is not path:
+            entry = (path, _locations(template, path))
+            if not entry[1]:
+                raise TemplateBindingError(f'Binding {path} matches nothing in the template.')
+            compiled[id(path)] = entry
+        locations = entry[1]
+
+        value = params[param]
+        for location in locations:
+            node = data
+            for k in location[:-1]:
+                node = node[k]
+            node[location[-1]] = value
+    return data
@@ -0,0 +1,44 @@
+"""
+Tests run against the local stand-in (ai_search_standin.py), no Azure resources are needed.
+
+Usage:
+python -m pytest -q tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_search_benchmark as ais_benchmark  # noqa: E402
+import ai_search_client as ais_client  # noqa: E402
+import ai_search_ops as ais_ops  # noqa: E402
+import ai_search_standin as ais_standin  # noqa: E402
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+@pytest.fixture
+def standin():
+    with ais_standin.AISearchStandIn() as s:
+        yield s
+
+
+@pytest.fixture
+def client(standin):
+    return ais_client.AISearchClient(standin.endpoint, 'standin-key', ais_ops.SEARCH_API_VERSION)
+
+
+@pytest.fixture
+def make_ops(standin, client):
+    """ AISearchOps of the vector index definition set bound to the stand-in. """
+    def _make(release_name='r1', base_index_name='vect-index', config=None, **kwargs):
+        folder = os.path.join(DATA_DIR, 'vector-index')
+        return ais_ops.AISearchOps(dict(ais_benchmark._config(standin.endpoint), **(config or {})),
+                                   base_index_name, release_name,
+                                   os.path.join(folder, 'ai_search_index_schema.json'),
+                                   os.path.join(folder, 'ai_search_indexer_vector_def_v2.json'), True,
+                                   os.path.join(folder, 'ai_search_skillset_vector_def_v2.json'),
+                                   client=client, **kwargs)
+    return _make
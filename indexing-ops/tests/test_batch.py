@@ -0,0 +1,17 @@
+import ai_search_batch as ais_batch
+import ai_search_benchmark as ais_benchmark
+
+from conftest import DATA_DIR
+
+
+def test_colliding_entries_are_rejected(standin, client):
+    manifest = [{"base_index_name": "tenant-a", "release_name": "release01", "definition_set": "vector-index"},
+                {"base_index_name": "tenant-b", "release_name": "release01", "definition_set": "vector-index"},
+                {"base_index_name": "tenant-c", "release_name": "release02", "definition_set": "vector-index"}]
+    summary = ais_batch.provision_batch(ais_benchmark._config(standin.endpoint), manifest, max_concurrency=2,
+                                        data_dir=DATA_DIR, client=client)
+
+    assert [r["success"] for r in summary["stacks"]] == [False, False, True]
+    assert "datasources 'data-source-release01' (entries [1])" in summary["stacks"][0]["error"]
+    # nothing is created for the rejected entries, no orphan index
+    assert not any(name.startswith(('tenant-a', 'tenant-b')) for name in standin.state.components['indexes'])
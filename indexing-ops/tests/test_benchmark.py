@@ -0,0 +1,17 @@
+import pytest
+
+import ai_search_benchmark as ais_benchmark
+
+from conftest import DATA_DIR
+
+
+@pytest.mark.parametrize('mode', ['create', 'reconcile'])
+def test_provisioning_benchmark_smoke(mode):
+    results = ais_benchmark.run_provisioning_benchmark(stacks=3, concurrency_levels=(1, 2),
+                                                       data_dir=DATA_DIR, mode=mode)
+    assert [r["concurrency"] for r in results] == [1, 2]
+    for r in results:
+        assert r["succeeded"] == 3
+        assert r["failed"] == 0
+        assert r["requests_per_stack"] > 0
+    assert ais_benchmark.format_table(results)
@@ -0,0 +1,81 @@
+import concurrent.futures
+import time
+
+import pytest
+import requests
+
+import ai_search_client as ais_client
+import ai_search_ops as ais_ops
+
+
+def test_throttling_does_not_open_circuit(standin):
+    standin.error_rate = 1.0
+    breaker = ais_client.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = ais_client.AISearchClient(standin.endpoint, 'standin-key', ais_ops.SEARCH_API_VERSION,
+                                       retry_policy=ais_client.RetryPolicy(max_retries=3, backoff_base=0.0),
+                                       circuit_breaker=breaker)
+    for _ in range(3):
+        assert client.get('indexes').status_code == 503
+    assert client.retry_stats["throttled"] == 9
+    assert client.retry_stats["circuit_open"] == 0
+
+    standin.error_rate = 0.0
+    assert client.get('indexes').status_code == 200
+
+
+def test_half_open_admits_one_trial_call():
+    breaker = ais_client.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record('indexes', False)
+    assert not breaker.allow('indexes')
+    time.sleep(0.06)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        allowed = list(executor.map(breaker.allow, ['indexes'] * 8))
+    assert allowed.count(True) == 1
+
+    # failed trial opens the circuit again, successful one closes it
+    breaker.record('indexes', False)
+    assert not breaker.allow('indexes')
+    time.sleep(0.06)
+    assert breaker.allow('indexes')
+    breaker.record('indexes', True)
+    assert all(breaker.allow('indexes') for _ in range(8))
+
+
+def test_half_open_trial_without_result_is_replaced():
+    breaker = ais_client.CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record('indexes', False)
+    time.sleep(0.06)
+    assert breaker.allow('indexes')
+    assert not breaker.allow('indexes')
+    time.sleep(0.06)
+    assert breaker.allow('indexes')
+
+
+class _Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+def test_malformed_retry_after_falls_back_to_backoff():
+    policy = ais_client.RetryPolicy(backoff_base=0.5, backoff_max=30.0)
+    assert ais_client._retry_after(_Response({'Retry-After': 'soon'})) is None
+    assert 0.0 <= policy.delay(0, _Response({'Retry-After': 'soon'})) <= 0.5
+    assert ais_client._retry_after(_Response({'Retry-After': '2'})) == 2.0
+    assert ais_client._retry_after(_Response({'Retry-After': 'Wed, 21 Oct 2015 07:28:00 GMT'})) == 0.0
+
+
+def test_other_request_errors_are_recorded_by_circuit(standin, monkeypatch):
+    breaker = ais_client.CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    client = ais_client.AISearchClient(standin.endpoint, 'standin-key', ais_ops.SEARCH_API_VERSION,
+                                       circuit_breaker=breaker)
+
+    def _broken(*args, **kwargs):
+        raise requests.exceptions.ChunkedEncodingError('response ended prematurely (test)')
+    monkeypatch.setattr(client.session, 'request', _broken)
+
+    for _ in range(2):
+        with pytest.raises(requests.exceptions.ChunkedEncodingError):
+            client.get('indexes')
+    with pytest.raises(ais_client.CircuitOpenError):
+        client.get('indexes')
@@ -0,0 +1,26 @@
+import ai_search_reconcile as ais_reconcile
+
+CACHE_CONFIG = {"EnrichmentCacheConnStr": "DefaultEndpointsProtocol=https;AccountName=cache"}
+
+
+def test_indexer_with_cache_uses_preview_api_version(make_ops, standin):
+    ops = make_ops(config=CACHE_CONFIG)
+    assert ops.create_search()
+    assert standin.state.components['indexers'][ops.search_indexer_name]["cache"]["enableReprocessing"]
+
+    ops = make_ops(config=CACHE_CONFIG)
+    assert ops.reconcile_search(use_state=False)
+    report = ops.enrichment_invalidation_report()
+    assert not any('cache is not enabled' in r for r in report["reasons"])
+
+
+def test_reconcile_indexer_cache(client, standin):
+    client.put("indexes('idx')", data='{"name": "idx", "fields": [{"name": "id", "type": "Edm.String", "key": true}]}')
+    client.put("datasources('ds')", data='{"name": "ds", "type": "azureblob"}')
+    indexer = {"name": "ixr", "dataSourceName": "ds", "targetIndexName": "idx",
+               "cache": {"storageConnectionString": "AccountName=cache", "enableReprocessing": True}}
+    assert ais_reconcile.reconcile_component(client, 'indexers', 'ixr', indexer) == ais_reconcile.CREATED
+    assert ais_reconcile.reconcile_component(client, 'indexers', 'ixr', indexer) == ais_reconcile.UNCHANGED
+    # the GA api-version rejects the cache property
+    assert client.put("indexers('ixr')", data='{"name": "ixr", "dataSourceName": "ds", "targetIndexName": "idx", '
+                                              '"cache": {"enableReprocessing": true}}').status_code == 400
@@ -0,0 +1,42 @@
+import requests
+
+import ai_search_push as ais_push
+
+
+class _FailingClient:
+    """ Client whose batches with the failing key raise (e.g. connection error after retries). """
+    def __init__(self, client, failing_key):
+        self.client = client
+        self.failing_key = failing_key
+
+    def post(self, path, data=None, params=None):
+        if f'"{self.failing_key}"'.encode('utf-8') in data:
+            raise requests.ConnectionError('connection reset (test)')
+        return self.client.post(path, data=data, params=params)
+
+
+def test_failed_batch_is_counted_and_push_goes_on(make_ops, client):
+    assert make_ops().reconcile_search()
+    docs = [{"chunk_id": f'doc-{i}', "chunk": f'text {i}'} for i in range(10)]
+    pusher = ais_push.DocumentPusher(_FailingClient(client, 'doc-3'), 'vect-index-r1', 'chunk_id',
+                                     max_in_flight=2, max_docs=2)
+    summary = pusher.push(docs)
+
+    assert summary["batches"] == 5
+    assert summary["docs"] == 10
+    assert summary["succeeded"] == 8
+    assert summary["failed"] == 2
+    assert sorted(pusher.failed_keys) == ['doc-2', 'doc-3']
+
+
+def test_oversized_document_is_counted_failed(make_ops, client):
+    assert make_ops().reconcile_search()
+    docs = [{"chunk_id": 'small', "chunk": 'text'}, {"chunk_id": 'large', "chunk": 'x' * 2000}]
+    pusher = ais_push.DocumentPusher(client, 'vect-index-r1', 'chunk_id', max_bytes=1000)
+    summary = pusher.push(docs)
+
+    assert summary["docs"] == 2
+    assert summary["succeeded"] == 1
+    assert summary["failed"] == 1
+    assert pusher.failed_keys == ['large']
+
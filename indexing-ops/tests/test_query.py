@@ -0,0 +1,22 @@
+import ai_search_query as ais_query
+
+
+def _key(**query):
+    return ais_query.query_key(dict({"kind": 'keyword', "search": 'backup'}, **query))
+
+
+def test_filter_literals_are_not_normalized():
+    assert _key(filter="title eq 'a  b'") != _key(filter="title eq 'a b'")
+    assert _key(filter="title eq 'a b'") == _key(filter="title eq 'a b'")
+
+
+def test_only_simple_syntax_is_case_insensitive():
+    assert _key(search='Backup  Policy') == _key(search='backup policy')
+    assert _key(search='Backup AND Policy', query_type='full') != _key(search='backup and policy', query_type='full')
+    assert _key(search='backup', query_type='full') != _key(search='backup')
+
+
+def test_full_syntax_is_sent():
+    body = ais_query.build_query({"kind": 'keyword', "search": 'title:backup~', "query_type": 'full'})
+    assert body["queryType"] == 'full'
+    assert 'queryType' not in ais_query.build_query({"kind": 'keyword', "search": 'backup'})
@@ -0,0 +1,129 @@
+import json
+
+import ai_search_operations as ais_operations
+import ai_search_reconcile as ais_reconcile
+import ai_search_state as ais_state
+import ai_search_telemetry as ais_telemetry
+
+
+def test_reconcile_component_span(client):
+    data = {"name": "idx", "fields": [{"name": "id", "type": "Edm.String", "key": True}]}
+    spans = []
+    ais_telemetry.tracer.add_exporter(spans.append)
+    try:
+        assert ais_reconcile.reconcile_component(client, 'indexes', 'idx', data) == ais_reconcile.CREATED
+        assert ais_reconcile.reconcile_component(client, 'indexes', 'idx', data) == ais_reconcile.UNCHANGED
+    finally:
+        ais_telemetry.tracer.remove_exporter(spans.append)
+    stages = [s for s in spans if s["name"] == 'reconcile_component']
+    assert [s["attributes"]["component"] for s in stages] == ['idx', 'idx']
+    assert [s["attributes"]["outcome"] for s in stages] == [ais_reconcile.CREATED, ais_reconcile.UNCHANGED]
+
+
+def test_reconcile_search(make_ops, standin):
+    assert make_ops().reconcile_search()
+    requests = standin.state.total_requests()
+    # second run finds every component up to date
+    assert make_ops().reconcile_search()
+    assert standin.state.total_requests() > requests
+
+
+def test_reconcile_search_with_state(make_ops, standin):
+    state = ais_state.open_state_store(':memory:')
+    assert make_ops(state=state).reconcile_search()
+    record = state.get('vect-index-r1')
+    assert all(c["outcome"] == ais_reconcile.CREATED for c in record["components"].values())
+
+    requests = standin.state.total_requests()
+    assert make_ops(state=state).reconcile_search()
+    assert standin.state.total_requests() == requests
+
+
+def test_reconcile_operation_progress(make_ops):
+    tracker = ais_operations.OperationTracker()
+    try:
+        operation_id = tracker.submit('reconcile_search', make_ops().reconcile_search)
+        record = tracker.wait(operation_id, timeout=30)
+    finally:
+        ais_telemetry.tracer.remove_exporter(tracker)
+    assert record["status"] == ais_operations.SUCCEEDED
+    components = {e["component"] for k, e in record["components"].items() if e["stage"] == 'reconcile_component'}
+    assert 'vect-index-r1' in components
+
+
+def test_operation_accepted_and_run_by_another_tracker(make_ops, tmp_path):
+    # HTTP function accepts, queue triggered worker (another instance) runs, status is read from the shared folder
+    accepting = ais_operations.OperationTracker(store_dir=str(tmp_path))
+    running = ais_operations.OperationTracker(store_dir=str(tmp_path))
+    try:
+        operation_id = accepting.accept('reconcile_search', release_name='r1')
+        assert accepting.get(operation_id)["status"] == ais_operations.ACCEPTED
+        record = running.run(operation_id, make_ops().reconcile_search)
+    finally:
+        ais_telemetry.tracer.remove_exporter(accepting)
+        ais_telemetry.tracer.remove_exporter(running)
+    assert record["status"] == ais_operations.SUCCEEDED
+    assert accepting.get(operation_id)["status"] == ais_operations.SUCCEEDED
+    assert running.run('unknown', make_ops().reconcile_search) is None
+
+
+def test_reconcile_does_not_take_over_other_base(make_ops, standin):
+    assert make_ops('release01', 'tenant-a').reconcile_search()
+    ops = make_ops('release01', 'tenant-b')
+    assert not ops.reconcile_search()
+    assert ops.components['indexer'] == ais_reconcile.CONFLICT
+    assert ops.components['skillset'] == ais_reconcile.CONFLICT
+    assert ops.components['data source'] == ais_reconcile.CONFLICT
+
+    components = standin.state.components
+    assert components['indexers']['indexer-adlgen2-release01']["targetIndexName"] == 'tenant-a-release01'
+    selectors = components['skillsets']['skillset-vector-release01']["indexProjections"]["selectors"]
+    assert {s["targetIndexName"] for s in selectors} == {'tenant-a-release01'}
+    # tenant-a stack is still reconciled as its own
+    assert make_ops('release01', 'tenant-a').reconcile_search()
+
+
+def test_redelivered_running_operation_is_resumed(make_ops, standin, tmp_path):
+    # worker timed out after names were resolved and the index was created, the queue redelivers the message
+    names = {'indexes': 'vect-index-r1-20260101-000000', 'datasources': 'data-source-r1-20260101-000000',
+             'skillsets': 'skillset-vector-r1-20260101-000000', 'indexers': 'indexer-adlgen2-r1-20260101-000000'}
+    accepting = ais_operations.OperationTracker(store_dir=str(tmp_path))
+    running = ais_operations.OperationTracker(store_dir=str(tmp_path))
+    try:
+        operation_id = accepting.accept('create_search', release_name='r1')
+        interrupted = dict(accepting.get(operation_id), status=ais_operations.RUNNING, names=names)
+        (tmp_path / f'{operation_id}.json').write_text(json.dumps(interrupted))
+        ops = make_ops()
+        ops._set_names(names)
+        assert ops.prep_index(check_exists=False)
+
+        ops = make_ops()
+        record = running.run(operation_id, ops.create_search,
+                             resume=lambda r: ops.reconcile_search(names=r["names"]))
+        assert record["status"] == ais_operations.SUCCEEDED
+        assert list(standin.state.components['indexes']) == [names['indexes']]
+        assert standin.state.components['indexers'][names['indexers']]["targetIndexName"] == names['indexes']
+
+        # without resume the interrupted operation is failed, finished one is not run again
+        operation_id = accepting.accept('create_search', release_name='r1')
+        (tmp_path / f'{operation_id}.json').write_text(
+            json.dumps(dict(accepting.get(operation_id), status=ais_operations.RUNNING)))
+        assert running.run(operation_id, make_ops().create_search)["status"] == ais_operations.FAILED
+        requests = standin.state.total_requests()
+        assert running.run(operation_id, make_ops().create_search)["status"] == ais_operations.FAILED
+        assert standin.state.total_requests() == requests
+    finally:
+        ais_telemetry.tracer.remove_exporter(accepting)
+        ais_telemetry.tracer.remove_exporter(running)
+
+
+def test_resolved_names_are_recorded(make_ops, tmp_path):
+    tracker = ais_operations.OperationTracker(store_dir=str(tmp_path))
+    try:
+        operation_id = tracker.accept('create_search')
+        ops = make_ops()
+        record = tracker.run(operation_id, ops.create_search)
+    finally:
+        ais_telemetry.tracer.remove_exporter(tracker)
+    assert record["status"] == ais_operations.SUCCEEDED
+    assert record["names"]["indexes"] == ops.search_index_name
@@ -0,0 +1,91 @@
+import json
+
+import ai_search_inventory as ais_inventory
+import ai_search_retention as ais_retention
+import ai_search_state as ais_state
+
+OTHER_STACK = {'indexes': 'vect-index-big-r1', 'datasources': 'data-source-big-r1',
+               'skillsets': 'skillset-vector-big-r1', 'indexers': 'indexer-adlgen2-big-r1'}
+
+
+def _put_other_stack(client):
+    """ Stack of another deployment whose names match a 'big-r1' release of vect-index. """
+    client.put(f"indexes('{OTHER_STACK['indexes']}')", data=json.dumps(
+        {"name": OTHER_STACK['indexes'], "fields": [{"name": "id", "type": "Edm.String", "key": True}]}))
+    client.put(f"datasources('{OTHER_STACK['datasources']}')", data=json.dumps(
+        {"name": OTHER_STACK['datasources'], "type": "azureblob", "container": {"name": "data"}}))
+    client.put(f"skillsets('{OTHER_STACK['skillsets']}')", data=json.dumps(
+        {"name": OTHER_STACK['skillsets'], "skills": []}))
+    client.put(f"indexers('{OTHER_STACK['indexers']}')", data=json.dumps(
+        {"name": OTHER_STACK['indexers'], "dataSourceName": OTHER_STACK['datasources'],
+         "skillsetName": OTHER_STACK['skillsets'], "targetIndexName": OTHER_STACK['indexes']}))
+
+
+def _existing(client):
+    inventory = ais_inventory.list_component_names(client)
+    return {n for names in inventory.values() for n in names}
+
+
+def test_other_base_prefix_is_not_a_release(client):
+    inventory = {'indexes': {'vect-index-a1', 'vect-index-big-r1'}, 'datasources': {'data-source-big-r1'}}
+    assert set(ais_retention.release_instances('vect-index', inventory)) == {'a1', 'big-r1'}
+    assert set(ais_retention.release_instances('vect-index', inventory, ['vect-index-big'])) == {'a1'}
+
+
+def test_cleanup_keeps_other_base_stack(make_ops, client):
+    for release in ['a1', 'a2']:
+        assert make_ops(release).create_search()
+    other_ops = make_ops('r1', base_index_name='vect-index-big')
+    assert other_ops.create_search()
+    other = {other_ops.search_index_name, other_ops.data_source_name, other_ops.search_skillset_name,
+             other_ops.search_indexer_name}
+    before = _existing(client)
+    assert other <= before
+
+    plan = ais_retention.cleanup_releases(client, 'vect-index', keep_last=0, dry_run=False, use_aliases=False)
+    assert plan["success"]
+    # vect-index-big-r1 looks like release big-r1, but no indexer of that release writes to it
+    assert 'vect-index-big-r1' in plan["not_owned"]['indexes']
+    after = _existing(client)
+    assert other <= after
+    assert not {'vect-index-a1', 'vect-index-a2', 'indexer-adlgen2-a1', 'data-source-a2'} & after
+
+
+def test_cleanup_with_other_bases(client):
+    _put_other_stack(client)
+    plan = ais_retention.cleanup_releases(client, 'vect-index', keep_last=0, dry_run=False, use_aliases=False,
+                                          other_bases=['vect-index-big'])
+    assert plan["delete"] == []
+    assert set(OTHER_STACK.values()) <= _existing(client)
+
+
+def test_ops_cleanup_uses_recorded_bases(make_ops, client):
+    state = ais_state.open_state_store(':memory:')
+    ops = make_ops('a1', state=state)
+    assert ops.create_search()
+    state.put(ais_state.new_record('vect-index-big', 'r1', OTHER_STACK))
+    _put_other_stack(client)
+
+    plan = make_ops('a2', state=state).cleanup_releases(keep_last=0, dry_run=False, use_aliases=False)
+    assert plan["delete"] == ['a1']
+    after = _existing(client)
+    assert set(OTHER_STACK.values()) <= after
+    assert not {'vect-index-a1', 'data-source-a1', 'skillset-vector-a1', 'indexer-adlgen2-a1'} & after
+    assert state.get('vect-index-a1') is None
+
+
+def test_cleanup_removes_half_built_stack(make_ops, client):
+    tenant_a = make_ops('release01', base_index_name='tenant-a')
+    assert tenant_a.create_search()
+    # half-built stack of tenant-b: index only, data source / skillset / indexer names are tenant-a's
+    assert make_ops('release01', base_index_name='tenant-b').prep_index(check_exists=False)
+    assert 'tenant-b-release01' in _existing(client)
+
+    plan = ais_retention.cleanup_releases(client, 'tenant-b', keep_last=0, dry_run=False, use_aliases=False)
+    assert plan["success"]
+    assert plan["components"]['indexes'] == ['tenant-b-release01']
+    assert plan["components"]['indexers'] == plan["components"]['datasources'] == plan["components"]['skillsets'] == []
+    after = _existing(client)
+    assert 'tenant-b-release01' not in after
+    assert {tenant_a.search_index_name, tenant_a.data_source_name, tenant_a.search_skillset_name,
+            tenant_a.search_indexer_name} <= after
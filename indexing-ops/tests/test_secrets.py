@@ -0,0 +1,38 @@
+import ai_search_state as ais_state
+
+ROTATED = "DefaultEndpointsProtocol=https;AccountName=standin;AccountKey=rotated"
+
+
+def _connection_string(standin):
+    return standin.state.components['datasources']['data-source-r1']["credentials"]["connectionString"]
+
+
+def test_rotated_secret_is_pushed_with_state(make_ops, standin):
+    state = ais_state.open_state_store(':memory:')
+    assert make_ops(state=state).reconcile_search()
+    record = state.get('vect-index-r1')
+    assert record["secret_salt"]
+    assert ROTATED not in str(record)
+
+    ops = make_ops(config={"StorageAccConnStr": ROTATED}, state=state)
+    assert ops.reconcile_search()
+    assert ops.components['data source'] == 'updated'
+    assert ops.components['index'] == 'unchanged'
+    assert _connection_string(standin) == ROTATED
+
+    # recorded digest matches now - nothing is sent
+    requests = standin.state.total_requests()
+    assert make_ops(config={"StorageAccConnStr": ROTATED}, state=state).reconcile_search()
+    assert standin.state.total_requests() == requests
+
+
+def test_forced_reconcile_pushes_secrets(make_ops, standin):
+    assert make_ops().reconcile_search()
+    ops = make_ops(config={"StorageAccConnStr": ROTATED})
+    assert ops.reconcile_search()
+    assert ops.components['data source'] == 'unchanged'
+
+    ops = make_ops(config={"StorageAccConnStr": ROTATED})
+    assert ops.reconcile_search(force=True)
+    assert set(ops.components.values()) == {'updated'}
+    assert _connection_string(standin) == ROTATED
@@ -0,0 +1,49 @@
+import json
+
+import pytest
+import requests
+
+import ai_search_client as ais_client
+import ai_search_vectorize as ais_vectorize
+
+
+class _Response:
+    status_code = 200
+    headers = {}
+
+    def json(self):
+        return {"data": [{"index": 0, "embedding": [0.1, 0.2]}]}
+
+
+def _backend(max_retries):
+    return ais_vectorize.AzureOpenAIEmbeddingBackend('https://standin.openai.azure.com', 'key', 'deployment',
+                                                     'text-embedding-ada-002', dimensions=2,
+                                                     retry_policy=ais_client.RetryPolicy(max_retries=max_retries,
+                                                                                         backoff_base=0.0))
+
+
+def test_embed_retries_connection_errors(monkeypatch):
+    backend = _backend(max_retries=3)
+    errors = [requests.ConnectionError('connection reset (test)'), requests.Timeout('read timeout (test)')]
+
+    def _post(url, params=None, data=None, timeout=None):
+        assert json.loads(data) == {"input": ["text"]}
+        if errors:
+            raise errors.pop(0)
+        return _Response()
+    monkeypatch.setattr(backend.session, 'post', _post)
+
+    assert backend.embed(['text']) == [[0.1, 0.2]]
+    assert backend.calls == 3
+
+
+def test_embed_raises_after_max_retries(monkeypatch):
+    backend = _backend(max_retries=1)
+
+    def _post(*args, **kwargs):
+        raise requests.ConnectionError('connection reset (test)')
+    monkeypatch.setattr(backend.session, 'post', _post)
+
+    with pytest.raises(requests.ConnectionError):
+        backend.embed(['text'])
+    assert backend.calls == 2